@@ -6,8 +6,10 @@ To use this script:
 1. Run it in the container
 2. Connect to it from PyCharm using the Python Debug Server configuration
 """
+import asyncio
 import os
 import sys
+import aiohttp
 import debugpy
 import logging
 
@@ -30,7 +32,7 @@ from custom_components.provident_energy.api import ProvidentEnergyAPI
 from custom_components.provident_energy.const import DOMAIN
 
 # Example usage
-def main():
+async def main():
     """Run example code for debugging."""
     _LOGGER.info("Starting Provident Energy API example")
     
@@ -39,15 +41,16 @@ def main():
     password = os.environ.get("PROVIDENT_PASSWORD", "test_password")
     
     _LOGGER.info(f"Creating API client for user: {username}")
-    api = ProvidentEnergyAPI(username, password)
-    
-    # This is where you would set a breakpoint
-    _LOGGER.info("Attempting to login")
-    login_result = api.login()
-    _LOGGER.info(f"Login result: {login_result}")
+    async with aiohttp.ClientSession() as session:
+        api = ProvidentEnergyAPI(session, username, password)
+
+        # This is where you would set a breakpoint
+        _LOGGER.info("Attempting to login")
+        login_result = await api.login()
+        _LOGGER.info(f"Login result: {login_result}")
     
     # More example code here
     _LOGGER.info("Example completed")
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    asyncio.run(main())
\ No newline at end of file
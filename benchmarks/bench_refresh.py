@@ -0,0 +1,266 @@
+"""Benchmark the coordinator's data refresh against the local meterconnex stand-in.
+
+For each meter count, the coordinator's update is timed: it requests the
+meter tree and the consumption data of every meter, logging in when
+needed, merges the data into the held series, and updates the running
+totals, the costs of the meters that have a tariff and the data persisted
+to storage. It runs on a minimal Home Assistant instance with its storage
+in a temporary directory, and needs Home Assistant installed, as in the
+devcontainer.
+
+The first refresh of each scenario is cold, the second one reuses the
+session and meter tree and only requests the days from each meter's
+high-water mark on, and the third one finds no new data, so that it
+revalidates the responses of the second one and gets 304s.
+In the expiring scenario, the stand-in expires every session before the
+second refresh, and with --session-requests also after that many
+requests, so that the refreshes log in again. The script exits with
+status 1 if they didn't, or if a refresh without new data got no 304s.
+
+Reported per refresh: wall time, number of requests, of 304s and of
+logins after an expired session, bytes of the response bodies, bytes the
+client received on the wire after compression, and the time the event
+loop was blocked for longer than BLOCK_THRESHOLD.
+
+    python benchmarks/bench_refresh.py --meters 1 5 50 500 --latency 0.05 --session-requests 20
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import logging
+import os
+import sys
+import tempfile
+import time
+from dataclasses import dataclass
+from types import MappingProxyType
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), os.pardir))
+
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(__file__))
+
+from fake_meterconnex import FakeMeterconnex  # noqa: E402
+
+BLOCK_THRESHOLD = 0.01  # seconds
+
+
+class LoopMonitor:
+    """Measure how long the event loop is kept from running other tasks."""
+
+    def __init__(self, interval: float = 0.001) -> None:
+        self.interval = interval
+        self.blocked = 0.0
+        self.max_lag = 0.0
+        self._task: asyncio.Task | None = None
+
+    async def __aenter__(self) -> LoopMonitor:
+        self._task = asyncio.create_task(self._run())
+        await asyncio.sleep(0)
+        return self
+
+    async def __aexit__(self, *_) -> None:
+        self._task.cancel()
+
+    async def _run(self) -> None:
+        while True:
+            start = time.perf_counter()
+            await asyncio.sleep(self.interval)
+            lag = time.perf_counter() - start - self.interval
+            self.max_lag = max(self.max_lag, lag)
+            if lag > BLOCK_THRESHOLD:
+                self.blocked += lag
+
+
+@dataclass
+class Result:
+    """Measurements of a single refresh."""
+
+    scenario: str
+    meters: int
+    refresh: str
+    wall_time: float
+    requests: int
+    not_modified: int
+    relogins: int
+    bytes_sent: int
+    bytes_received: int
+    blocked: float
+    max_lag: float
+    complete: bool
+
+
+async def start_hass(config_dir: str):
+    """Start a minimal Home Assistant instance, with nothing but its base functionality."""
+    from homeassistant import bootstrap, config_entries, core, loader
+
+    hass = core.HomeAssistant(config_dir)
+    loader.async_setup(hass)
+    hass.config_entries = config_entries.ConfigEntries(hass, {})
+    await bootstrap.async_load_base_functionality(hass)
+    await hass.async_start()
+    return hass
+
+
+def create_coordinator(hass, server: FakeMeterconnex, base_url: str, batch_size: int):
+    """Create the coordinator of a config entry for the stand-in, with a tariff for electricity."""
+    from homeassistant import config_entries
+
+    from custom_components.provident_energy.const import (
+        CONF_BANDS,
+        CONF_BASE_URL,
+        CONF_PASSWORD,
+        CONF_RATE,
+        CONF_TARIFFS,
+        CONF_TIERS,
+        CONF_USERNAME,
+        DOMAIN,
+        UTILITY_ELECTRICITY,
+    )
+    from custom_components.provident_energy.coordinator import ProvidentEnergyDataUpdateCoordinator
+
+    entry = config_entries.ConfigEntry(
+        data={CONF_USERNAME: server.username, CONF_PASSWORD: server.password, CONF_BASE_URL: base_url},
+        discovery_keys=MappingProxyType({}),
+        domain=DOMAIN,
+        minor_version=1,
+        options={
+            CONF_TARIFFS: {
+                UTILITY_ELECTRICITY: {
+                    CONF_RATE: 0.2,
+                    CONF_BANDS: "mon-fri 07-23=0.25; 23-07=0.12",
+                    CONF_TIERS: "500=0.30",
+                },
+            },
+        },
+        source=config_entries.SOURCE_USER,
+        title=server.username,
+        unique_id=server.username,
+        version=1,
+    )
+    coordinator = ProvidentEnergyDataUpdateCoordinator(
+        hass, entry, server.username, server.password
+    )
+    coordinator.provident_api.batch_size = batch_size
+    return coordinator
+
+
+async def run_refresh(coordinator, server: FakeMeterconnex) -> tuple[float, int, int, int, int, int, float, float, bool]:
+    """Run and measure a single update of the coordinator."""
+    api = coordinator.provident_api
+    server.reset_counters()
+    received_before = api.metrics.bytes_received
+    relogins_before = api.metrics.relogins
+    # Poll even though no new data is expected yet, like the refresh_data service
+    coordinator._force_poll = True
+    coordinator._last_poll = None
+    async with LoopMonitor() as monitor:
+        start = time.perf_counter()
+        data = await coordinator._async_update_data()
+        wall_time = time.perf_counter() - start
+    coordinator.data = data
+
+    return (
+        wall_time,
+        sum(server.requests.values()),
+        server.not_modified,
+        api.metrics.relogins - relogins_before,
+        server.bytes_sent,
+        api.metrics.bytes_received - received_before,
+        monitor.blocked,
+        monitor.max_lag,
+        len(data) == server.meters,
+    )
+
+
+async def run_scenario(
+        scenario: str,
+        meters: int,
+        latency: float,
+        batch_size: int,
+        error_rate: float,
+        session_requests: int | None,
+        expire: bool,
+) -> list[Result]:
+    """Benchmark a cold, a warm and an unchanged refresh for one configuration."""
+    server = FakeMeterconnex(
+        meters=meters, latency=latency, error_rate=error_rate, session_requests=session_requests
+    )
+    runner, base_url = await server.start()
+    results = []
+    try:
+        with tempfile.TemporaryDirectory() as config_dir:
+            hass = await start_hass(config_dir)
+            try:
+                coordinator = create_coordinator(hass, server, base_url, batch_size)
+                for refresh in ("cold", "warm", "unchanged"):
+                    if expire and refresh == "warm":
+                        server.expire_sessions()
+                    measured = await run_refresh(coordinator, server)
+                    results.append(Result(scenario, meters, refresh, *measured))
+            finally:
+                await hass.async_stop()
+    finally:
+        await runner.cleanup()
+    return results
+
+
+def print_results(results: list[Result]) -> None:
+    """Print the results as a table."""
+    header = (
+        f"{'scenario':<10} {'meters':>6} {'refresh':<9} {'wall (s)':>9} {'requests':>8} "
+        f"{'304s':>6} {'relogins':>8} {'bytes':>10} {'wire':>10} {'blocked (ms)':>12} {'max lag (ms)':>12} "
+        f"{'complete':>8}"
+    )
+    print(header)
+    print("-" * len(header))
+    for r in results:
+        print(
+            f"{r.scenario:<10} {r.meters:>6} {r.refresh:<9} {r.wall_time:>9.3f} {r.requests:>8} "
+            f"{r.not_modified:>6} {r.relogins:>8} {r.bytes_sent:>10} {r.bytes_received:>10} "
+            f"{r.blocked * 1000:>12.1f} {r.max_lag * 1000:>12.1f} "
+            f"{'yes' if r.complete else 'no':>8}"
+        )
+
+
+async def main(args: argparse.Namespace) -> bool:
+    """Run every scenario, print the results and tell if they logged in and revalidated as intended."""
+    scenarios = [
+        ("batched", args.batch_size, None, False),
+        ("per-meter", 1, None, False),
+        ("expiring", args.batch_size, args.session_requests, True),
+    ]
+    results = []
+    for meters in args.meters:
+        for scenario, batch_size, session_requests, expire in scenarios:
+            results.extend(
+                await run_scenario(
+                    scenario, meters, args.latency, batch_size, args.error_rate, session_requests, expire
+                )
+            )
+    print_results(results)
+
+    missing = [r for r in results if r.scenario == "expiring" and r.refresh == "warm" and not r.relogins]
+    for r in missing:
+        print(f"No re-login after the sessions expired with {r.meters} meters", file=sys.stderr)
+    # Failed requests are not revalidated, so only expect 304s without errors
+    unvalidated = [
+        r for r in results if r.refresh == "unchanged" and not r.not_modified and not args.error_rate
+    ]
+    for r in unvalidated:
+        print(f"No 304s without new data in the {r.scenario} scenario with {r.meters} meters", file=sys.stderr)
+    return not missing and not unvalidated
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--meters", type=int, nargs="+", default=[1, 5, 50, 500])
+    parser.add_argument("--latency", type=float, default=0.05, help="seconds added to each response")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of 503 responses")
+    parser.add_argument("--batch-size", type=int, default=50)
+    parser.add_argument("--session-requests", type=int, default=None,
+                        help="also expire sessions after this many requests in the expiring scenario")
+    logging.basicConfig(level=logging.WARNING)
+    if not asyncio.run(main(parser.parse_args())):
+        sys.exit(1)
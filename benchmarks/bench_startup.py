@@ -0,0 +1,189 @@
+"""Check the startup cost of the integration against a time budget.
+
+Two things are measured, each repeated and reported as the fastest run:
+
+- Import: the time to import the integration and its sensor platform in a
+  fresh interpreter that already imported what Home Assistant has loaded
+  by the time it sets up integrations, and the third party packages that
+  the import pulled in on top of that.
+- Setup: the time Home Assistant takes to set up a config entry against
+  the local meterconnex stand-in, both the first time, when the initial
+  data has to be fetched, and after a restart, when the last known data
+  is restored from storage. The recorder is set up and the integration
+  imported beforehand, so that only the integration's own setup is timed.
+
+The script exits with status 1 when a measurement exceeds its budget, so
+that it can guard against startup regressions in CI. It needs Home
+Assistant installed, as in the devcontainer.
+
+    python benchmarks/bench_startup.py --import-budget 0.15 --setup-budget 0.5
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from types import MappingProxyType
+
+sys.path.insert(0, os.path.dirname(__file__))
+
+from fake_meterconnex import FakeMeterconnex  # noqa: E402
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), os.pardir))
+PACKAGE = "custom_components.provident_energy"
+
+# Loaded by Home Assistant before it imports a config entry integration
+BASELINE_MODULES = (
+    "aiohttp",
+    "voluptuous",
+    "homeassistant.core",
+    "homeassistant.config_entries",
+    "homeassistant.helpers.config_validation",
+    "homeassistant.helpers.update_coordinator",
+    "homeassistant.helpers.entity_platform",
+    "homeassistant.components.sensor",
+    "homeassistant.components.recorder",
+)
+
+IMPORT_SCRIPT = """
+import importlib, json, sys, time
+for name in {baseline!r}:
+    importlib.import_module(name)
+before = set(sys.modules)
+start = time.perf_counter()
+importlib.import_module({package!r})
+importlib.import_module({package!r} + ".sensor")
+elapsed = time.perf_counter() - start
+loaded = sorted({{name.partition(".")[0] for name in set(sys.modules) - before}} - sys.stdlib_module_names)
+print(json.dumps({{"elapsed": elapsed, "loaded": loaded}}))
+"""
+
+
+def measure_import() -> tuple[float, list[str]]:
+    """Time the import of the integration in a fresh interpreter."""
+    script = IMPORT_SCRIPT.format(baseline=BASELINE_MODULES, package=PACKAGE)
+    output = subprocess.run(
+        [sys.executable, "-c", script], cwd=ROOT, check=True, capture_output=True, text=True
+    ).stdout
+    result = json.loads(output.splitlines()[-1])
+    return result["elapsed"], [name for name in result["loaded"] if name != "custom_components"]
+
+
+async def start_hass(config_dir: str):
+    """Start a Home Assistant instance with the recorder set up, like bootstrap does."""
+    from homeassistant import bootstrap, config_entries, core, loader
+    from homeassistant.helpers import recorder as recorder_helper
+    from homeassistant.setup import async_setup_component
+
+    hass = core.HomeAssistant(config_dir)
+    loader.async_setup(hass)
+    # Loading the base functionality also loads the config entries from storage
+    hass.config_entries = config_entries.ConfigEntries(hass, {})
+    await bootstrap.async_load_base_functionality(hass)
+    recorder_helper.async_initialize_recorder(hass)
+    if not await async_setup_component(hass, "recorder", {"recorder": {}}):
+        raise RuntimeError("Failed to set up the recorder")
+    await hass.async_start()
+    return hass
+
+
+async def measure_setup(server: FakeMeterconnex, base_url: str) -> tuple[float, float]:
+    """Time the setup of a new config entry, and of the same entry after a restart."""
+    from homeassistant import config_entries
+
+    with tempfile.TemporaryDirectory() as config_dir:
+        os.symlink(os.path.join(ROOT, "custom_components"), os.path.join(config_dir, "custom_components"))
+        sys.path.insert(0, config_dir)
+        from custom_components.provident_energy.const import (
+            CONF_BASE_URL,
+            CONF_PASSWORD,
+            CONF_USERNAME,
+            DOMAIN,
+        )
+
+        entry = config_entries.ConfigEntry(
+            data={CONF_USERNAME: server.username, CONF_PASSWORD: server.password, CONF_BASE_URL: base_url},
+            discovery_keys=MappingProxyType({}),
+            domain=DOMAIN,
+            minor_version=1,
+            options={},
+            source=config_entries.SOURCE_USER,
+            title=server.username,
+            unique_id=server.username,
+            version=1,
+        )
+
+        try:
+            hass = await start_hass(config_dir)
+            try:
+                start = time.perf_counter()
+                await hass.config_entries.async_add(entry)
+                first = time.perf_counter() - start
+                if entry.state is not config_entries.ConfigEntryState.LOADED:
+                    raise RuntimeError(f"Setup failed: {entry.state}")
+            finally:
+                # Stopping writes the data to restore to storage
+                await hass.async_stop()
+
+            hass = await start_hass(config_dir)
+            try:
+                start = time.perf_counter()
+                if not await hass.config_entries.async_setup(entry.entry_id):
+                    raise RuntimeError("Setup after the restart failed")
+                restart = time.perf_counter() - start
+            finally:
+                await hass.async_stop()
+        finally:
+            sys.path.remove(config_dir)
+
+    return first, restart
+
+
+async def measure_setups(args: argparse.Namespace) -> tuple[float, float]:
+    """Time the setups against the stand-in, keeping the fastest runs."""
+    server = FakeMeterconnex(meters=args.meters, latency=args.latency)
+    runner, base_url = await server.start()
+    try:
+        runs = [await measure_setup(server, base_url) for _ in range(args.repeat)]
+    finally:
+        await runner.cleanup()
+    return min(run[0] for run in runs), min(run[1] for run in runs)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--import-budget", type=float, default=0.15, help="seconds")
+    parser.add_argument("--setup-budget", type=float, default=0.5, help="seconds, for each setup")
+    parser.add_argument("--meters", type=int, default=5)
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds added to each response")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    import_runs = [measure_import() for _ in range(args.repeat)]
+    import_time = min(elapsed for elapsed, _ in import_runs)
+    loaded = import_runs[0][1]
+    first_setup, restart_setup = asyncio.run(measure_setups(args))
+
+    results = [
+        ("import", import_time, args.import_budget),
+        ("first setup", first_setup, args.setup_budget),
+        ("setup after restart", restart_setup, args.setup_budget),
+    ]
+    print(f"{'measurement':<20} {'time (ms)':>10} {'budget (ms)':>12}")
+    print("-" * 44)
+    for name, elapsed, budget in results:
+        flag = "" if elapsed <= budget else "  over budget"
+        print(f"{name:<20} {elapsed * 1000:>10.1f} {budget * 1000:>12.1f}{flag}")
+    print(f"\nPackages imported with the integration: {', '.join(loaded) or 'none'}")
+
+    if any(elapsed > budget for _, elapsed, budget in results):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,241 @@
+"""Local stand-in for the meterconnex.com endpoints used by the integration.
+
+Serves the login, meter tree and quickgraphs endpoints for a configurable
+number of meters, and can inject latency, server errors and session
+expiry. JSON responses carry an ETag, are answered with a 304 when it
+matches, and are compressed when the client accepts it. Every response
+is counted so that benchmarks can report request counts, 304s and the
+bytes of the bodies before compression.
+
+Run it on its own to point the debug example or a development instance
+at it:
+
+    python benchmarks/fake_meterconnex.py --meters 20 --latency 0.2
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import hashlib
+import json
+import logging
+import random
+import secrets
+from collections import Counter
+from dataclasses import dataclass, field
+from datetime import datetime
+
+from aiohttp import web
+
+_LOGGER = logging.getLogger(__name__)
+
+LOGIN_PATH = "/login/LoginService.aspx/ProcessLogin"
+ROOT_NODES_PATH = "/api/internal/metertree/rootnodes"
+QUICKGRAPHS_PATH = "/api/internal/graphs/quickgraphs"
+SESSION_COOKIE = "ASP.NET_SessionId"
+
+UTILITIES = [
+    ("Electricity (kWh)", "Electricity"),
+    ("Cold Water (m3)", "Cold Water"),
+    ("Hot Water (m3)", "Hot Water"),
+    ("Heating (kWh)", "Heating"),
+    ("Cooling (kWh)", "Cooling"),
+]
+
+
+@dataclass
+class FakeMeterconnex:
+    """Configuration, state and counters of the fake server."""
+
+    meters: int = 5
+    username: str = "test_user"
+    password: str = "test_password"
+    latency: float = 0.0
+    error_rate: float = 0.0
+    session_requests: int | None = None
+    batch: bool = True
+
+    requests: Counter = field(default_factory=Counter)
+    bytes_sent: int = 0
+    not_modified: int = 0
+    _sessions: dict[str, int] = field(default_factory=dict)
+
+    @property
+    def meter_ids(self) -> list[str]:
+        """Get the ids of all meters."""
+        return [f"m{index}" for index in range(self.meters)]
+
+    def reset_counters(self) -> None:
+        """Reset the request and byte counters."""
+        self.requests.clear()
+        self.bytes_sent = 0
+        self.not_modified = 0
+
+    def expire_sessions(self) -> None:
+        """Expire every session, as if the server restarted."""
+        self._sessions.clear()
+
+    def make_app(self) -> web.Application:
+        """Create the aiohttp application."""
+        app = web.Application(middlewares=[self._middleware])
+        app.router.add_get("/", self._handle_root)
+        app.router.add_post(LOGIN_PATH, self._handle_login)
+        app.router.add_get(ROOT_NODES_PATH, self._handle_root_nodes)
+        app.router.add_get(QUICKGRAPHS_PATH, self._handle_quickgraphs)
+        return app
+
+    async def start(self, host: str = "127.0.0.1", port: int = 0) -> tuple[web.AppRunner, str]:
+        """Start serving and return the runner and base URL."""
+        runner = web.AppRunner(self.make_app())
+        await runner.setup()
+        site = web.TCPSite(runner, host, port)
+        await site.start()
+        bound_port = runner.addresses[0][1]
+        return runner, f"http://{host}:{bound_port}"
+
+    @web.middleware
+    async def _middleware(self, request: web.Request, handler) -> web.StreamResponse:
+        self.requests[request.path] += 1
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        if self.error_rate and random.random() < self.error_rate:
+            response = web.Response(status=503, text="Service Unavailable")
+        else:
+            response = await handler(request)
+        if response.body is not None:
+            self.bytes_sent += len(response.body)
+        return response
+
+    def _check_session(self, request: web.Request) -> bool:
+        """Check the session cookie of a request and count the request against it."""
+        session_id = request.cookies.get(SESSION_COOKIE)
+        if session_id not in self._sessions:
+            return False
+        self._sessions[session_id] += 1
+        if self.session_requests is not None and self._sessions[session_id] > self.session_requests:
+            del self._sessions[session_id]
+            return False
+        return True
+
+    async def _handle_root(self, request: web.Request) -> web.Response:
+        response = web.Response(text="<html></html>", content_type="text/html")
+        response.set_cookie(SESSION_COOKIE, secrets.token_hex(12))
+        return response
+
+    async def _handle_login(self, request: web.Request) -> web.Response:
+        payload = await request.json()
+        if payload.get("username") != self.username or payload.get("password") != self.password:
+            return web.json_response({"d": {"success": False}})
+
+        session_id = request.cookies.get(SESSION_COOKIE) or secrets.token_hex(12)
+        self._sessions[session_id] = 0
+        response = web.json_response({"d": {"success": True}})
+        response.set_cookie(SESSION_COOKIE, session_id)
+        return response
+
+    async def _handle_root_nodes(self, request: web.Request) -> web.Response:
+        if not self._check_session(request):
+            return web.Response(status=401)
+
+        nodes = [{"id": "g0", "parent": "#", "text": "Unit 101", "a_attr": {"title": "Unit 101"}}]
+        for index, meter_id in enumerate(self.meter_ids):
+            utility, _ = UTILITIES[index % len(UTILITIES)]
+            nodes.append({
+                "id": meter_id,
+                "parent": "g0",
+                "text": f"Meter {index} {utility}",
+                "a_attr": {"title": f"METER-{index:05d}"},
+            })
+        return self._json_response(request, nodes)
+
+    async def _handle_quickgraphs(self, request: web.Request) -> web.Response:
+        if not self._check_session(request):
+            return web.Response(status=401)
+
+        try:
+            meter_list = request.query["meterlist"].split(",")
+            start = datetime.strptime(request.query["startDate"], "%Y-%m-%d")
+            end = datetime.strptime(request.query["endDate"], "%Y-%m-%d")
+        except (KeyError, ValueError):
+            return web.Response(status=400)
+
+        if len(meter_list) > 1 and not self.batch:
+            return web.Response(status=400)
+
+        known = set(self.meter_ids)
+        if any(meter_id not in known for meter_id in meter_list):
+            return web.Response(status=404)
+
+        hours = int((end - start).total_seconds() // 3600)
+        now = datetime.now()
+        series = []
+        for meter_id in meter_list:
+            index = int(meter_id[1:])
+            utility, _ = UTILITIES[index % len(UTILITIES)]
+            data = []
+            for hour in range(hours):
+                timestamp = start.timestamp() + hour * 3600
+                if timestamp >= now.timestamp() - 2 * 3600:
+                    data.append(None)
+                else:
+                    data.append(round(((timestamp // 3600) % 24 + index) / 10, 3))
+            series.append({
+                "name": f"Meter {index} {utility}",
+                "site": "Fake Site",
+                "utility": utility,
+                "data": data,
+            })
+        return self._json_response(request, series)
+
+    def _json_response(self, request: web.Request, data) -> web.Response:
+        """Create a compressed JSON response, or a 304 if the client has it already."""
+        text = json.dumps(data)
+        etag = hashlib.sha1(text.encode()).hexdigest()[:16]
+        if request.headers.get("If-None-Match") == f'"{etag}"':
+            self.not_modified += 1
+            return web.Response(status=304, headers={"ETag": f'"{etag}"'})
+
+        response = web.Response(text=text, content_type="application/json")
+        response.etag = etag
+        response.enable_compression()
+        return response
+
+
+async def _serve(args: argparse.Namespace) -> None:
+    server = FakeMeterconnex(
+        meters=args.meters,
+        latency=args.latency,
+        error_rate=args.error_rate,
+        session_requests=args.session_requests,
+        batch=not args.no_batch,
+    )
+    runner, base_url = await server.start(args.host, args.port)
+    _LOGGER.info(f"Serving {args.meters} meters on {base_url}")
+    try:
+        await asyncio.Event().wait()
+    finally:
+        await runner.cleanup()
+
+
+def main() -> None:
+    """Run the fake server until interrupted."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--meters", type=int, default=5)
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds added to each response")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of 503 responses")
+    parser.add_argument("--session-requests", type=int, default=None,
+                        help="requests after which a session expires")
+    parser.add_argument("--no-batch", action="store_true", help="reject batched meter lists")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    try:
+        asyncio.run(_serve(args))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -1,12 +1,41 @@
 """Provident Energy integration for Home Assistant."""
 from __future__ import annotations
 
+import asyncio
 import logging
+from datetime import timedelta
+from typing import TYPE_CHECKING
+
+import voluptuous as vol
+
 from homeassistant.config_entries import ConfigEntry
 from homeassistant.const import Platform
-from homeassistant.core import HomeAssistant
+from homeassistant.core import HomeAssistant, ServiceCall
+from homeassistant.exceptions import ServiceValidationError
+from homeassistant.helpers import config_validation as cv
+from homeassistant.helpers.event import async_track_time_interval
+from homeassistant.helpers.importlib import async_import_module
+from homeassistant.helpers.service import async_extract_config_entry_ids
+from homeassistant.helpers.storage import Store
+from homeassistant.helpers.typing import ConfigType
 
-from .const import DOMAIN
+from .const import (
+    ATTR_CONFIG_ENTRY_ID,
+    BACKFILL_INTERVAL,
+    CONF_PASSWORD,
+    CONF_USERNAME,
+    DOMAIN,
+    SERVICE_REFRESH_DATA,
+    STORAGE_KEY_BACKFILL,
+    STORAGE_KEY_METER_TREE,
+    STORAGE_KEY_SESSION,
+    STORAGE_KEY_SNAPSHOT,
+    STORAGE_VERSION,
+)
+from .transport import async_get_transport
+
+if TYPE_CHECKING:
+    from .coordinator import ProvidentEnergyDataUpdateCoordinator
 
 _LOGGER = logging.getLogger(__name__)
 
@@ -14,20 +43,132 @@ _LOGGER = logging.getLogger(__name__)
 # e.g. "sensor.py" for Platform.SENSOR
 PLATFORMS: list[Platform] = [Platform.SENSOR]
 
+CONFIG_SCHEMA = cv.config_entry_only_config_schema(DOMAIN)
+
+# Unlike cv.make_entity_service_schema(), the target is optional, so that
+# every account is refreshed without one
+REFRESH_DATA_SCHEMA = vol.Schema(
+    {
+        **cv.ENTITY_SERVICE_FIELDS,
+        vol.Optional(ATTR_CONFIG_ENTRY_ID): cv.string,
+    }
+)
+
+
+async def async_setup(hass: HomeAssistant, config: ConfigType) -> bool:
+    """Set up the Provident Energy services."""
+
+    async def async_refresh_data(call: ServiceCall) -> None:
+        """Refresh the accounts targeted by a service call, or all of them."""
+        domain_data = hass.data.get(DOMAIN, {})
+        coordinators: dict[str, ProvidentEnergyDataUpdateCoordinator] = {
+            entry.entry_id: domain_data[entry.entry_id]
+            for entry in hass.config_entries.async_entries(DOMAIN)
+            if entry.entry_id in domain_data
+        }
+
+        entry_ids = await async_extract_config_entry_ids(hass, call)
+        if ATTR_CONFIG_ENTRY_ID in call.data:
+            entry_ids.add(call.data[ATTR_CONFIG_ENTRY_ID])
+        if entry_ids:
+            entry_ids.intersection_update(coordinators)
+            if not entry_ids:
+                raise ServiceValidationError("No loaded Provident Energy account was targeted")
+        else:
+            entry_ids = set(coordinators)
+
+        await asyncio.gather(
+            *(coordinators[entry_id].async_request_manual_refresh() for entry_id in entry_ids)
+        )
+
+    hass.services.async_register(
+        DOMAIN, SERVICE_REFRESH_DATA, async_refresh_data, schema=REFRESH_DATA_SCHEMA
+    )
+    return True
+
 
 async def async_setup_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
-    """Set up Provident Energy from a config entry."""
+    """Set up Provident Energy from a config entry.
+
+    The coordinator, API client and their dependencies are only imported
+    here, off the event loop, so loading the integration stays cheap.
+    """
+    coordinator_module = await async_import_module(hass, f"{__name__}.coordinator")
+    coordinator = coordinator_module.ProvidentEnergyDataUpdateCoordinator(
+        hass, entry, entry.data[CONF_USERNAME], entry.data[CONF_PASSWORD]
+    )
+
+    # With the last known data restored, the entities are created from it and
+    # refreshed in the background, so a slow or unreachable site doesn't delay
+    # startup. Otherwise fetch initial data so we have data when entities subscribe
+    restored = await coordinator.async_restore()
+    if not restored:
+        await coordinator.async_config_entry_first_refresh()
+
     hass.data.setdefault(DOMAIN, {})
-    hass.data[DOMAIN][entry.entry_id] = entry.data
+    hass.data[DOMAIN][entry.entry_id] = coordinator
 
     await hass.config_entries.async_forward_entry_setups(entry, PLATFORMS)
 
+    if restored:
+        entry.async_create_background_task(
+            hass, coordinator.async_refresh(), f"{DOMAIN}_refresh_{entry.entry_id}"
+        )
+
+    # Import the history into long-term statistics in the background
+    entry.async_create_background_task(
+        hass,
+        _async_start_backfill(hass, entry, coordinator),
+        f"{DOMAIN}_backfill_{entry.entry_id}",
+    )
+
+    # Reload to apply changed options, like the tariffs
+    entry.async_on_unload(entry.add_update_listener(async_reload_entry))
+
     return True
 
 
+async def _async_start_backfill(
+    hass: HomeAssistant, entry: ConfigEntry, coordinator: ProvidentEnergyDataUpdateCoordinator
+) -> None:
+    """Run the backfill now and then at every BACKFILL_INTERVAL.
+
+    After the history, the days that complete while Home Assistant is running
+    are imported. The backfill and its dependencies aren't needed to set up
+    the entities, so they are only imported here, off the event loop.
+    """
+    backfill_module = await async_import_module(hass, f"{__name__}.backfill")
+    backfill = backfill_module.ProvidentEnergyBackfill(
+        hass, entry, coordinator.provident_api, tariffs=coordinator.tariffs
+    )
+    entry.async_on_unload(
+        async_track_time_interval(
+            hass, backfill.async_run, timedelta(seconds=BACKFILL_INTERVAL)
+        )
+    )
+    await backfill.async_run()
+
+
+async def async_reload_entry(hass: HomeAssistant, entry: ConfigEntry) -> None:
+    """Reload a config entry after its options changed."""
+    await hass.config_entries.async_reload(entry.entry_id)
+
+
 async def async_unload_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
     """Unload a config entry."""
     if unload_ok := await hass.config_entries.async_unload_platforms(entry, PLATFORMS):
         hass.data[DOMAIN].pop(entry.entry_id)
+        async_get_transport(hass).async_unregister(entry.entry_id)
+
+    return unload_ok
+
 
-    return unload_ok
\ No newline at end of file
+async def async_remove_entry(hass: HomeAssistant, entry: ConfigEntry) -> None:
+    """Remove the data persisted for a config entry."""
+    for key in (
+        STORAGE_KEY_METER_TREE,
+        STORAGE_KEY_SESSION,
+        STORAGE_KEY_BACKFILL,
+        STORAGE_KEY_SNAPSHOT,
+    ):
+        await Store(hass, STORAGE_VERSION, f"{key}.{entry.entry_id}").async_remove()
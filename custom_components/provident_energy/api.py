@@ -1,17 +1,58 @@
 """API client for Provident Energy."""
 
+import asyncio
 import json
 import logging
+import random
 import re
-from dataclasses import dataclass
-from datetime import datetime, timedelta
-from typing import Dict, List, Optional
+import time
+from dataclasses import asdict, dataclass, replace
+from datetime import datetime, timedelta, tzinfo
+from typing import Any, Dict, List, Optional, Tuple
+
+import aiohttp
+
+from .const import (
+    API_BASE_URL,
+    API_LOGIN_ENDPOINT,
+    API_MAX_RETRIES,
+    API_QUICKGRAPHS_ENDPOINT,
+    API_RETRY_BASE_DELAY,
+    API_RETRY_MAX_DELAY,
+    API_ROOT_NODES_ENDPOINT,
+    API_SESSION_COOKIE,
+    API_TIMEOUT,
+    API_USER_AGENT,
+    DEFAULT_BATCH_REJECTED_TTL,
+    DEFAULT_BATCH_SIZE,
+    DEFAULT_MAX_CONCURRENT_REQUESTS,
+    DEFAULT_METER_TREE_TTL,
+    DEFAULT_RESPONSE_CACHE_SIZE,
+    RESPONSE_CACHE_ENTRIES_PER_METER,
+    UTILITY_UNITS,
+)
+from .circuit import CircuitBreaker
+from .metrics import (
+    ENDPOINT_LOGIN,
+    ENDPOINT_PROBE,
+    ENDPOINT_QUICKGRAPHS,
+    ENDPOINT_ROOT_NODES,
+    ENDPOINT_SESSION,
+    ApiMetrics,
+)
+from .httpcache import ACCEPT_ENCODING, CachedResponse, ResponseCache
+from .ratelimit import RateLimiter
+from .series import ConsumptionSeries
 
-import requests
+_LOGGER = logging.getLogger(__name__)
 
-from .const import *
+# Utility names come with their units, e.g. "Electricity (kWh)"
+_UTILITY_NAME_PATTERN = re.compile(r"^(.*)\s\(.*\)$")
 
-_LOGGER = logging.getLogger(__name__)
+_ENDPOINT_METRICS = {
+    API_ROOT_NODES_ENDPOINT: ENDPOINT_ROOT_NODES,
+    API_QUICKGRAPHS_ENDPOINT: ENDPOINT_QUICKGRAPHS,
+}
 
 
 @dataclass
@@ -28,62 +69,189 @@ class UtilityGroup:
     text: str
     utilities: List[Utility]
 
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "UtilityGroup":
+        """Create a utility group from its dataclasses.asdict() form."""
+        return cls(
+            id=data["id"],
+            text=data["text"],
+            utilities=[Utility(**utility) for utility in data["utilities"]]
+        )
+
 
 @dataclass
 class Consumption:
-    """Class to store daily consumption data."""
+    """Class to store hourly consumption data.
+
+    Two instances compare equal when their meter, names, units and every
+    hourly value match. The values are compared as their packed buffers of
+    doubles, in a single pass rather than one value at a time.
+    """
 
     utility: Utility
     utility_name: str
     units: str
     name: str
     site: str
-    start_date: datetime
-    end_date: datetime
-    data: List[float]
+    data: ConsumptionSeries
+
+    @property
+    def start_date(self) -> datetime:
+        """Get the start of the first hour of data."""
+        return self.data.start
+
+    @property
+    def end_date(self) -> datetime:
+        """Get the end of the last hour of data."""
+        return self.data.end
+
+    def value_at(self, timestamp: datetime) -> Optional[float]:
+        """Get the hourly value covering a timestamp, if the data has one."""
+        return self.data.value_at(timestamp)
+
+    def high_water_mark(self, now: datetime) -> Optional[datetime]:
+        """Get the start of the latest hour up to now that has a value."""
+        return self.data.last_valid(now)
+
+    def merge(self, newer: "Consumption", start_date: datetime, end_date: datetime) -> "Consumption":
+        """Merge newer data into this series and re-window it to [start_date, end_date).
+
+        Values from the newer data win, except where the newer data has no value
+        for an hour this series already knows.
+        """
+        return replace(newer, data=self.data.merge(newer.data, start_date, end_date))
+
+    def as_dict(self) -> Dict[str, Any]:
+        """Get the consumption data in a JSON serializable form."""
+        return {
+            "utility": asdict(self.utility),
+            "utility_name": self.utility_name,
+            "units": self.units,
+            "name": self.name,
+            "site": self.site,
+            "start": self.data.start.isoformat(),
+            "values": self.data.to_list(),
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "Consumption":
+        """Create consumption data from its as_dict() form."""
+        return cls(
+            utility=Utility(**data["utility"]),
+            utility_name=data["utility_name"],
+            units=data["units"],
+            name=data["name"],
+            site=data["site"],
+            data=ConsumptionSeries(datetime.fromisoformat(data["start"]), data["values"]),
+        )
+
+
+def get_consumption_window(now: Optional[datetime] = None) -> Tuple[datetime, datetime]:
+    """Get the window of hourly data the integration keeps: yesterday and today."""
+    today = (now or datetime.now()).replace(hour=0, minute=0, second=0, microsecond=0)
+    return today - timedelta(days=1), today + timedelta(days=1)
 
 
 class ProvidentEnergyAPI:
     """API client for Provident Energy."""
 
-    def __init__(self, username: str, password: str):
+    def __init__(
+            self,
+            session: aiohttp.ClientSession,
+            username: str,
+            password: str,
+            max_concurrency: int = DEFAULT_MAX_CONCURRENT_REQUESTS,
+            batch_size: int = DEFAULT_BATCH_SIZE,
+            meter_tree_ttl: timedelta = timedelta(seconds=DEFAULT_METER_TREE_TTL),
+            rate_limiter: Optional[RateLimiter] = None,
+            base_url: str = API_BASE_URL,
+            circuit_breaker: Optional[CircuitBreaker] = None,
+            time_zone: Optional[tzinfo] = None,
+    ):
         """Initialize the API client.
 
         Args:
+            session: aiohttp client session used for all requests
             username: Provident Energy account username
             password: Provident Energy account password
+            max_concurrency: Maximum number of consumption requests in flight at once
+            batch_size: Maximum number of meters per batched consumption request,
+                or 1 to always request meters individually
+            meter_tree_ttl: How long the meter tree is reused before it is requested again
+            rate_limiter: Limiter every request waits on, e.g. one shared between accounts
+            base_url: Address of the meterconnex site, e.g. a local stand-in for testing
+            circuit_breaker: Breaker of the site's host, e.g. one shared between accounts,
+                to fail fast while the site is down
+            time_zone: Time zone of the hourly data, which sets the days of the current
+                window, defaults to the system's
         """
+        self.session = session
         self.username = username
         self.password = password
         self.authenticated = False
+        self._cookies: Dict[str, str] = {}
+        self.batch_size = batch_size
+        # When the server last rejected a batched request, to skip batching for a while
+        self.batch_rejected: Optional[datetime] = None
+        self.meter_tree_ttl = meter_tree_ttl
+        self.utility_groups: Optional[List[UtilityGroup]] = None
+        self.utility_groups_updated: Optional[datetime] = None
+        self.rate_limiter = rate_limiter
+        self.base_url = base_url
+        self.circuit_breaker = circuit_breaker
+        self.time_zone = time_zone
+        self.metrics = ApiMetrics()
+        self.response_cache = ResponseCache()
+        self._semaphore = asyncio.Semaphore(max(1, max_concurrency))
+        self._auth_lock = asyncio.Lock()
+        # Bumped by every login, whether it succeeds or not
+        self._login_attempts = 0
+
+    async def _init_session(self) -> None:
+        """Initialize the session cookies."""
+        self._cookies = {}
+        await self._request(
+            ENDPOINT_SESSION, "GET", f"{self.base_url}", headers={"User-Agent": API_USER_AGENT}
+        )
+
+    async def login(self) -> bool:
+        """Log in to the Provident Energy API.
 
-    def _init_session(self) -> bool:
-        """Initialize the requests session."""
-
+        Returns:
+            bool: True if login was successful, False otherwise
+        """
         try:
-            self.session = requests.Session()
-            response = self.session.get(
-                f"{API_BASE_URL}",
-                headers={"User-Agent": API_USER_AGENT}
-            )
-            response.raise_for_status()
-        except requests.RequestException as e:
-            _LOGGER.error(f"Failed to initialize session: {e}")
+            return await self.authenticate()
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            _LOGGER.error(f"Failed to log in to Provident Energy API: {e}")
             return False
-        return True
 
-    def login(self) -> bool:
-        """Log in to the Provident Energy API.
+    async def authenticate(self) -> bool:
+        """Log in to the Provident Energy API, raising if the site can't be reached.
+
+        Unlike login(), this tells rejected credentials apart from a site
+        that is down, e.g. to report either when setting up an account.
 
         Returns:
-            bool: True if login was successful, False otherwise
+            bool: True if login was successful, False if the credentials were rejected
+
+        Raises:
+            aiohttp.ClientError: If the site could not be reached or returned an error
+            asyncio.TimeoutError: If the site did not respond in time
         """
-        try:
-            self._init_session()
+        self._login_attempts += 1
+
+        # A session cookie from before the login can be reused as is, so
+        # only start a new session when we don't have one yet
+        if API_SESSION_COOKIE not in self._cookies:
+            await self._init_session()
 
+        try:
             # Make a POST request to the login endpoint with the required payload
-            response = self.session.post(
-                f"{API_BASE_URL}{API_LOGIN_ENDPOINT}",
+            body = await self._request(
+                ENDPOINT_LOGIN,
+                "POST",
+                f"{self.base_url}{API_LOGIN_ENDPOINT}",
                 json={
                     "username": self.username,
                     "password": self.password,
@@ -92,43 +260,58 @@ class ProvidentEnergyAPI:
                 headers={
                     "Content-Type": "application/json",
                     "User-Agent": API_USER_AGENT
-                }
+                },
             )
-            response.raise_for_status()
+        except aiohttp.ClientResponseError as e:
+            if e.status not in (400, 401, 403):
+                raise
+            _LOGGER.error(f"Provident Energy API rejected the login: {e}")
+            return False
 
-            # Check if we received the ASP.NET_SessionId cookie
-            if "ASP.NET_SessionId" in self.session.cookies:
-                self.authenticated = True
-                _LOGGER.info("Successfully logged in to Provident Energy API")
-                return True
-            else:
-                _LOGGER.error("No session cookie received from Provident Energy API")
-                return False
+        if not self._is_login_accepted(body):
+            _LOGGER.error("Provident Energy API rejected the username or password")
+            return False
 
-        except requests.RequestException as e:
-            _LOGGER.error(f"Failed to log in to Provident Energy API: {e}")
+        # Check if we received the ASP.NET_SessionId cookie
+        if API_SESSION_COOKIE in self._cookies:
+            self.authenticated = True
+            _LOGGER.info("Successfully logged in to Provident Energy API")
+            return True
+        else:
+            _LOGGER.error("No session cookie received from Provident Energy API")
             return False
 
-    def get_utility_groups(self) -> Optional[List[UtilityGroup]]:
+    @property
+    def session_cookies(self) -> Dict[str, str]:
+        """Get the cookies of the current session, e.g. to persist them."""
+        return dict(self._cookies)
+
+    def restore_session(self, cookies: Dict[str, str]) -> None:
+        """Reuse the cookies of an earlier session instead of logging in again.
+
+        The session is assumed to still be valid; the first request that gets
+        a 401 back will log in again.
+        """
+        if API_SESSION_COOKIE not in cookies:
+            return
+        self._cookies = dict(cookies)
+        self.authenticated = True
+
+    def _expire_session(self) -> None:
+        """Forget the current session after the server rejected it."""
+        self.authenticated = False
+        self._cookies = {}
+
+    async def get_utility_groups(self) -> Optional[List[UtilityGroup]]:
         """Get the list of utility groups."""
 
-        if not self._check_auth():
+        if not await self._check_auth():
             _LOGGER.error("Failed to authenticate with Provident Energy API")
             return None
 
         try:
 
-            response = self.session.get(
-                f"{API_BASE_URL}{API_ROOT_NODES_ENDPOINT}",
-                params={"depth": 2},
-                headers={
-                    "Content-Type": "application/json",
-                    "User-Agent": API_USER_AGENT
-                }
-            )
-            response.raise_for_status()
-
-            data = response.json()
+            data = await self._get_json(API_ROOT_NODES_ENDPOINT, {"depth": 2}, cache=True)
             if len(data) == 0:
                 _LOGGER.error("No utility groups found")
                 return None
@@ -148,128 +331,606 @@ class ProvidentEnergyAPI:
 
             return list(utility_groups.values())
 
-        except (requests.RequestException, json.JSONDecodeError, KeyError) as e:
-            # If unauthorized, try to log in again
-            if isinstance(e, requests.RequestException) and e.response and e.response.status_code == 401:
-                _LOGGER.info("Session expired, logging in again")
-                self.authenticated = False
-                if self.login():
-                    return self.get_utility_groups()
-
+        except (aiohttp.ClientError, asyncio.TimeoutError, json.JSONDecodeError, KeyError) as e:
             _LOGGER.error(f"Failed to get utilities: {e}")
             return None
 
-    def get_utility_consumption(self, utility: Utility) -> Optional[Consumption]:
+    async def get_cached_utility_groups(self) -> Optional[List[UtilityGroup]]:
+        """Get the list of utility groups, reusing the meter tree until it expires."""
+        if (
+            self.utility_groups
+            and self.utility_groups_updated is not None
+            and datetime.now() - self.utility_groups_updated < self.meter_tree_ttl
+        ):
+            return self.utility_groups
+
+        groups = await self.get_utility_groups()
+        if groups:
+            self.set_utility_groups(groups, datetime.now())
+        return groups
+
+    def set_utility_groups(self, groups: List[UtilityGroup], updated: datetime) -> None:
+        """Set the cached meter tree, e.g. when restoring it from storage."""
+        self.utility_groups = groups
+        self.utility_groups_updated = updated
+        # Keep the responses of every meter's polls, however many meters there are
+        meters = sum(len(group.utilities) for group in groups)
+        self.response_cache.resize(
+            max(DEFAULT_RESPONSE_CACHE_SIZE, RESPONSE_CACHE_ENTRIES_PER_METER * meters + 1)
+        )
+
+    def invalidate_utility_groups(self) -> None:
+        """Drop the cached meter tree so the next refresh requests it again."""
+        if self.utility_groups is not None:
+            _LOGGER.info("Meter tree is out of date, it will be requested again")
+        self.utility_groups = None
+        self.utility_groups_updated = None
+        # A batch may have been rejected because of the meter that went away
+        self.batch_rejected = None
+
+    async def get_utility_consumption(
+            self,
+            utility: Utility,
+            start_date: Optional[datetime] = None,
+            end_date: Optional[datetime] = None,
+    ) -> Optional[Consumption]:
         """Get energy consumption data for a specific utility.
 
         Args:
             utility: The utility type to get consumption data for
+            start_date: Midnight of the first day to get data for, defaults to yesterday
+            end_date: Midnight after the last day to get data for, defaults to tomorrow
 
         Returns:
             Optional[Consumption]: Consumption data for the utility, or None if there was an error
         """
+        try:
+            consumption = await self.fetch_utility_consumption(utility, start_date, end_date)
+        except (aiohttp.ClientError, asyncio.TimeoutError, KeyError, ValueError) as e:
+            _LOGGER.error(f"Failed to get energy data for {utility}: {e}")
+            return None
+
+        if consumption is None:
+            _LOGGER.error(f"No energy data found for {utility}")
+        return consumption
+
+    async def fetch_utility_consumption(
+            self,
+            utility: Utility,
+            start_date: Optional[datetime] = None,
+            end_date: Optional[datetime] = None,
+    ) -> Optional[Consumption]:
+        """Get energy consumption data for a specific utility, raising on failures.
+
+        Unlike get_utility_consumption(), this tells a failed request apart
+        from a range the server has no data for, e.g. so that the failed one
+        can be requested again later.
+
+        Args:
+            utility: The utility type to get consumption data for
+            start_date: Midnight of the first day to get data for, defaults to yesterday
+            end_date: Midnight after the last day to get data for, defaults to tomorrow
+
+        Returns:
+            Optional[Consumption]: Consumption data for the utility, or None if the
+            server returned no data for it
+
+        Raises:
+            aiohttp.ClientError: If logging in or the request failed
+            asyncio.TimeoutError: If the request timed out
+            KeyError, ValueError: If the response could not be parsed
+        """
+        if not await self._check_auth():
+            raise aiohttp.ClientError("Failed to authenticate with Provident Energy API")
 
-        if not self._check_auth():
+        start_date, end_date = self._get_date_range(start_date, end_date)
+
+        try:
+            # Make a GET request to the QuickGraphs endpoint
+            # This will return 24 data points per day, e.g. 48 for yesterday and today
+            data = await self._get_json(
+                API_QUICKGRAPHS_ENDPOINT,
+                {
+                    "aggregateGroups": "true",
+                    "meterlist": utility.id,
+                    "startDate": start_date.strftime("%Y-%m-%d"),
+                    "endDate": end_date.strftime("%Y-%m-%d")
+                },
+                cache=self._is_polled_range(end_date),
+            )
+        except aiohttp.ClientError as e:
+            if self._is_unknown_meter_error(e):
+                self.invalidate_utility_groups()
+            raise
+
+        # Parse the response
+        if len(data) == 0:
+            return None
+
+        consumption = self._parse_consumption(utility, data[0], start_date, end_date)
+
+        _LOGGER.debug(f"Retrieved energy data for {consumption.utility_name}: {consumption}")
+        return consumption
+
+    async def get_utility_consumption_batch(
+            self,
+            utilities: List[Utility],
+            start_date: Optional[datetime] = None,
+            end_date: Optional[datetime] = None,
+    ) -> Optional[Dict[str, Consumption]]:
+        """Get energy consumption data for several utilities in a single request.
+
+        Args:
+            utilities: The utilities to get consumption data for
+            start_date: Midnight of the first day to get data for, defaults to yesterday
+            end_date: Midnight after the last day to get data for, defaults to tomorrow
+
+        Returns:
+            Optional[Dict[str, Consumption]]: Consumption data keyed by utility id, empty if the
+            server has no data for the range, or None if the request failed, the server rejected
+            the batch or its series could not be matched to the meters
+        """
+
+        if not await self._check_auth():
             _LOGGER.error("Failed to authenticate with Provident Energy API")
             return None
 
         try:
 
-            today = datetime.now()
-            yesterday = today - timedelta(days=1)
-            tomorrow = today + timedelta(days=1)
+            start_date, end_date = self._get_date_range(start_date, end_date)
 
-            # Make a GET request to the QuickGraphs endpoint
-            # This will return 48 data points (24 for yesterday, 24 for today)
-            response = self.session.get(
-                f"{API_BASE_URL}{API_QUICKGRAPHS_ENDPOINT}",
-                params={
-                    "aggregateGroups": True,
-                    "meterlist": utility.id,
-                    "startDate": yesterday.strftime("%Y-%m-%d"),
-                    "endDate": tomorrow.strftime("%Y-%m-%d")
+            # Ask for one series per meter instead of an aggregate over the list
+            data = await self._get_json(
+                API_QUICKGRAPHS_ENDPOINT,
+                {
+                    "aggregateGroups": "false",
+                    "meterlist": ",".join(utility.id for utility in utilities),
+                    "startDate": start_date.strftime("%Y-%m-%d"),
+                    "endDate": end_date.strftime("%Y-%m-%d")
                 },
-                headers={
-                    "Content-Type": "application/json",
-                    "User-Agent": API_USER_AGENT
-                }
+                cache=self._is_polled_range(end_date),
             )
-            response.raise_for_status()
 
-            # Parse the response
-            data = response.json()
             if len(data) == 0:
-                _LOGGER.error(f"No energy data found for {utility}")
-                return None
+                # Like for a single meter, the range has no data
+                _LOGGER.debug(f"No batched energy data found for {len(utilities)} meters")
+                return {}
 
-            d = data[0]
-
-            utility_name = self._get_utility_name_clean(d["utility"])
-            units = self._get_units_for_utility(utility_name)
-
-            # Create a Consumption object with the data
-            consumption = Consumption(
-                utility=utility,
-                utility_name=utility_name,
-                units=units,
-                name=d["name"],
-                site=d["site"],
-                start_date=yesterday,
-                end_date=tomorrow,
-                data=d["data"]
-            )
+            series = self._match_series(utilities, data)
+            if series is None:
+                self._reject_batching(f"could not match its series to {len(utilities)} meters")
+                return None
 
-            _LOGGER.debug(f"Retrieved energy data for {utility_name}: {consumption}")
-            return consumption
+            consumption_data = {}
+            for utility in utilities:
+                if utility.id in series:
+                    consumption_data[utility.id] = self._parse_consumption(
+                        utility, series[utility.id], start_date, end_date
+                    )
 
-        except (requests.RequestException, json.JSONDecodeError, KeyError, ValueError) as e:
-            # If unauthorized, try to log in again
-            if isinstance(e, requests.RequestException) and e.response and e.response.status_code == 401:
-                _LOGGER.info("Session expired, logging in again")
-                self.authenticated = False
-                if self.login():
-                    # Try again with this utility
-                    return self.get_utility_consumption(utility)
+            _LOGGER.debug(f"Retrieved batched energy data for {len(consumption_data)} meters")
+            return consumption_data
 
-            _LOGGER.error(f"Failed to get energy data for {utility}: {e}")
+        except (aiohttp.ClientError, asyncio.TimeoutError, json.JSONDecodeError, KeyError, ValueError, TypeError) as e:
+            # A rejected batch may just mean that the server doesn't support
+            # batching, the per-meter requests tell if a meter is unknown
+            if isinstance(e, aiohttp.ClientResponseError) and e.status < 500 and e.status != 401:
+                self._reject_batching(str(e))
+            else:
+                _LOGGER.debug(f"Batched energy data request failed: {e}")
             return None
 
-    def get_consumption_data(self) -> Dict[str, Consumption]:
+    def _reject_batching(self, reason: str) -> None:
+        """Request meters one by one for a while after the server rejected a batch."""
+        if self.batch_rejected is None:
+            _LOGGER.info(f"Batched energy data request was rejected, requesting meters one by one: {reason}")
+        self.batch_rejected = datetime.now()
+
+    def _batching_rejected(self) -> bool:
+        """Check if the server rejected a batched request less than DEFAULT_BATCH_REJECTED_TTL ago."""
+        return (
+            self.batch_rejected is not None
+            and datetime.now() - self.batch_rejected < timedelta(seconds=DEFAULT_BATCH_REJECTED_TTL)
+        )
+
+    async def get_consumption_data(
+            self,
+            start_date: Optional[datetime] = None,
+            end_date: Optional[datetime] = None,
+            utilities: Optional[List[Utility]] = None,
+    ) -> Dict[str, Consumption]:
         """Get energy data from the Provident Energy API.
 
+        Args:
+            start_date: Midnight of the first day to get data for, defaults to yesterday
+            end_date: Midnight after the last day to get data for, defaults to tomorrow
+            utilities: The utilities to get data for, defaults to every meter in the tree
+
         Returns:
             Dict[str, Consumption]: Energy consumption data for each utility
         """
         # If not authenticated, login first
-        if not self.authenticated:
-            if not self.login():
-                _LOGGER.error("Failed to authenticate with Provident Energy API")
+        if not await self._check_auth():
+            _LOGGER.error("Failed to authenticate with Provident Energy API")
+            return {}
+
+        if utilities is None:
+            # Get the list of available utilities
+            groups = await self.get_cached_utility_groups()
+            if not groups:
+                _LOGGER.error("Failed to get utilities")
                 return {}
 
-        # Get the list of available utilities
-        groups = self.get_utility_groups()
-        if not groups:
-            _LOGGER.error("Failed to get utilities")
-            return {}
+            utilities = [utility for group in groups for utility in group.utilities]
 
         # Dictionary to store consumption data for each utility
-        consumption_data = {}
-
-        # Fetch energy data for each utility
-        for group in groups:
-            for utility in group.utilities:
-                consumption = self.get_utility_consumption(utility)
-                if consumption:
-                    consumption_data[utility.id] = consumption
+        consumption_data: Dict[str, Consumption] = {}
+        # Requests that wait for their turn after a login failed are not made
+        login_attempts = self._login_attempts
+
+        # Try to fetch all meters in as few requests as possible first
+        if self.batch_size > 1 and len(utilities) > 1 and not self._batching_rejected():
+            chunks = [
+                utilities[i:i + self.batch_size]
+                for i in range(0, len(utilities), self.batch_size)
+            ]
+            results = await asyncio.gather(
+                *(
+                    self._get_utility_consumption_batch_limited(
+                        chunk, start_date, end_date, login_attempts
+                    )
+                    for chunk in chunks
+                ),
+                return_exceptions=True,
+            )
+            fallback = []
+            for chunk, result in zip(chunks, results):
+                if isinstance(result, asyncio.CancelledError):
+                    raise result
+                if isinstance(result, dict):
+                    consumption_data.update(result)
+                else:
+                    fallback.extend(chunk)
+            if fallback and not self.authenticated:
+                # Requesting the meters one by one would fail to log in just the same
+                _LOGGER.debug("Not falling back to per-meter requests, logging in failed")
+                fallback = []
+            elif fallback and self.circuit_breaker is not None and self.circuit_breaker.is_open:
+                # Requesting the meters one by one would fail just the same
+                _LOGGER.debug(f"Not falling back to per-meter requests, {self.circuit_breaker.host} is down")
+                fallback = []
+            elif fallback:
+                _LOGGER.debug(f"Falling back to per-meter requests for {len(fallback)} meters")
+            utilities = fallback
+
+        # Fetch energy data for the remaining utilities concurrently; a failing
+        # meter only drops its own entry from the result
+        results = await asyncio.gather(
+            *(
+                self._get_utility_consumption_limited(utility, start_date, end_date, login_attempts)
+                for utility in utilities
+            ),
+            return_exceptions=True,
+        )
+
+        for utility, result in zip(utilities, results):
+            if isinstance(result, BaseException):
+                if isinstance(result, asyncio.CancelledError):
+                    raise result
+                _LOGGER.error(f"Unexpected error getting energy data for {utility}: {result}")
+            elif result:
+                consumption_data[utility.id] = result
 
         return consumption_data
 
-    def _check_auth(self) -> bool:
-        """Check if the API client is authenticated."""
-        # If not authenticated, login first
-        if not self.authenticated:
-            return self.login()
-        return True
+    async def _get_utility_consumption_limited(
+            self,
+            utility: Utility,
+            start_date: Optional[datetime],
+            end_date: Optional[datetime],
+            login_attempts: int,
+    ) -> Optional[Consumption]:
+        """Get consumption data for a utility, bounded by the concurrency limit.
+
+        Nothing is requested if a login since the given number of logins failed.
+        """
+        async with self._semaphore:
+            if self._login_failed_since(login_attempts):
+                return None
+            return await self.get_utility_consumption(utility, start_date, end_date)
+
+    async def _get_utility_consumption_batch_limited(
+            self,
+            utilities: List[Utility],
+            start_date: Optional[datetime],
+            end_date: Optional[datetime],
+            login_attempts: int,
+    ) -> Optional[Dict[str, Consumption]]:
+        """Get consumption data for a chunk of utilities, bounded by the concurrency limit.
+
+        Nothing is requested if a login since the given number of logins failed.
+        """
+        async with self._semaphore:
+            if self._login_failed_since(login_attempts):
+                return None
+            return await self.get_utility_consumption_batch(utilities, start_date, end_date)
+
+    def _login_failed_since(self, login_attempts: int) -> bool:
+        """Check if logging in failed since the given number of logins."""
+        return not self.authenticated and self._login_attempts != login_attempts
+
+    async def _get_json(self, endpoint: str, params: Dict[str, Any], cache: bool = False) -> Any:
+        """Make an authenticated GET request and return the decoded JSON body.
+
+        If the session has expired, the request is retried once after logging in again.
+        With cache, the response is kept to revalidate the next identical request with,
+        which is only worth it for requests that are made again, like polls.
+        """
+        url = f"{self.base_url}{endpoint}"
+        kwargs = {
+            "params": params,
+            "headers": {
+                "Content-Type": "application/json",
+                "User-Agent": API_USER_AGENT,
+                "Accept-Encoding": ACCEPT_ENCODING,
+            },
+            "cache_key": ResponseCache.key(url, params) if cache else None,
+        }
+        name = _ENDPOINT_METRICS.get(endpoint, endpoint)
+        login_attempts = self._login_attempts
+        try:
+            body = await self._request(name, "GET", url, **kwargs)
+        except aiohttp.ClientResponseError as e:
+            if e.status != 401 or not await self._reauthenticate(login_attempts):
+                raise
+            body = await self._request(name, "GET", url, **kwargs)
+
+        return json.loads(body)
+
+    async def _request(
+            self, name: str, method: str, url: str, cache_key: Optional[str] = None, **kwargs: Any
+    ) -> str:
+        """Make a request with this account's cookies and return the response body.
+
+        Server errors, connection errors and timeouts are retried up to
+        API_MAX_RETRIES times with an exponential, jittered backoff. Every
+        attempt is recorded in the metrics of the endpoint with the given name.
+
+        With a cache key, the request is made conditional on the cached
+        response, if any, and a 304 is answered with the cached body.
+        """
+        cached = self.response_cache.get(cache_key) if cache_key else None
+        if cached is not None:
+            kwargs["headers"] = {**kwargs.get("headers", {}), **cached.validators}
+
+        attempt = 0
+        while True:
+            # Fails right away while the site is known to be down
+            if self.circuit_breaker is not None:
+                await self.circuit_breaker.acquire(self._probe)
+            await self._throttle()
+            start = time.monotonic()
+            try:
+                async with self.session.request(
+                    method,
+                    url,
+                    cookies=self._cookies,
+                    timeout=aiohttp.ClientTimeout(total=API_TIMEOUT),
+                    **kwargs
+                ) as response:
+                    self._record_reachable(response.status < 500)
+                    response.raise_for_status()
+                    self._update_cookies(response)
+                    if response.status == 304 and cached is not None:
+                        self.metrics.record_request(
+                            name, time.monotonic() - start, saved=cached.size, not_modified=True
+                        )
+                        return cached.body
+
+                    body = await response.read()
+                    # aiohttp decodes the body, the header has the size on the wire
+                    size = min(response.content_length or len(body), len(body))
+                    self.metrics.record_request(
+                        name, time.monotonic() - start, size, saved=len(body) - size
+                    )
+                    text = await response.text()
+                    if cache_key:
+                        self.response_cache.store(cache_key, CachedResponse(
+                            body=text,
+                            size=len(body),
+                            etag=response.headers.get(aiohttp.hdrs.ETAG),
+                            last_modified=response.headers.get(aiohttp.hdrs.LAST_MODIFIED),
+                        ))
+                    return text
+            except aiohttp.ClientResponseError as e:
+                self.metrics.record_request(name, time.monotonic() - start, success=False)
+                if e.status < 500 or attempt >= API_MAX_RETRIES:
+                    raise
+                error: Exception = e
+            except (aiohttp.ClientConnectionError, asyncio.TimeoutError) as e:
+                self.metrics.record_request(name, time.monotonic() - start, success=False)
+                self._record_reachable(False)
+                if attempt >= API_MAX_RETRIES:
+                    raise
+                error = e
+            except aiohttp.ClientError:
+                self.metrics.record_request(name, time.monotonic() - start, success=False)
+                raise
+
+            delay = min(API_RETRY_MAX_DELAY, API_RETRY_BASE_DELAY * 2 ** attempt)
+            delay *= random.uniform(0.5, 1)
+            attempt += 1
+            self.metrics.record_retry(name)
+            _LOGGER.debug(f"Retrying {method} {url} in {delay:.1f}s after: {error!r}")
+            await asyncio.sleep(delay)
+
+    async def _probe(self) -> bool:
+        """Check if the site responds again, with a single request and no retries."""
+        await self._throttle()
+        start = time.monotonic()
+        try:
+            async with self.session.get(
+                self.base_url,
+                headers={"User-Agent": API_USER_AGENT},
+                timeout=aiohttp.ClientTimeout(total=API_TIMEOUT),
+            ) as response:
+                reachable = response.status < 500
+        except (aiohttp.ClientError, asyncio.TimeoutError):
+            reachable = False
+        self.metrics.record_request(ENDPOINT_PROBE, time.monotonic() - start, success=reachable)
+        return reachable
+
+    def _record_reachable(self, reachable: bool) -> None:
+        """Tell the circuit breaker, if any, whether a request reached the site."""
+        if self.circuit_breaker is None:
+            return
+        if reachable:
+            self.circuit_breaker.record_success()
+        else:
+            self.circuit_breaker.record_failure()
+
+    async def _reauthenticate(self, login_attempts: int) -> bool:
+        """Log in again after a request made after the given number of logins was rejected.
+
+        Only one login runs at a time. Requests that fail while it runs wait
+        for it and then share its outcome: they reuse the new session, or fail
+        without logging in again if the login failed.
+        """
+        async with self._auth_lock:
+            if self._login_attempts != login_attempts:
+                return self.authenticated
+
+            _LOGGER.info("Session expired, logging in again")
+            self.metrics.record_relogin()
+            self._expire_session()
+            return await self.login()
+
+    async def _throttle(self) -> None:
+        """Wait for the rate limiter, if any, to allow a request."""
+        if self.rate_limiter is not None:
+            await self.rate_limiter.acquire()
+
+    async def _check_auth(self) -> bool:
+        """Check if the API client is authenticated, logging in if it isn't.
+
+        Concurrent requests share a single login and its outcome, so a failed
+        login is not repeated by each of them.
+        """
+        if self.authenticated:
+            return True
+
+        login_attempts = self._login_attempts
+        # If not authenticated, login first, once for all concurrent requests
+        async with self._auth_lock:
+            if self._login_attempts != login_attempts:
+                return self.authenticated
+            return await self.login()
+
+    def _update_cookies(self, response: aiohttp.ClientResponse) -> None:
+        """Keep the cookies set by a response for this account only.
+
+        The aiohttp session may be shared with the rest of Home Assistant, so
+        the session cookie is tracked here and sent explicitly on each request.
+        """
+        for name, morsel in response.cookies.items():
+            self._cookies[name] = morsel.value
+
+    def _parse_consumption(
+            self, utility: Utility, d: Dict[str, Any], start_date: datetime, end_date: datetime
+    ) -> Consumption:
+        """Create a Consumption object from a quickgraphs series.
+
+        Only the date of the range is sent, so the series starts at midnight
+        of the first day even when the range starts later in that day. It is
+        windowed to [start_date, end_date) from there.
+        """
+        utility_name = self._get_utility_name_clean(d["utility"])
+        units = self._get_units_for_utility(utility_name)
+        first_day = start_date.replace(hour=0, minute=0, second=0, microsecond=0)
+
+        return Consumption(
+            utility=utility,
+            utility_name=utility_name,
+            units=units,
+            name=d["name"],
+            site=d["site"],
+            data=ConsumptionSeries(first_day, d["data"]).window(start_date, end_date)
+        )
+
+    @staticmethod
+    def _match_series(
+            utilities: List[Utility], data: List[Dict[str, Any]]
+    ) -> Optional[Dict[str, Dict[str, Any]]]:
+        """Map the series of a batched quickgraphs response back to their meters.
+
+        Series are matched on their meter id when the response carries one,
+        then on the meter name, then on their utility when only one of the
+        meters has it. Series are never matched on their position, since the
+        response may list them in another order than the request.
+
+        Returns:
+            The series keyed by meter id, or None if some series could not be
+            matched to a meter of their own
+        """
+        by_id = {utility.id: utility for utility in utilities}
+        by_text = {utility.text: utility for utility in utilities}
+        if len(by_text) != len(utilities):
+            by_text = {}
+
+        matched: Dict[str, Dict[str, Any]] = {}
+        for d in data:
+            meter_id = next(
+                (str(d[key]) for key in ("meterId", "id") if str(d.get(key)) in by_id),
+                None,
+            )
+            if meter_id is None and d.get("name") in by_text:
+                meter_id = by_text[d["name"]].id
+            if meter_id is None and d.get("utility"):
+                # Meter names include their utility, e.g. "Unit 101 Electricity (kWh)"
+                candidates = [utility for utility in utilities if d["utility"] in utility.text]
+                if len(candidates) == 1:
+                    meter_id = candidates[0].id
+            if meter_id is None or meter_id in matched:
+                return None
+            matched[meter_id] = d
+        return matched
+
+    @staticmethod
+    def _is_login_accepted(body: str) -> bool:
+        """Check the success flag of a login response, assuming success if it has none.
+
+        The session cookie is set before logging in, so it doesn't tell
+        whether the credentials were accepted.
+        """
+        try:
+            return json.loads(body)["d"]["success"] is not False
+        except (ValueError, KeyError, TypeError):
+            return True
+
+    @staticmethod
+    def _is_unknown_meter_error(e: Exception) -> bool:
+        """Check if quickgraphs rejected a request because of a meter it doesn't know."""
+        return isinstance(e, aiohttp.ClientResponseError) and e.status in (400, 404)
+
+    def _now(self) -> datetime:
+        """Get the current wall time in the time zone of the hourly data."""
+        return datetime.now(self.time_zone).replace(tzinfo=None)
+
+    def _is_polled_range(self, end_date: datetime) -> bool:
+        """Check if a range reaches the end of the current window, like the polls do.
+
+        Other ranges, like history or days requested again for gaps, are
+        unlikely to be requested again as they are.
+        """
+        _, window_end = get_consumption_window(self._now())
+        return end_date >= window_end
+
+    def _get_date_range(
+            self, start_date: Optional[datetime] = None, end_date: Optional[datetime] = None
+    ) -> Tuple[datetime, datetime]:
+        """Get the start and end of the range requested from quickgraphs."""
+        window_start, window_end = get_consumption_window(self._now())
+        return start_date or window_start, end_date or window_end
 
     @staticmethod
     def _get_units_for_utility(utility: str) -> str:
@@ -281,7 +942,7 @@ class ProvidentEnergyAPI:
     @staticmethod
     def _get_utility_name_clean(in_name: str) -> str:
         """Get the utility name without the "Utility" part."""
-        match = re.match(r"^(.*)\s\(.*\)$", in_name)
+        match = _UTILITY_NAME_PATTERN.match(in_name)
         if match:
             return match.group(1)
         return in_name
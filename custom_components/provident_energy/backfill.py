@@ -0,0 +1,318 @@
+"""Historical backfill of Provident Energy data into long-term statistics."""
+from __future__ import annotations
+
+import asyncio
+import logging
+import math
+from collections import deque
+from datetime import datetime, timedelta
+from typing import Any, Dict, Optional
+
+import aiohttp
+import numpy as np
+from homeassistant.components.recorder import get_instance
+from homeassistant.components.recorder.models import StatisticData, StatisticMetaData
+from homeassistant.components.recorder.statistics import (
+    async_add_external_statistics,
+    statistics_during_period,
+)
+from homeassistant.config_entries import ConfigEntry
+from homeassistant.core import HomeAssistant
+from homeassistant.helpers.storage import Store
+from homeassistant.util import dt as dt_util, slugify
+
+from .api import Consumption, ProvidentEnergyAPI, Utility
+from .const import (
+    BACKFILL_SAVE_DELAY,
+    DEFAULT_BACKFILL_CHUNK_DAYS,
+    DEFAULT_BACKFILL_CONCURRENCY,
+    DEFAULT_BACKFILL_DAYS,
+    DEFAULT_DATA_DELAY,
+    DEFAULT_GAP_MAX_AGE,
+    DEFAULT_NAME,
+    DOMAIN,
+    PERIOD_BILLING_CYCLE,
+    STORAGE_KEY_BACKFILL,
+    STORAGE_VERSION,
+    UTILITY_DATA_DELAYS,
+)
+from .scheduler import get_data_delay
+from .series import ConsumptionSeries
+from .tariff import Tariff
+from .totals import get_period_start
+
+_LOGGER = logging.getLogger(__name__)
+
+
+def get_statistic_id(utility: Utility) -> str:
+    """Get the id of the external statistic holding a meter's history."""
+    return f"{DOMAIN}:{slugify(utility.id)}"
+
+
+def get_cost_statistic_id(utility: Utility) -> str:
+    """Get the id of the external statistic holding the cost of a meter's history."""
+    return f"{DOMAIN}:{slugify(utility.id)}_cost"
+
+
+class ProvidentEnergyBackfill:
+    """Import the history of every meter into long-term statistics.
+
+    History is requested in chunks of DEFAULT_BACKFILL_CHUNK_DAYS, several
+    chunks at a time, and imported oldest first because each hour's sum
+    builds on the one before it. A per-meter cursor with the next hour to
+    import and the sum up to it is persisted after each chunk, so a run that
+    is interrupted resumes where it stopped and later runs only import the
+    days that were completed since.
+
+    The cursor never moves past hours that may still be published: it stops
+    at the first hour without a value, at the publication delay of the
+    utility, or at a chunk that failed, and those hours are requested again
+    on the next run. Hours that stay empty for DEFAULT_GAP_MAX_AGE are given
+    up on.
+
+    For meters whose utility has a tariff, the cost of each hour is derived
+    from the imported consumption statistics and imported as a statistic of
+    its own. When the tariff changes, the cost of the whole history is
+    computed again in a single vectorized pass.
+    """
+
+    def __init__(
+            self,
+            hass: HomeAssistant,
+            entry: ConfigEntry,
+            api: ProvidentEnergyAPI,
+            history_days: int = DEFAULT_BACKFILL_DAYS,
+            chunk_days: int = DEFAULT_BACKFILL_CHUNK_DAYS,
+            max_concurrency: int = DEFAULT_BACKFILL_CONCURRENCY,
+            tariffs: Optional[Dict[str, Tariff]] = None,
+    ) -> None:
+        """Initialize the backfill."""
+        self.hass = hass
+        self.api = api
+        self.tariffs = tariffs or {}
+        self.history_days = history_days
+        self.chunk_days = chunk_days
+        self.max_concurrency = max(1, max_concurrency)
+
+        self._store: Store[Dict[str, Any]] = Store(
+            hass, STORAGE_VERSION, f"{STORAGE_KEY_BACKFILL}.{entry.entry_id}"
+        )
+        self._cursors: Dict[str, Dict[str, Any]] = {}
+        self._lock = asyncio.Lock()
+
+    async def async_run(self, *_: Any) -> None:
+        """Import all complete days that are not in the statistics yet."""
+        if self._lock.locked():
+            _LOGGER.debug("Backfill is already running")
+            return
+
+        async with self._lock:
+            self._cursors = await self._store.async_load() or {}
+
+            groups = await self.api.get_cached_utility_groups()
+            if not groups:
+                _LOGGER.warning("Skipping backfill, failed to get utilities")
+                return
+
+            try:
+                for group in groups:
+                    for utility in group.utilities:
+                        await self._async_backfill_utility(utility)
+                        await self._async_import_costs(utility)
+            finally:
+                await self._store.async_save(self._cursors)
+
+    async def _async_backfill_utility(self, utility: Utility) -> None:
+        """Import the history of a single meter up to the last published hour."""
+        now = dt_util.now().replace(tzinfo=None)
+        today = now.replace(hour=0, minute=0, second=0, microsecond=0)
+
+        cursor = self._cursors.get(utility.id)
+        if cursor is None:
+            cursor = {
+                "next": (today - timedelta(days=self.history_days)).isoformat(),
+                "sum": 0.0,
+                "started": False,
+            }
+        start = datetime.fromisoformat(cursor["next"])
+        if start >= today:
+            return
+
+        # Hours from here on may not be published yet
+        if "utility_name" in cursor:
+            delay = get_data_delay(cursor["utility_name"])
+        else:
+            delay = max(DEFAULT_DATA_DELAY, *UTILITY_DATA_DELAYS.values())
+        published = now.replace(minute=0, second=0, microsecond=0) - timedelta(hours=delay)
+        # Empty hours before this are not waited for any longer
+        given_up = published - timedelta(seconds=DEFAULT_GAP_MAX_AGE)
+
+        _LOGGER.info(f"Backfilling {utility.text} from {start.date()}")
+
+        chunks = deque()
+        chunk_start = start
+        while chunk_start < today:
+            chunk_end = min(chunk_start + timedelta(days=self.chunk_days), today)
+            chunks.append((chunk_start, chunk_end))
+            chunk_start = chunk_end
+
+        # Keep up to max_concurrency chunks in flight while importing them in order
+        pending: deque[tuple[datetime, datetime, asyncio.Task]] = deque()
+        try:
+            while chunks or pending:
+                while chunks and len(pending) < self.max_concurrency:
+                    chunk_start, chunk_end = chunks.popleft()
+                    pending.append((chunk_start, chunk_end, asyncio.create_task(
+                        self.api.fetch_utility_consumption(utility, chunk_start, chunk_end)
+                    )))
+
+                chunk_start, chunk_end, task = pending.popleft()
+                try:
+                    consumption = await task
+                except (aiohttp.ClientError, asyncio.TimeoutError, KeyError, ValueError) as e:
+                    _LOGGER.warning(
+                        f"Stopping backfill of {utility.text} at {chunk_start.date()} after: {e}, "
+                        f"it will resume from there on the next run"
+                    )
+                    return
+
+                # Import up to the first published hour without a value that is
+                # still waited for, so that the sum can include it once it arrives
+                until = min(chunk_end, published)
+                waited_from = max(chunk_start, given_up)
+                if waited_from < until:
+                    waited = (
+                        consumption.data.window(waited_from, until)
+                        if consumption
+                        else ConsumptionSeries.empty(waited_from, until)
+                    )
+                    missing = waited.missing_mask()
+                    if True in missing:
+                        until = waited.timestamp_at(missing.index(True))
+                if consumption is not None:
+                    self._import_chunk(utility, consumption, cursor, until)
+
+                cursor["next"] = until.isoformat()
+                self._cursors[utility.id] = cursor
+                self._store.async_delay_save(lambda: self._cursors, BACKFILL_SAVE_DELAY)
+                if until < chunk_end:
+                    _LOGGER.debug(
+                        f"Backfilled {utility.text} up to {until}, the rest is not published yet"
+                    )
+                    return
+        finally:
+            for _, _, task in pending:
+                task.cancel()
+
+    def _import_chunk(
+            self, utility: Utility, consumption: Consumption, cursor: Dict[str, Any], until: datetime
+    ) -> None:
+        """Convert the hours of a chunk before a time into statistics and queue their import."""
+        statistics: list[StatisticData] = []
+        timezone = dt_util.get_default_time_zone()
+        cursor["utility_name"] = consumption.utility_name
+        for hour, value in consumption.data.items():
+            if hour >= until:
+                break
+            cursor["sum"] += value
+            cursor["started"] = True
+            statistics.append(
+                StatisticData(
+                    start=hour.replace(tzinfo=timezone),
+                    state=value,
+                    sum=cursor["sum"],
+                )
+            )
+
+        if not statistics:
+            return
+
+        metadata = StatisticMetaData(
+            has_mean=False,
+            has_sum=True,
+            name=f"{DEFAULT_NAME} {consumption.name}",
+            source=DOMAIN,
+            statistic_id=get_statistic_id(utility),
+            unit_of_measurement=consumption.units or None,
+        )
+        async_add_external_statistics(self.hass, metadata, statistics)
+
+    async def _async_import_costs(self, utility: Utility) -> None:
+        """Import the cost of the consumption statistics not costed yet."""
+        cursor = self._cursors.get(utility.id)
+        if cursor is None or not cursor["started"]:
+            return
+        tariff = self.tariffs.get(cursor.get("utility_name"))
+        if tariff is None:
+            return
+
+        costs = cursor.get("costs")
+        if costs is None or costs["tariff"] != tariff.fingerprint:
+            # Cost the whole history with the new tariff
+            _LOGGER.info(f"Costing the history of {utility.text}")
+            today = dt_util.now().replace(tzinfo=None, hour=0, minute=0, second=0, microsecond=0)
+            costs = {
+                "tariff": tariff.fingerprint,
+                "next": (today - timedelta(days=self.history_days)).isoformat(),
+                "sum": 0.0,
+                "cycle_start": None,
+                "cycle_usage": 0.0,
+            }
+
+        # Let the recorder finish importing the consumption first
+        recorder = get_instance(self.hass)
+        await recorder.async_block_till_done()
+
+        timezone = dt_util.get_default_time_zone()
+        start = datetime.fromisoformat(costs["next"]).replace(tzinfo=timezone)
+        statistic_id = get_statistic_id(utility)
+        rows = (await recorder.async_add_executor_job(
+            statistics_during_period,
+            self.hass, start, None, {statistic_id}, "hour", None, {"state"},
+        )).get(statistic_id, [])
+        if not rows:
+            cursor["costs"] = costs
+            return
+
+        hours = [
+            dt_util.as_local(dt_util.utc_from_timestamp(row["start"])).replace(tzinfo=None)
+            for row in rows
+        ]
+        values = np.array(
+            [np.nan if row.get("state") is None else row["state"] for row in rows], dtype=float
+        )
+
+        # Carry the consumption of the billing cycle over from the previous run
+        first_cycle = get_period_start(PERIOD_BILLING_CYCLE, hours[0], tariff.billing_day)
+        cycle_usage = costs["cycle_usage"] if costs["cycle_start"] == first_cycle.isoformat() else 0.0
+        cost, cycle_usage = tariff.cost(np.array(hours, dtype="datetime64[s]"), values, cycle_usage)
+
+        statistics: list[StatisticData] = []
+        for hour, hour_cost in zip(hours, cost.tolist()):
+            if math.isnan(hour_cost):
+                # No consumption recorded for the hour
+                continue
+            costs["sum"] += hour_cost
+            statistics.append(
+                StatisticData(start=hour.replace(tzinfo=timezone), state=hour_cost, sum=costs["sum"])
+            )
+
+        costs["next"] = (hours[-1] + timedelta(hours=1)).isoformat()
+        costs["cycle_start"] = get_period_start(
+            PERIOD_BILLING_CYCLE, hours[-1], tariff.billing_day
+        ).isoformat()
+        costs["cycle_usage"] = cycle_usage
+        cursor["costs"] = costs
+
+        if not statistics:
+            return
+
+        metadata = StatisticMetaData(
+            has_mean=False,
+            has_sum=True,
+            name=f"{DEFAULT_NAME} {utility.text} cost",
+            source=DOMAIN,
+            statistic_id=get_cost_statistic_id(utility),
+            unit_of_measurement=self.hass.config.currency,
+        )
+        async_add_external_statistics(self.hass, metadata, statistics)
@@ -0,0 +1,159 @@
+"""Circuit breaking for the Provident Energy API."""
+from __future__ import annotations
+
+import asyncio
+import logging
+import time
+from typing import Any, Awaitable, Callable, Dict
+
+import aiohttp
+
+from .const import (
+    CIRCUIT_FAILURE_THRESHOLD,
+    CIRCUIT_MAX_RESET_TIMEOUT,
+    CIRCUIT_RESET_TIMEOUT,
+)
+
+_LOGGER = logging.getLogger(__name__)
+
+STATE_CLOSED = "closed"
+STATE_OPEN = "open"
+STATE_HALF_OPEN = "half_open"
+
+
+class CircuitOpenError(aiohttp.ClientConnectionError):
+    """Raised instead of making a request while the circuit of a host is open."""
+
+    def __init__(self, host: str, retry_in: float) -> None:
+        """Initialize the error."""
+        super().__init__(f"{host} is not responding, requests are paused for {retry_in:.0f}s")
+        self.host = host
+        self.retry_in = retry_in
+
+
+class CircuitBreaker:
+    """Stop sending requests to a host that keeps failing.
+
+    While closed, requests go through, and `failure_threshold` failed
+    attempts in a row open the circuit, by default those of a single request
+    that gave up after its retries. While open, requests fail right away
+    with a CircuitOpenError instead of each waiting for its own timeout.
+    Once `reset_timeout` has passed the circuit is half-open: the first
+    request runs a probe of the host while the others wait for its outcome.
+    If the probe succeeds the circuit closes again, otherwise it opens for
+    twice as long as before, up to `max_reset_timeout`.
+
+    Connection errors, timeouts and server errors count as failures. Any
+    other response shows that the host is up.
+    """
+
+    def __init__(
+            self,
+            host: str,
+            failure_threshold: int = CIRCUIT_FAILURE_THRESHOLD,
+            reset_timeout: float = CIRCUIT_RESET_TIMEOUT,
+            max_reset_timeout: float = CIRCUIT_MAX_RESET_TIMEOUT,
+    ) -> None:
+        """Initialize the circuit breaker.
+
+        Args:
+            host: Name of the host, for logging
+            failure_threshold: Failed attempts in a row that open the circuit
+            reset_timeout: Seconds the circuit stays open before the first probe
+            max_reset_timeout: Most seconds the circuit stays open after failed probes
+        """
+        self.host = host
+        self.failure_threshold = max(1, failure_threshold)
+        self.reset_timeout = reset_timeout
+        self.max_reset_timeout = max_reset_timeout
+        self.failures = 0
+        self.opened = 0
+        self._state = STATE_CLOSED
+        self._open_timeout = reset_timeout
+        self._retry_at = 0.0
+        self._probe_lock = asyncio.Lock()
+
+    @property
+    def state(self) -> str:
+        """Get the state of the circuit, half-open once a probe may be made."""
+        if self._state == STATE_OPEN and time.monotonic() >= self._retry_at:
+            return STATE_HALF_OPEN
+        return self._state
+
+    @property
+    def is_open(self) -> bool:
+        """Check if requests to the host are failing, until a probe succeeds."""
+        return self._state != STATE_CLOSED
+
+    @property
+    def retry_in(self) -> float:
+        """Get the seconds until a probe may be made, 0 if the circuit is not open."""
+        if self._state == STATE_CLOSED:
+            return 0.0
+        return max(0.0, self._retry_at - time.monotonic())
+
+    async def acquire(self, probe: Callable[[], Awaitable[bool]]) -> None:
+        """Wait until a request may be made to the host.
+
+        Args:
+            probe: Request testing whether the host is up again, returning
+                True if it is
+
+        Raises:
+            CircuitOpenError: If the circuit is open, or a probe failed
+        """
+        if self._state == STATE_CLOSED:
+            return
+
+        # Only one request probes the host, the others wait for its outcome
+        async with self._probe_lock:
+            if self._state == STATE_CLOSED:
+                return
+            if self.state == STATE_OPEN:
+                raise CircuitOpenError(self.host, self.retry_in)
+
+            self._state = STATE_HALF_OPEN
+            _LOGGER.debug(f"Probing {self.host}")
+            if await probe():
+                self.record_success()
+                return
+            self._open(min(self.max_reset_timeout, self._open_timeout * 2))
+            raise CircuitOpenError(self.host, self.retry_in)
+
+    def record_success(self) -> None:
+        """Record a request that reached the host, closing the circuit."""
+        if self._state != STATE_CLOSED:
+            _LOGGER.info(f"{self.host} is responding again, resuming requests")
+        self._state = STATE_CLOSED
+        self.failures = 0
+        self._open_timeout = self.reset_timeout
+
+    def record_failure(self) -> None:
+        """Record a request that failed to reach the host."""
+        self.failures += 1
+        if self._state == STATE_CLOSED and self.failures >= self.failure_threshold:
+            self._open(self.reset_timeout)
+
+    def _open(self, timeout: float) -> None:
+        """Open the circuit for a number of seconds."""
+        if self._state == STATE_CLOSED:
+            _LOGGER.warning(
+                f"{self.host} is not responding after {self.failures} failed requests, "
+                f"pausing requests for {timeout:.0f}s"
+            )
+        else:
+            _LOGGER.debug(f"{self.host} is still not responding, pausing requests for {timeout:.0f}s")
+        self._state = STATE_OPEN
+        self._open_timeout = timeout
+        self._retry_at = time.monotonic() + timeout
+        self.opened += 1
+
+    def as_dict(self) -> Dict[str, Any]:
+        """Get the state of the circuit in a serializable form."""
+        return {
+            "host": self.host,
+            "state": self.state,
+            "failures": self.failures,
+            "opened": self.opened,
+            "retry_in": round(self.retry_in, 1),
+        }
@@ -1,19 +1,36 @@
 """Config flow for Provident Energy integration."""
 from __future__ import annotations
 
+import asyncio
 import logging
 from typing import Any
 
 import voluptuous as vol
 from homeassistant import config_entries
+from homeassistant.core import HomeAssistant, callback
 from homeassistant.exceptions import HomeAssistantError
+from homeassistant.helpers import selector
 
 from .api import ProvidentEnergyAPI
 from .const import (
     DOMAIN,
     CONF_USERNAME,
     CONF_PASSWORD,
+    CONF_BANDS,
+    CONF_BILLING_DAY,
+    CONF_DAILY_CHARGE,
+    CONF_RATE,
+    CONF_TARIFFS,
+    CONF_TIERS,
+    CONF_UTILITY,
+    DATA_VALIDATED_SESSIONS,
+    DEFAULT_BILLING_DAY,
+    MAX_BILLING_DAY,
+    UTILITY_UNITS,
+    VALIDATION_TIMEOUT,
 )
+from .tariff import parse_bands, parse_tiers
+from .transport import async_get_transport
 
 
 class CannotConnect(HomeAssistantError):
@@ -33,27 +50,49 @@ STEP_USER_DATA_SCHEMA = vol.Schema(
 )
 
 
-async def validate_input(data: dict[str, Any]) -> dict[str, Any]:
+async def validate_input(hass: HomeAssistant, data: dict[str, Any]) -> dict[str, Any]:
     """Validate the user input allows us to connect.
 
     Data has the keys from STEP_USER_DATA_SCHEMA with values provided by the user.
     """
+    transport = async_get_transport(hass)
+    api = ProvidentEnergyAPI(
+        transport.session,
+        data[CONF_USERNAME],
+        data[CONF_PASSWORD],
+        rate_limiter=transport.rate_limiter,
+    )
     try:
-        api = ProvidentEnergyAPI(data[CONF_USERNAME], data[CONF_PASSWORD])
-        if not api.login():
-            raise InvalidAuth
-
-        return {"title": f"Provident Energy ({data[CONF_USERNAME]})"}
+        # Raises when the site can't be reached, so that it isn't reported as invalid
+        # auth, and doesn't keep the form waiting through every retry
+        async with asyncio.timeout(VALIDATION_TIMEOUT):
+            logged_in = await api.authenticate()
     except Exception as ex:
         _LOGGER.error(f"Error validating input: {ex}")
         raise CannotConnect from ex
 
+    if not logged_in:
+        raise InvalidAuth
+
+    return {
+        "title": f"Provident Energy ({data[CONF_USERNAME]})",
+        "cookies": api.session_cookies,
+    }
+
 
 class ConfigFlow(config_entries.ConfigFlow, domain=DOMAIN):
     """Handle a config flow for Provident Energy."""
 
     VERSION = 1
 
+    @staticmethod
+    @callback
+    def async_get_options_flow(
+            config_entry: config_entries.ConfigEntry,
+    ) -> OptionsFlowHandler:
+        """Get the options flow for this handler."""
+        return OptionsFlowHandler()
+
     async def async_step_user(
             self, user_input: dict[str, Any] | None = None
     ):
@@ -61,7 +100,14 @@ class ConfigFlow(config_entries.ConfigFlow, domain=DOMAIN):
         errors: dict[str, str] = {}
         if user_input is not None:
             try:
-                info = await validate_input(user_input)
+                info = await validate_input(self.hass, user_input)
+
+                # Hand the session we just logged in with over to the
+                # coordinator so it doesn't have to log in again
+                self.hass.data.setdefault(DOMAIN, {}).setdefault(
+                    DATA_VALIDATED_SESSIONS, {}
+                )[user_input[CONF_USERNAME]] = info["cookies"]
+
                 return self.async_create_entry(title=info["title"], data=user_input)
             except CannotConnect:
                 errors["base"] = "cannot_connect"
@@ -74,3 +120,88 @@ class ConfigFlow(config_entries.ConfigFlow, domain=DOMAIN):
         return self.async_show_form(
             step_id="user", data_schema=STEP_USER_DATA_SCHEMA, errors=errors
         )
+
+
+class OptionsFlowHandler(config_entries.OptionsFlow):
+    """Handle the billing cycle and tariff options."""
+
+    def __init__(self) -> None:
+        """Initialize the options flow."""
+        self._options: dict[str, Any] = {}
+        self._utility: str | None = None
+
+    async def async_step_init(
+            self, user_input: dict[str, Any] | None = None
+    ):
+        """Choose the billing day and the utility whose tariff to edit."""
+        if user_input is not None:
+            self._options = {
+                **self.config_entry.options,
+                CONF_BILLING_DAY: int(user_input[CONF_BILLING_DAY]),
+            }
+            self._utility = user_input.get(CONF_UTILITY)
+            if self._utility is None:
+                return self.async_create_entry(data=self._options)
+            return await self.async_step_tariff()
+
+        schema = vol.Schema(
+            {
+                vol.Required(
+                    CONF_BILLING_DAY,
+                    default=self.config_entry.options.get(CONF_BILLING_DAY, DEFAULT_BILLING_DAY),
+                ): vol.All(vol.Coerce(int), vol.Range(min=1, max=MAX_BILLING_DAY)),
+                vol.Optional(CONF_UTILITY): vol.In(list(UTILITY_UNITS)),
+            }
+        )
+        return self.async_show_form(step_id="init", data_schema=schema)
+
+    async def async_step_tariff(
+            self, user_input: dict[str, Any] | None = None
+    ):
+        """Edit the tariff of a utility, in currency per unit of the utility."""
+        errors: dict[str, str] = {}
+        tariffs = dict(self._options.get(CONF_TARIFFS, {}))
+        current = tariffs.get(self._utility, {})
+
+        if user_input is not None:
+            try:
+                parse_bands(user_input.get(CONF_BANDS, ""))
+            except ValueError:
+                errors[CONF_BANDS] = "invalid_bands"
+            try:
+                parse_tiers(user_input.get(CONF_TIERS, ""))
+            except ValueError:
+                errors[CONF_TIERS] = "invalid_tiers"
+
+            if not errors:
+                if CONF_RATE in user_input:
+                    tariffs[self._utility] = user_input
+                else:
+                    # Without a rate, the utility has no tariff
+                    tariffs.pop(self._utility, None)
+                self._options[CONF_TARIFFS] = tariffs
+                return self.async_create_entry(data=self._options)
+
+            current = user_input
+
+        schema = vol.Schema(
+            {
+                vol.Optional(
+                    CONF_RATE, description={"suggested_value": current.get(CONF_RATE)}
+                ): vol.All(vol.Coerce(float), vol.Range(min=0)),
+                vol.Optional(
+                    CONF_DAILY_CHARGE, default=current.get(CONF_DAILY_CHARGE, 0.0)
+                ): vol.All(vol.Coerce(float), vol.Range(min=0)),
+                vol.Optional(CONF_BANDS, default=current.get(CONF_BANDS, "")): selector.TextSelector(),
+                vol.Optional(CONF_TIERS, default=current.get(CONF_TIERS, "")): selector.TextSelector(),
+            }
+        )
+        return self.async_show_form(
+            step_id="tariff",
+            data_schema=schema,
+            errors=errors,
+            description_placeholders={
+                "utility": self._utility,
+                "unit": UTILITY_UNITS[self._utility],
+            },
+        )
@@ -5,10 +5,61 @@ DOMAIN = "provident_energy"
 # Configuration
 CONF_USERNAME = "username"
 CONF_PASSWORD = "password"
+CONF_BILLING_DAY = "billing_day"
+CONF_TARIFFS = "tariffs"
+CONF_UTILITY = "utility"
+CONF_RATE = "rate"
+CONF_DAILY_CHARGE = "daily_charge"
+CONF_BANDS = "bands"
+CONF_TIERS = "tiers"
+# Not offered by the config flow, for development against a local stand-in
+CONF_BASE_URL = "base_url"
 
 # Default values
 DEFAULT_NAME = "Provident Energy"
-DEFAULT_SCAN_INTERVAL = 3600  # 1 hour
+DEFAULT_SCAN_INTERVAL = 3600  # 1 hour, until the first poll tells when new data is due
+MIN_POLL_INTERVAL = 300  # 5 minutes
+MAX_POLL_INTERVAL = 14400  # 4 hours
+POLL_JITTER = 300  # up to 5 minutes added to each poll
+PUBLICATION_MARGIN = 600  # 10 minutes after data is expected to be published
+DEFAULT_REQUESTS_PER_SECOND = 5  # shared by all config entries
+DEFAULT_REQUEST_BURST = 10
+ENTRY_STAGGER = 90  # seconds between the polls of consecutive config entries
+MAX_ENTRY_STAGGER = 900  # 15 minutes
+DEFAULT_MAX_CONCURRENT_REQUESTS = 4
+DEFAULT_BATCH_SIZE = 50  # meters per batched quickgraphs request
+DEFAULT_BATCH_REJECTED_TTL = 86400  # 1 day before batching is tried again after the server rejected it
+DEFAULT_METER_TREE_TTL = 86400  # 1 day
+DEFAULT_CORRECTION_INTERVAL = 21600  # 6 hours between re-fetches of the trailing window
+DEFAULT_CORRECTION_WINDOW = 21600  # 6 hours of data before the high-water mark
+DEFAULT_GAP_MAX_AGE = 604800  # 7 days during which a missing hour is requested again
+DEFAULT_PROVISIONAL_PERIOD = 21600  # 6 hours before a newly published zero is trusted
+DEFAULT_BACKFILL_DAYS = 730  # 2 years of history
+DEFAULT_BACKFILL_CHUNK_DAYS = 31
+DEFAULT_BACKFILL_CONCURRENCY = 4
+BACKFILL_INTERVAL = 86400  # 1 day between runs importing the newly completed days
+BACKFILL_SAVE_DELAY = 10  # seconds
+SNAPSHOT_SAVE_DELAY = 10  # seconds
+MANUAL_REFRESH_COOLDOWN = 10  # seconds over which refresh_data calls are coalesced
+MANUAL_REFRESH_MIN_INTERVAL = 60  # seconds between fetches triggered by refresh_data
+
+# Storage
+STORAGE_VERSION = 1
+STORAGE_KEY_METER_TREE = f"{DOMAIN}.meter_tree"
+STORAGE_KEY_SESSION = f"{DOMAIN}.session"
+STORAGE_KEY_BACKFILL = f"{DOMAIN}.backfill"
+STORAGE_KEY_SNAPSHOT = f"{DOMAIN}.snapshot"
+
+# hass.data keys
+DATA_VALIDATED_SESSIONS = "validated_sessions"
+DATA_TRANSPORT = "transport"
+
+# Services
+SERVICE_REFRESH_DATA = "refresh_data"
+ATTR_CONFIG_ENTRY_ID = "config_entry_id"
+
+# Dispatcher signal sent after every poll that made requests, suffixed with the entry id
+SIGNAL_METRICS_UPDATED = f"{DOMAIN}_metrics_updated"
 
 # API endpoints
 API_BASE_URL = "https://provident.meterconnex.com"
@@ -20,6 +71,19 @@ API_ROOT_NODES_ENDPOINT = "/api/internal/metertree/rootnodes"
 API_QUICKGRAPHS_ENDPOINT = "/api/internal/graphs/quickgraphs"
 
 API_USER_AGENT = "Mozilla/5.0 (Windows NT 10.0; Win64; x64; rv:139.0) Gecko/20100101 Firefox/139.0"
+API_SESSION_COOKIE = "ASP.NET_SessionId"
+API_TIMEOUT = 30  # seconds per request
+API_MAX_RETRIES = 3
+API_RETRY_BASE_DELAY = 1  # seconds, doubled on each retry
+API_RETRY_MAX_DELAY = 10  # seconds
+UPDATE_TIMEOUT = 120  # seconds for a whole refresh, retries included
+VALIDATION_TIMEOUT = 30  # seconds for logging in from the config flow, retries included
+# Failed attempts in a row after which requests are paused, those of a single request that gave up
+CIRCUIT_FAILURE_THRESHOLD = API_MAX_RETRIES + 1
+CIRCUIT_RESET_TIMEOUT = 300  # seconds before the site is probed again
+CIRCUIT_MAX_RESET_TIMEOUT = 3600  # seconds, the pause doubles after each failed probe
+DEFAULT_RESPONSE_CACHE_SIZE = 256  # validated responses kept per account, at least
+RESPONSE_CACHE_ENTRIES_PER_METER = 2  # polls of a meter from its high-water mark and with corrections
 
 # Data keys
 DATA_ELECTRICITY = "electricity"
@@ -45,3 +109,21 @@ UTILITY_UNITS = {
     UTILITY_COOLING: ENERGY_KILOWATT_HOUR,
     UTILITY_HEATING: ENERGY_KILOWATT_HOUR
 }
+
+# Hours by which the data of each utility lags behind
+DEFAULT_DATA_DELAY = 2
+UTILITY_DATA_DELAYS = {
+    UTILITY_ELECTRICITY: 24,
+}
+
+# Periods of the running totals
+PERIOD_TODAY = "today"
+PERIOD_WEEK = "week"
+PERIOD_MONTH = "month"
+PERIOD_BILLING_CYCLE = "billing_cycle"
+PERIODS = (PERIOD_TODAY, PERIOD_WEEK, PERIOD_MONTH, PERIOD_BILLING_CYCLE)
+DEFAULT_BILLING_DAY = 1  # day of the month on which a billing cycle starts
+MAX_BILLING_DAY = 28
+
+# Periods of the running costs
+COST_PERIODS = (PERIOD_TODAY, PERIOD_BILLING_CYCLE)
@@ -0,0 +1,783 @@
+"""Data update coordinator for Provident Energy integration."""
+from __future__ import annotations
+
+import asyncio
+import logging
+from dataclasses import asdict
+from datetime import datetime, timedelta
+from typing import Any, Dict
+
+from homeassistant.config_entries import ConfigEntry
+from homeassistant.core import HomeAssistant, callback
+from homeassistant.helpers.debounce import Debouncer
+from homeassistant.helpers.dispatcher import async_dispatcher_send
+from homeassistant.helpers.event import async_track_time_change
+from homeassistant.helpers.importlib import async_import_module
+from homeassistant.helpers.storage import Store
+from homeassistant.helpers.update_coordinator import (
+    DataUpdateCoordinator,
+    UpdateFailed,
+)
+from homeassistant.util import dt as dt_util
+
+from .api import ProvidentEnergyAPI, Consumption, Utility, UtilityGroup, get_consumption_window
+from .const import (
+    API_BASE_URL,
+    CONF_BASE_URL,
+    CONF_BILLING_DAY,
+    DATA_VALIDATED_SESSIONS,
+    DEFAULT_BILLING_DAY,
+    DEFAULT_CORRECTION_INTERVAL,
+    DEFAULT_CORRECTION_WINDOW,
+    DEFAULT_SCAN_INTERVAL,
+    DOMAIN,
+    MANUAL_REFRESH_COOLDOWN,
+    MANUAL_REFRESH_MIN_INTERVAL,
+    PERIOD_BILLING_CYCLE,
+    SIGNAL_METRICS_UPDATED,
+    SNAPSHOT_SAVE_DELAY,
+    STORAGE_KEY_METER_TREE,
+    STORAGE_KEY_SESSION,
+    STORAGE_KEY_SNAPSHOT,
+    STORAGE_VERSION,
+    UPDATE_TIMEOUT,
+)
+from .gaps import GapTracker
+from .scheduler import PublicationScheduler
+from .series import ConsumptionSeries
+from .tariff import get_cycle_usage_before, get_tariffs
+from .totals import PeriodTotals, get_earliest_period_start
+from .transport import async_get_transport
+
+_LOGGER = logging.getLogger(__name__)
+
+
+class ProvidentEnergyDataUpdateCoordinator(DataUpdateCoordinator):
+    """Class to manage fetching Provident Energy data."""
+
+    def __init__(
+            self,
+            hass: HomeAssistant,
+            entry: ConfigEntry,
+            username: str,
+            password: str,
+    ) -> None:
+        """Initialize the data update coordinator."""
+        self.username = username
+        self.password = password
+
+        transport = async_get_transport(hass)
+        base_url = entry.data.get(CONF_BASE_URL, API_BASE_URL)
+        self.provident_api = ProvidentEnergyAPI(
+            transport.session,
+            username,
+            password,
+            rate_limiter=transport.rate_limiter,
+            base_url=base_url,
+            circuit_breaker=transport.async_get_circuit_breaker(base_url),
+            # The polled window is in Home Assistant's time zone, not the system's
+            time_zone=dt_util.get_default_time_zone(),
+        )
+        self._meter_tree_store: Store[Dict[str, Any]] = Store(
+            hass, STORAGE_VERSION, f"{STORAGE_KEY_METER_TREE}.{entry.entry_id}"
+        )
+        self._meter_tree_saved: datetime | None = None
+        self._session_store: Store[Dict[str, Any]] = Store(
+            hass, STORAGE_VERSION, f"{STORAGE_KEY_SESSION}.{entry.entry_id}"
+        )
+        self._session_saved: Dict[str, str] | None = None
+        self._snapshot_store: Store[Dict[str, Any]] = Store(
+            hass, STORAGE_VERSION, f"{STORAGE_KEY_SNAPSHOT}.{entry.entry_id}"
+        )
+
+        # Locally held series and when its trailing window was last re-fetched
+        self._series: Dict[str, Consumption] = {}
+        self._last_correction: datetime | None = None
+        self.billing_day = entry.options.get(CONF_BILLING_DAY, DEFAULT_BILLING_DAY)
+        self._totals: Dict[str, PeriodTotals] = {}
+        # Hours of each meter to request again until they are filled
+        self._gaps: Dict[str, GapTracker] = {}
+        # Bumped when late hours change the totals of a meter but not its series
+        self._totals_versions: Dict[str, int] = {}
+
+        # Cost of the locally held series and its running totals, for meters
+        # whose utility has a tariff
+        self.tariffs = get_tariffs(entry.options)
+        self._costs: Dict[str, ConsumptionSeries] = {}
+        self._cost_totals: Dict[str, PeriodTotals] = {}
+        self._last_poll: datetime | None = None
+        self._force_poll = False
+        # Whether the data is the last known data, kept while the site is down
+        self.stale = False
+        self._scheduler = PublicationScheduler(
+            offset=transport.async_register(entry.entry_id)
+        )
+
+        super().__init__(
+            hass,
+            _LOGGER,
+            config_entry=entry,
+            name=DOMAIN,
+            update_interval=timedelta(seconds=DEFAULT_SCAN_INTERVAL),
+            # Only notify listeners when a series actually changed
+            always_update=False,
+            request_refresh_debouncer=Debouncer(
+                hass, _LOGGER, cooldown=MANUAL_REFRESH_COOLDOWN, immediate=True
+            ),
+        )
+
+        # A single tracker lets every entity move on to the next hour, however many there are
+        entry.async_on_unload(
+            async_track_time_change(hass, self._async_handle_hour_change, minute=0, second=0)
+        )
+
+    @callback
+    def _async_handle_hour_change(self, now: datetime) -> None:
+        """Let the entities move on to the next hour of the data that was already fetched."""
+        if self.data is not None:
+            self.async_update_listeners()
+
+    async def async_restore(self) -> bool:
+        """Restore the meter tree, session and data persisted by a previous run.
+
+        Returns:
+            True if the last known data was restored, so that entities can be
+            created before the first refresh
+        """
+        if self.tariffs:
+            # Costs are computed with numpy, import it without blocking the event loop
+            await async_import_module(self.hass, "numpy")
+
+        await self._async_load_meter_tree()
+        await self._async_load_session()
+        return await self._async_load_snapshot()
+
+    async def _async_load_snapshot(self) -> bool:
+        """Restore the data of the last successful update, if any."""
+        stored = await self._snapshot_store.async_load()
+        if not stored:
+            return False
+
+        try:
+            series = {
+                utility_id: Consumption.from_dict(consumption)
+                for utility_id, consumption in stored["series"].items()
+            }
+        except (KeyError, TypeError, ValueError) as err:
+            _LOGGER.warning("Ignoring invalid stored data: %s", err)
+            return False
+
+        if not series:
+            return False
+
+        try:
+            totals = {
+                utility_id: PeriodTotals.from_dict(meter_totals, self.billing_day)
+                for utility_id, meter_totals in stored.get("totals", {}).items()
+            }
+        except (KeyError, TypeError, ValueError) as err:
+            _LOGGER.warning("Ignoring invalid stored totals: %s", err)
+            totals = {}
+        for utility_id, meter_totals in totals.items():
+            if PERIOD_BILLING_CYCLE not in meter_totals.totals and utility_id in series:
+                # The billing day changed, count the new cycle from the held data
+                meter_totals.seed(PERIOD_BILLING_CYCLE, series[utility_id].data)
+
+        try:
+            gaps = {
+                utility_id: GapTracker.from_dict(meter_gaps)
+                for utility_id, meter_gaps in stored.get("gaps", {}).items()
+            }
+        except (KeyError, TypeError, ValueError) as err:
+            _LOGGER.warning("Ignoring invalid stored gaps: %s", err)
+            gaps = {}
+
+        self._series = series
+        self._totals = totals
+        self._gaps = gaps
+        self._load_cost_totals(stored.get("costs", {}))
+        self.data = self._get_data()
+        return True
+
+    def _load_cost_totals(self, stored: Dict[str, Any]) -> None:
+        """Restore the running costs that were computed with the current tariffs."""
+        for utility_id, costs in stored.items():
+            consumption = self._series.get(utility_id)
+            if consumption is None or utility_id not in self._totals:
+                continue
+            tariff = self.tariffs.get(consumption.utility_name)
+            if tariff is None or costs.get("tariff") != tariff.fingerprint:
+                # The tariff changed, start counting again
+                continue
+            try:
+                self._cost_totals[utility_id] = PeriodTotals.from_dict(
+                    costs["totals"], self.billing_day
+                )
+            except (KeyError, TypeError, ValueError) as err:
+                _LOGGER.warning("Ignoring invalid stored costs: %s", err)
+                continue
+            self._costs[utility_id] = self._get_costs(utility_id, consumption)
+
+    @callback
+    def _async_save_snapshot(self) -> None:
+        """Persist the current data after a short delay, batching quick updates."""
+        self._snapshot_store.async_delay_save(
+            lambda: {
+                "series": {
+                    utility_id: consumption.as_dict()
+                    for utility_id, consumption in self._series.items()
+                },
+                "totals": {
+                    utility_id: totals.as_dict()
+                    for utility_id, totals in self._totals.items()
+                },
+                "gaps": {
+                    utility_id: gaps.as_dict()
+                    for utility_id, gaps in self._gaps.items()
+                    if gaps
+                },
+                "costs": {
+                    utility_id: {
+                        "tariff": self.tariffs[self._series[utility_id].utility_name].fingerprint,
+                        "totals": totals.as_dict(),
+                    }
+                    for utility_id, totals in self._cost_totals.items()
+                },
+            },
+            SNAPSHOT_SAVE_DELAY,
+        )
+
+    async def _async_load_session(self) -> None:
+        """Reuse the session from the config flow or a previous run, if any.
+
+        Without one, the first request logs in.
+        """
+        validated = self.hass.data.get(DOMAIN, {}).get(DATA_VALIDATED_SESSIONS, {})
+        if cookies := validated.pop(self.username, None):
+            self.provident_api.restore_session(cookies)
+            return
+
+        stored = await self._session_store.async_load()
+        if stored and isinstance(stored.get("cookies"), dict):
+            self.provident_api.restore_session(stored["cookies"])
+            self._session_saved = stored["cookies"]
+
+    async def _async_save_session(self) -> None:
+        """Persist the session cookies if they changed since they were last saved."""
+        cookies = self.provident_api.session_cookies
+        if cookies == self._session_saved:
+            return
+
+        await self._session_store.async_save({"cookies": cookies})
+        self._session_saved = cookies
+
+    async def _async_load_meter_tree(self) -> None:
+        """Restore the meter tree persisted by a previous run."""
+        stored = await self._meter_tree_store.async_load()
+        if not stored:
+            return
+
+        try:
+            groups = [UtilityGroup.from_dict(group) for group in stored["groups"]]
+            updated = datetime.fromisoformat(stored["updated"])
+        except (KeyError, TypeError, ValueError) as err:
+            _LOGGER.warning("Ignoring invalid stored meter tree: %s", err)
+            return
+
+        self.provident_api.set_utility_groups(groups, updated)
+        self._meter_tree_saved = updated
+
+    async def _async_save_meter_tree(self) -> None:
+        """Persist the meter tree if it was requested again since it was last saved."""
+        api = self.provident_api
+        if api.utility_groups is None or api.utility_groups_updated == self._meter_tree_saved:
+            return
+
+        await self._meter_tree_store.async_save(
+            {
+                "updated": api.utility_groups_updated.isoformat(),
+                "groups": [asdict(group) for group in api.utility_groups],
+            }
+        )
+        self._meter_tree_saved = api.utility_groups_updated
+
+    async def async_request_manual_refresh(self) -> None:
+        """Request a refresh that polls even when no new data is expected yet.
+
+        Requests are debounced, and a poll is still skipped when the previous
+        one was less than MANUAL_REFRESH_MIN_INTERVAL ago, so a burst of
+        requests results in a single fetch.
+        """
+        self._force_poll = True
+        await self.async_request_refresh()
+
+    async def _async_update_data(self) -> Dict[str, Any]:
+        """Fetch data from Provident Energy API."""
+        # The hourly data is in Home Assistant's time zone, like the statistics
+        now = dt_util.now().replace(tzinfo=None)
+        force_poll, self._force_poll = self._force_poll, False
+        if (
+                force_poll
+                and self.data is not None
+                and self._last_poll is not None
+                and now - self._last_poll < timedelta(seconds=MANUAL_REFRESH_MIN_INTERVAL)
+        ):
+            _LOGGER.debug("Skipping requested refresh, last poll was at %s", self._last_poll)
+            self.update_interval = self._scheduler.time_until_next(now)
+            return self.data
+
+        if self.data is not None and not force_poll and not self._scheduler.should_poll(now):
+            _LOGGER.debug(
+                "Skipping poll, no new data is expected before %s",
+                self._scheduler.next_publication,
+            )
+            self.update_interval = self._scheduler.time_until_next(now)
+            return self.data
+
+        circuit_breaker = self.provident_api.circuit_breaker
+        if self.data is not None and circuit_breaker is not None and circuit_breaker.retry_in > 0:
+            _LOGGER.debug(
+                "Skipping poll, %s is not responding, next try in %.0fs",
+                circuit_breaker.host,
+                circuit_breaker.retry_in,
+            )
+            self._set_stale(True)
+            self.update_interval = timedelta(seconds=circuit_breaker.retry_in)
+            return self.data
+
+        self._last_poll = now
+        try:
+            async with asyncio.timeout(UPDATE_TIMEOUT):
+                # The meters to request depend on the meter tree, refresh it once it expired
+                await self.provident_api.get_cached_utility_groups()
+                starts, correction = self._get_fetch_starts(now)
+                window_start, window_end = get_consumption_window(now)
+                # Days with gaps before the fetched range of a meter are requested on their own
+                consumption, gap_data = await asyncio.gather(
+                    self._async_fetch_consumption(starts, window_start, window_end),
+                    self._async_fetch_gaps(
+                        {
+                            utility.id: start or window_start
+                            for start, utilities in starts.items()
+                            for utility in utilities or []
+                        },
+                        now,
+                    ),
+                )
+                if not consumption:
+                    raise UpdateFailed("Failed to get consumption data")
+
+                await self._async_save_meter_tree()
+                await self._async_save_session()
+
+        except Exception as err:
+            self.update_interval = self._scheduler.on_failure()
+            if self.data is not None and circuit_breaker is not None and circuit_breaker.is_open:
+                # Keep the entities available with the last known data
+                _LOGGER.warning("Error communicating with API, keeping the last known data: %s", err)
+                self._set_stale(True)
+                return self.data
+            _LOGGER.error("Error communicating with API: %s", err)
+            raise
+        finally:
+            async_dispatcher_send(
+                self.hass, f"{SIGNAL_METRICS_UPDATED}_{self.config_entry.entry_id}"
+            )
+
+        marks_before = self._get_high_water_marks(now)
+        series_before = self._series
+        late_hours_filled = self._merge_gaps(consumption, gap_data, now)
+        catch_up_starts = {
+            utility.id: start
+            for start, utilities in starts.items()
+            if start is not None and start < window_start
+            for utility in utilities or []
+        }
+        late_hours_filled |= self._merge_series(consumption, catch_up_starts, now)
+        if self._series != series_before or late_hours_filled:
+            self._async_save_snapshot()
+        if late_hours_filled and self._series == series_before:
+            # The data compares equal, so the listeners wouldn't be notified of the new totals
+            self.async_update_listeners()
+        if correction:
+            self._last_correction = now
+
+        marks = self._get_high_water_marks(now)
+        new_data = any(
+            mark is not None and mark != marks_before.get(utility_id, (None, None))[1]
+            for utility_id, (_, mark) in marks.items()
+        )
+        self.update_interval = self._scheduler.on_success(marks.values(), now, new_data)
+        _LOGGER.debug("Next poll in %s", self.update_interval)
+
+        self._set_stale(False)
+        return self._get_data()
+
+    def _set_stale(self, stale: bool) -> None:
+        """Mark the data as the last known data or as current, notifying the entities."""
+        if stale == self.stale:
+            return
+        self.stale = stale
+        # The data itself doesn't change, so the listeners wouldn't be notified otherwise
+        self.async_update_listeners()
+
+    def _get_data(self) -> Dict[str, Consumption]:
+        """Get the locally held series keyed by meter id."""
+        return dict(self._series)
+
+    def get_period_totals(self, utility_id: str) -> PeriodTotals | None:
+        """Get the running totals of a meter."""
+        return self._totals.get(utility_id)
+
+    def get_cost_totals(self, utility_id: str) -> PeriodTotals | None:
+        """Get the running costs of a meter, if its utility has a tariff."""
+        return self._cost_totals.get(utility_id)
+
+    def get_totals_version(self, utility_id: str) -> int:
+        """Get a number that changes when late hours change the totals of a meter."""
+        return self._totals_versions.get(utility_id, 0)
+
+    def get_gap_counts(self) -> Dict[str, int]:
+        """Get the number of missing or provisional hours tracked for each meter."""
+        return {utility_id: len(gaps) for utility_id, gaps in self._gaps.items()}
+
+    def get_utility_group(self, utility_id: str) -> UtilityGroup | None:
+        """Get the group in the meter tree that a meter belongs to."""
+        for group in self.provident_api.utility_groups or []:
+            if any(utility.id == utility_id for utility in group.utilities):
+                return group
+        return None
+
+    def _get_high_water_marks(
+            self, now: datetime
+    ) -> dict[str, tuple[str | None, datetime | None]]:
+        """Get the utility name and high-water mark of every meter in the tree.
+
+        Both are None for a meter without data.
+        """
+        marks = {}
+        for group in self.provident_api.utility_groups or []:
+            for utility in group.utilities:
+                consumption = self._series.get(utility.id)
+                if consumption is None:
+                    marks[utility.id] = (None, None)
+                else:
+                    marks[utility.id] = (
+                        consumption.utility_name, consumption.high_water_mark(now)
+                    )
+        return marks
+
+    def _get_fetch_starts(
+            self, now: datetime
+    ) -> tuple[Dict[datetime | None, list[Utility] | None], bool]:
+        """Get the first day to request for each meter and whether it re-fetches the trailing window.
+
+        Only the days from a meter's own high-water mark on are requested,
+        except that every DEFAULT_CORRECTION_INTERVAL a trailing window before
+        the high-water marks is requested again to pick up late corrections.
+        Meters are grouped by their first day, so that e.g. electricity, which
+        lags by a day, is requested from yesterday in one batch and the other
+        meters from today in another. Meters without data yet are requested
+        from today, and over the full window along with the corrections.
+
+        The hours before the window are requested too when they count towards
+        the current periods but were never counted: for the meters whose totals
+        are new, from the start of the earliest period, and when the polls
+        stopped for longer than the window, from the high-water mark on.
+
+        Returns:
+            The meters to request keyed by their first day, None for the full
+            window, and whether the trailing window is re-fetched. Without a
+            meter tree yet, every meter is requested over the full window,
+            with None for the meters.
+        """
+        window_start, _ = get_consumption_window(now)
+        groups = self.provident_api.utility_groups
+        if not groups:
+            return {None: None}, True
+
+        correction = (
+            self._last_correction is None
+            or now - self._last_correction >= timedelta(seconds=DEFAULT_CORRECTION_INTERVAL)
+        )
+        today = now.replace(hour=0, minute=0, second=0, microsecond=0)
+        counted_since = min(get_earliest_period_start(now, self.billing_day), window_start)
+        starts: Dict[datetime | None, list[Utility] | None] = {}
+        for group in groups:
+            for utility in group.utilities:
+                consumption = self._series.get(utility.id)
+                mark = consumption.high_water_mark(now) if consumption else None
+                if utility.id not in self._totals:
+                    start = counted_since
+                elif consumption is not None and (mark or consumption.start_date) < window_start:
+                    # The hours between the held data and the window were never requested
+                    last = mark or consumption.start_date
+                    start = max(last.replace(hour=0, minute=0, second=0, microsecond=0), counted_since)
+                elif mark is None:
+                    start = window_start if correction else today
+                else:
+                    if correction:
+                        mark -= timedelta(seconds=DEFAULT_CORRECTION_WINDOW)
+                    start = max(mark.replace(hour=0, minute=0, second=0, microsecond=0), window_start)
+                starts.setdefault(None if start == window_start else start, []).append(utility)
+        return starts, correction
+
+    async def _async_fetch_consumption(
+            self,
+            starts: Dict[datetime | None, list[Utility] | None],
+            window_start: datetime,
+            window_end: datetime,
+    ) -> Dict[str, Consumption]:
+        """Request the meters grouped by their first day, one batched request per day.
+
+        Meters without a first day of their own are requested from the start
+        of the window, and all of them up to its end.
+        """
+        results = await asyncio.gather(
+            *(
+                self.provident_api.get_consumption_data(start or window_start, window_end, utilities)
+                for start, utilities in starts.items()
+            )
+        )
+        consumption: Dict[str, Consumption] = {}
+        for result in results:
+            consumption.update(result)
+        return consumption
+
+    def _merge_series(
+            self, consumption: Dict[str, Consumption], catch_up_starts: Dict[str, datetime], now: datetime
+    ) -> bool:
+        """Merge newly fetched data into the locally held series.
+
+        A series that is unchanged by the merge is kept as the same object, so
+        that the data of a poll without changes compares equal to the previous
+        data and entities can tell their series changed by identity alone.
+        The running totals of the series that did change are adjusted by the
+        differences.
+
+        Args:
+            consumption: The fetched data of each meter
+            catch_up_starts: First hour of the data fetched before the window for
+                each meter, which is added to the totals without being held
+            now: The current time
+
+        Returns:
+            True if any hour before the window changed the totals
+        """
+        window_start, window_end = get_consumption_window(now)
+
+        # Drop the series of meters that were removed from the tree
+        utility_ids = self._series.keys() | consumption.keys()
+        if groups := self.provident_api.utility_groups:
+            utility_ids &= {utility.id for group in groups for utility in group.utilities}
+
+        series: Dict[str, Consumption] = {}
+        late_hours_added = False
+        for utility_id in utility_ids:
+            held = self._series.get(utility_id)
+            newer = consumption.get(utility_id, held)
+            previous = held or newer
+            merged = previous.merge(newer, window_start, window_end)
+            if merged == held:
+                merged = held
+            series[utility_id] = merged
+
+            totals = self._totals.get(utility_id)
+            counted = totals is not None and held is not None
+            if not counted:
+                # Start counting with every value held
+                totals = self._totals[utility_id] = PeriodTotals(self.billing_day)
+                totals.apply(None, merged.data)
+                self._cost_totals.pop(utility_id, None)
+            elif merged is not held:
+                totals.apply(held.data, merged.data)
+
+            if merged is not held or utility_id not in self._cost_totals:
+                self._update_costs(utility_id, merged)
+
+            if merged is not held:
+                self._gaps.setdefault(utility_id, GapTracker()).update(
+                    held.data if held else None, merged.data, now
+                )
+
+            catch_up_start = catch_up_starts.get(utility_id)
+            if catch_up_start is not None and newer is not held and newer.start_date <= catch_up_start:
+                late_hours_added |= self._add_catch_up_hours(
+                    utility_id, held if counted else None, newer, catch_up_start, window_start, now
+                )
+
+        self._series = series
+        self._totals = {utility_id: self._totals[utility_id] for utility_id in series}
+        self._gaps = {
+            utility_id: gaps for utility_id, gaps in self._gaps.items() if utility_id in series
+        }
+        self._costs = {
+            utility_id: costs for utility_id, costs in self._costs.items() if utility_id in series
+        }
+        self._cost_totals = {
+            utility_id: totals
+            for utility_id, totals in self._cost_totals.items()
+            if utility_id in series
+        }
+        return late_hours_added
+
+    def _add_catch_up_hours(
+            self,
+            utility_id: str,
+            held: Consumption | None,
+            fetched: Consumption,
+            start: datetime,
+            window_start: datetime,
+            now: datetime,
+    ) -> bool:
+        """Add the hours fetched before the window to the running totals and costs.
+
+        Args:
+            utility_id: The meter
+            held: The series held before, whose values were already counted, None
+                if nothing was counted yet
+            fetched: The fetched data, covering [start, window_start)
+            start: First hour fetched before the window
+            window_start: Start of the held window
+            now: The current time
+
+        Returns:
+            True if any hour changed the totals
+        """
+        previous = (
+            held.data.window(start, window_start)
+            if held is not None
+            else ConsumptionSeries.empty(start, window_start)
+        )
+        current = previous.merge(fetched.data, start, window_start)
+        if current == previous:
+            return False
+
+        self._add_late_hours(utility_id, fetched.utility_name, previous, current)
+        if held is not None:
+            # Hours that missed their polls may be late like any others. Before
+            # anything was counted, most of the missing hours are from before the
+            # meter was installed, and not worth requesting again.
+            self._gaps.setdefault(utility_id, GapTracker()).update(previous, current, now)
+        return True
+
+    async def _async_fetch_gaps(
+            self, befores: Dict[str, datetime], now: datetime
+    ) -> Dict[str, Consumption]:
+        """Request the days with gaps before the first day requested for each meter again.
+
+        Consecutive days with gaps are requested as one range, and the meters
+        that need the same range share a request.
+
+        Returns:
+            The data requested for each meter, covering all of its ranges
+        """
+        requests: Dict[tuple[datetime, datetime], list[Utility]] = {}
+        for group in self.provident_api.utility_groups or []:
+            for utility in group.utilities:
+                gaps = self._gaps.get(utility.id)
+                if gaps and (before := befores.get(utility.id)) is not None:
+                    for date_range in gaps.ranges(before, now):
+                        requests.setdefault(date_range, []).append(utility)
+        if not requests:
+            return {}
+
+        _LOGGER.debug("Requesting %d ranges with gaps again", len(requests))
+        results = await asyncio.gather(
+            *(
+                self.provident_api.get_consumption_data(start, end, utilities)
+                for (start, end), utilities in requests.items()
+            )
+        )
+
+        gap_data: Dict[str, Consumption] = {}
+        for result in results:
+            for utility_id, fetched in result.items():
+                if (held := gap_data.get(utility_id)) is not None:
+                    fetched = held.merge(
+                        fetched,
+                        min(held.start_date, fetched.start_date),
+                        max(held.end_date, fetched.end_date),
+                    )
+                gap_data[utility_id] = fetched
+        return gap_data
+
+    def _merge_gaps(
+            self, consumption: Dict[str, Consumption], gap_data: Dict[str, Consumption], now: datetime
+    ) -> bool:
+        """Merge the data requested for gaps into the polled data.
+
+        Hours that are still held are merged like any polled data. Those that
+        already left the held window are added to the running totals directly.
+
+        Returns:
+            True if any hour that is no longer held was filled
+        """
+        window_start, _ = get_consumption_window(now)
+        late_hours_filled = False
+        for utility_id, fetched in gap_data.items():
+            gaps = self._gaps.get(utility_id)
+            if gaps is None or utility_id not in self._series:
+                continue
+
+            if filled := gaps.resolve(fetched.data, window_start, now):
+                self._add_late_hours(utility_id, fetched.utility_name, *filled)
+                late_hours_filled = True
+
+            if (polled := consumption.get(utility_id)) is not None:
+                fetched = fetched.merge(polled, fetched.start_date, polled.end_date)
+            consumption[utility_id] = fetched
+        return late_hours_filled
+
+    def _add_late_hours(
+            self,
+            utility_id: str,
+            utility_name: str,
+            previous: ConsumptionSeries,
+            current: ConsumptionSeries,
+    ) -> None:
+        """Add the change of hours that are no longer held to the running totals and costs."""
+        totals = self._totals.get(utility_id)
+        if totals is None:
+            return
+
+        billing = totals.totals.get(PERIOD_BILLING_CYCLE)
+        # Late hours are costed as the last consumption of their billing cycle,
+        # which gives the same total for the cycle
+        cycle_usage = get_cycle_usage_before(
+            previous, (billing.start, billing.total) if billing else None, self.billing_day
+        )
+        totals.apply(previous, current)
+
+        tariff = self.tariffs.get(utility_name)
+        cost_totals = self._cost_totals.get(utility_id)
+        if tariff is not None and cost_totals is not None:
+            previous_costs, _ = tariff.cost_series(previous, cycle_usage)
+            current_costs, _ = tariff.cost_series(current, cycle_usage)
+            cost_totals.apply(previous_costs, current_costs)
+        self._totals_versions[utility_id] = self._totals_versions.get(utility_id, 0) + 1
+
+    def _update_costs(self, utility_id: str, consumption: Consumption) -> None:
+        """Cost a changed series and adjust its running costs by the differences."""
+        if consumption.utility_name not in self.tariffs:
+            return
+
+        costs = self._get_costs(utility_id, consumption)
+        cost_totals = self._cost_totals.get(utility_id)
+        if cost_totals is None:
+            cost_totals = self._cost_totals[utility_id] = PeriodTotals(self.billing_day)
+            cost_totals.apply(None, costs)
+        else:
+            cost_totals.apply(self._costs.get(utility_id), costs)
+        self._costs[utility_id] = costs
+
+    def _get_costs(self, utility_id: str, consumption: Consumption) -> ConsumptionSeries:
+        """Get the cost of each hour of a series, given the running totals of its meter."""
+        billing = self._totals[utility_id].totals.get(PERIOD_BILLING_CYCLE)
+        cycle_usage = get_cycle_usage_before(
+            consumption.data,
+            (billing.start, billing.total) if billing else None,
+            self.billing_day,
+        )
+        costs, _ = self.tariffs[consumption.utility_name].cost_series(consumption.data, cycle_usage)
+        return costs
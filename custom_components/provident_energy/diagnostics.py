@@ -0,0 +1,40 @@
+"""Diagnostics support for Provident Energy."""
+from __future__ import annotations
+
+from typing import Any
+
+from homeassistant.components.diagnostics import async_redact_data
+from homeassistant.config_entries import ConfigEntry
+from homeassistant.core import HomeAssistant
+
+from .const import CONF_PASSWORD, CONF_USERNAME, DOMAIN
+from .coordinator import ProvidentEnergyDataUpdateCoordinator
+
+# The entry title includes the username
+TO_REDACT = {CONF_PASSWORD, CONF_USERNAME, "title"}
+
+
+async def async_get_config_entry_diagnostics(
+        hass: HomeAssistant, entry: ConfigEntry
+) -> dict[str, Any]:
+    """Return diagnostics for a config entry."""
+    coordinator: ProvidentEnergyDataUpdateCoordinator = hass.data[DOMAIN][entry.entry_id]
+    api = coordinator.provident_api
+
+    return {
+        "entry": async_redact_data(entry.as_dict(), TO_REDACT),
+        "metrics": api.metrics.as_dict(),
+        "coordinator": {
+            "last_update_success": coordinator.last_update_success,
+            "stale": coordinator.stale,
+            "update_interval": str(coordinator.update_interval),
+            "authenticated": api.authenticated,
+            "meter_tree_updated": (
+                api.utility_groups_updated.isoformat() if api.utility_groups_updated else None
+            ),
+            "meters": sum(len(group.utilities) for group in api.utility_groups or []),
+            "meters_with_data": len(coordinator.data or {}),
+            "gaps": coordinator.get_gap_counts(),
+        },
+        "circuit": api.circuit_breaker.as_dict() if api.circuit_breaker else None,
+    }
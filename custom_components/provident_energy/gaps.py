@@ -0,0 +1,187 @@
+"""Tracking of the hours missing from Provident Energy consumption data."""
+from __future__ import annotations
+
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional, Tuple
+
+from .const import DEFAULT_GAP_MAX_AGE, DEFAULT_PROVISIONAL_PERIOD
+from .series import ConsumptionSeries
+
+
+@dataclass
+class Gap:
+    """An hour whose value is expected to arrive or to change."""
+
+    first_seen: datetime
+    # When the hour got a zero that may stand in for late data
+    provisional_since: Optional[datetime] = None
+
+    @property
+    def provisional(self) -> bool:
+        """Check if the hour has a zero that is not trusted yet."""
+        return self.provisional_since is not None
+
+
+class GapTracker:
+    """Keep track of the hours of a meter that are missing or provisional.
+
+    When the site publishes late, the hours it doesn't have yet come back
+    without a value, or as zeros. An hour before the high-water mark without
+    a value is missing, and a zero that newly arrived is provisional until it
+    stayed zero for DEFAULT_PROVISIONAL_PERIOD. Hours are tracked until they
+    are filled or DEFAULT_GAP_MAX_AGE after they were first seen, including
+    after they left the window the coordinator holds, so that the days they
+    fall in can be requested again on their own.
+    """
+
+    def __init__(self, gaps: Optional[Dict[datetime, Gap]] = None) -> None:
+        """Initialize the tracker.
+
+        Args:
+            gaps: Gaps restored from as_dict(), keyed by the start of their hour
+        """
+        self.gaps: Dict[datetime, Gap] = gaps or {}
+
+    def __len__(self) -> int:
+        return len(self.gaps)
+
+    def update(
+            self, previous: Optional[ConsumptionSeries], current: ConsumptionSeries, now: datetime
+    ) -> None:
+        """Find the gaps of a new version of the held series, and drop the filled ones.
+
+        Args:
+            previous: The series held before, None if there was none
+            current: The new version of the series
+            now: The current time
+        """
+        mark = current.last_valid(now)
+        last_index = -1 if mark is None else current.index_of(mark)
+        for index in range(last_index):
+            hour = current.timestamp_at(index)
+            value = current[index]
+            gap = self.gaps.get(hour)
+            if value is None:
+                if gap is None:
+                    self.gaps[hour] = Gap(now)
+                else:
+                    gap.provisional_since = None
+            elif value == 0:
+                if gap is None:
+                    # A zero that replaces a missing value may be a placeholder
+                    if previous is not None and previous.value_at(hour) is None:
+                        self.gaps[hour] = Gap(now, now)
+                elif not gap.provisional:
+                    gap.provisional_since = now
+            elif gap is not None:
+                del self.gaps[hour]
+        self._expire(now)
+
+    def resolve(
+            self, fetched: ConsumptionSeries, before: datetime, now: datetime
+    ) -> Optional[Tuple[ConsumptionSeries, ConsumptionSeries]]:
+        """Fill the gaps before a time from data requested again.
+
+        Used for the hours that are no longer held, and so can't be updated
+        from the held series.
+
+        Args:
+            fetched: The data requested again
+            before: Only gaps before this time are filled
+            now: The current time
+
+        Returns:
+            The values the filled hours had before and their new values, as
+            series covering the first to the last of them, or None if no
+            hour was filled
+        """
+        changes: List[Tuple[datetime, Optional[float], float]] = []
+        for hour, gap in list(self.gaps.items()):
+            if hour >= before:
+                continue
+            value = fetched.value_at(hour)
+            if value is None or (value == 0 and gap.provisional):
+                continue
+            changes.append((hour, 0.0 if gap.provisional else None, value))
+            if value == 0:
+                gap.provisional_since = now
+            else:
+                del self.gaps[hour]
+        self._expire(now)
+
+        if not changes:
+            return None
+
+        changes.sort(key=lambda change: change[0])
+        start = changes[0][0]
+        length = (changes[-1][0] - start) // fetched.resolution + 1
+        previous_values: List[Optional[float]] = [None] * length
+        current_values: List[Optional[float]] = [None] * length
+        for hour, old, new in changes:
+            index = (hour - start) // fetched.resolution
+            previous_values[index] = old
+            current_values[index] = new
+        return (
+            ConsumptionSeries(start, previous_values, fetched.resolution),
+            ConsumptionSeries(start, current_values, fetched.resolution),
+        )
+
+    def ranges(self, before: datetime, now: datetime) -> List[Tuple[datetime, datetime]]:
+        """Get the days to request again to fill the gaps before a time.
+
+        Args:
+            before: Only gaps before this time are requested
+            now: The current time, gaps that expired by then are dropped
+
+        Returns:
+            Ranges of whole days as (start, end) midnights, with consecutive
+            days coalesced into a single range
+        """
+        self._expire(now)
+        days = sorted({
+            hour.replace(hour=0, minute=0, second=0, microsecond=0)
+            for hour in self.gaps
+            if hour < before
+        })
+        ranges: List[Tuple[datetime, datetime]] = []
+        for day in days:
+            if ranges and ranges[-1][1] == day:
+                ranges[-1] = (ranges[-1][0], day + timedelta(days=1))
+            else:
+                ranges.append((day, day + timedelta(days=1)))
+        return ranges
+
+    def _expire(self, now: datetime) -> None:
+        """Stop tracking the gaps that are too old, and trust the zeros that stayed."""
+        max_age = timedelta(seconds=DEFAULT_GAP_MAX_AGE)
+        provisional_period = timedelta(seconds=DEFAULT_PROVISIONAL_PERIOD)
+        self.gaps = {
+            hour: gap
+            for hour, gap in self.gaps.items()
+            if now - gap.first_seen < max_age
+            and not (gap.provisional and now - gap.provisional_since >= provisional_period)
+        }
+
+    def as_dict(self) -> Dict[str, Any]:
+        """Get the gaps in a JSON serializable form."""
+        return {
+            hour.isoformat(): {
+                "first_seen": gap.first_seen.isoformat(),
+                "provisional_since": (
+                    gap.provisional_since.isoformat() if gap.provisional_since else None
+                ),
+            }
+            for hour, gap in self.gaps.items()
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> GapTracker:
+        """Create a tracker from its as_dict() form."""
+        return cls({
+            datetime.fromisoformat(hour): Gap(
+                datetime.fromisoformat(gap["first_seen"]),
+                datetime.fromisoformat(gap["provisional_since"]) if gap["provisional_since"] else None,
+            )
+            for hour, gap in data.items()
+        })
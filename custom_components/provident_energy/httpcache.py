@@ -0,0 +1,89 @@
+"""Cache of validated HTTP responses for the Provident Energy API client."""
+from __future__ import annotations
+
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Dict, Mapping, Optional
+from urllib.parse import urlencode
+
+try:
+    from aiohttp.compression_utils import HAS_BROTLI
+except ImportError:
+    HAS_BROTLI = False
+
+from .const import DEFAULT_RESPONSE_CACHE_SIZE
+
+# aiohttp decodes gzip and deflate itself, and brotli when a brotli package is installed
+ACCEPT_ENCODING = "gzip, deflate, br" if HAS_BROTLI else "gzip, deflate"
+
+
+@dataclass
+class CachedResponse:
+    """Body of a response and the validators to revalidate it with."""
+
+    body: str
+    size: int
+    etag: Optional[str] = None
+    last_modified: Optional[str] = None
+
+    @property
+    def validators(self) -> Dict[str, str]:
+        """Get the headers that make a request conditional on this response."""
+        headers = {}
+        if self.etag:
+            headers["If-None-Match"] = self.etag
+        if self.last_modified:
+            headers["If-Modified-Since"] = self.last_modified
+        return headers
+
+
+class ResponseCache:
+    """Keep the responses that came with an ETag or Last-Modified header.
+
+    Entries are keyed by URL and query parameters, and the least recently
+    used ones are dropped once the cache is full. A request for a cached
+    entry is sent with its validators, so that the server can answer with
+    a 304 and no body when nothing changed.
+    """
+
+    def __init__(self, max_entries: int = DEFAULT_RESPONSE_CACHE_SIZE) -> None:
+        """Initialize the cache."""
+        self.max_entries = max_entries
+        self._entries: OrderedDict[str, CachedResponse] = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    @staticmethod
+    def key(url: str, params: Optional[Mapping[str, Any]] = None) -> str:
+        """Get the key of a request, independent of the order of its parameters."""
+        if not params:
+            return url
+        return f"{url}?{urlencode(sorted((k, str(v)) for k, v in params.items()))}"
+
+    def get(self, key: str) -> Optional[CachedResponse]:
+        """Get a cached response, marking it as recently used."""
+        response = self._entries.get(key)
+        if response is not None:
+            self._entries.move_to_end(key)
+        return response
+
+    def store(self, key: str, response: CachedResponse) -> None:
+        """Cache a response if it can be revalidated, or forget the previous one."""
+        if not response.etag and not response.last_modified:
+            self._entries.pop(key, None)
+            return
+        self._entries[key] = response
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def resize(self, max_entries: int) -> None:
+        """Change how many responses are kept, dropping the least recently used ones."""
+        self.max_entries = max_entries
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        """Forget all cached responses."""
+        self._entries.clear()
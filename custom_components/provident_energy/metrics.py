@@ -0,0 +1,175 @@
+"""Request metrics for the Provident Energy API client."""
+from __future__ import annotations
+
+from bisect import bisect_left
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional
+
+# Upper bounds of the latency histogram buckets, in seconds
+LATENCY_BUCKETS = (0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+ENDPOINT_SESSION = "session"
+ENDPOINT_LOGIN = "login"
+ENDPOINT_ROOT_NODES = "rootnodes"
+ENDPOINT_QUICKGRAPHS = "quickgraphs"
+ENDPOINT_PROBE = "probe"
+
+
+@dataclass
+class EndpointMetrics:
+    """Counters and latency histogram of a single endpoint."""
+
+    requests: int = 0
+    failures: int = 0
+    retries: int = 0
+    bytes_received: int = 0
+    bytes_saved: int = 0
+    not_modified: int = 0
+    latency_total: float = 0.0
+    last_latency: Optional[float] = None
+    last_success: Optional[datetime] = None
+    latency_buckets: List[int] = field(default_factory=lambda: [0] * (len(LATENCY_BUCKETS) + 1))
+
+    @property
+    def mean_latency(self) -> Optional[float]:
+        """Get the mean latency of the requests so far, in seconds."""
+        if not self.requests:
+            return None
+        return self.latency_total / self.requests
+
+    def latency_percentile(self, percentile: float) -> Optional[float]:
+        """Estimate a latency percentile from the histogram, as a bucket upper bound.
+
+        None is returned while there are no requests, or when the percentile
+        is beyond the last bucket.
+        """
+        if not self.requests:
+            return None
+        rank = percentile / 100 * self.requests
+        count = 0
+        for bound, bucket_count in zip(LATENCY_BUCKETS, self.latency_buckets):
+            count += bucket_count
+            if count >= rank:
+                return bound
+        return None
+
+    def as_dict(self) -> Dict[str, Any]:
+        """Get the metrics in a serializable form."""
+        return {
+            "requests": self.requests,
+            "failures": self.failures,
+            "retries": self.retries,
+            "bytes_received": self.bytes_received,
+            "bytes_saved": self.bytes_saved,
+            "not_modified": self.not_modified,
+            "mean_latency": self.mean_latency,
+            "last_latency": self.last_latency,
+            "p95_latency": self.latency_percentile(95),
+            "last_success": self.last_success.isoformat() if self.last_success else None,
+            "latency_histogram": {
+                f"le_{bound}": count
+                for bound, count in zip([*LATENCY_BUCKETS, "inf"], self.latency_buckets)
+            },
+        }
+
+
+class ApiMetrics:
+    """Metrics of all requests made by an API client."""
+
+    def __init__(self) -> None:
+        """Initialize the metrics."""
+        self.endpoints: Dict[str, EndpointMetrics] = {}
+        self.relogins = 0
+
+    def endpoint(self, name: str) -> EndpointMetrics:
+        """Get the metrics of an endpoint, creating them if needed."""
+        if name not in self.endpoints:
+            self.endpoints[name] = EndpointMetrics()
+        return self.endpoints[name]
+
+    def record_request(
+            self,
+            name: str,
+            latency: float,
+            size: int = 0,
+            success: bool = True,
+            saved: int = 0,
+            not_modified: bool = False,
+    ) -> None:
+        """Record a completed or failed request.
+
+        Args:
+            name: Name of the endpoint
+            latency: Time until the whole response was received, in seconds
+            size: Bytes received for the body, compressed or not
+            success: Whether the request succeeded
+            saved: Bytes of the decoded body that compression or a 304 saved
+            not_modified: Whether the response was a 304 served from the cache
+        """
+        metrics = self.endpoint(name)
+        metrics.requests += 1
+        metrics.latency_total += latency
+        metrics.last_latency = latency
+        metrics.latency_buckets[bisect_left(LATENCY_BUCKETS, latency)] += 1
+        metrics.bytes_received += size
+        metrics.bytes_saved += saved
+        if not_modified:
+            metrics.not_modified += 1
+        if success:
+            metrics.last_success = datetime.now(timezone.utc)
+        else:
+            metrics.failures += 1
+
+    def record_retry(self, name: str) -> None:
+        """Record that a request is retried."""
+        self.endpoint(name).retries += 1
+
+    def record_relogin(self) -> None:
+        """Record a login after the session expired."""
+        self.relogins += 1
+
+    @property
+    def requests(self) -> int:
+        """Get the number of requests to all endpoints."""
+        return sum(metrics.requests for metrics in self.endpoints.values())
+
+    @property
+    def retries(self) -> int:
+        """Get the number of retries on all endpoints."""
+        return sum(metrics.retries for metrics in self.endpoints.values())
+
+    @property
+    def bytes_received(self) -> int:
+        """Get the number of bytes received from all endpoints."""
+        return sum(metrics.bytes_received for metrics in self.endpoints.values())
+
+    @property
+    def bytes_saved(self) -> int:
+        """Get the number of bytes that compression and cached responses saved."""
+        return sum(metrics.bytes_saved for metrics in self.endpoints.values())
+
+    @property
+    def not_modified(self) -> int:
+        """Get the number of responses served from the cache after a 304."""
+        return sum(metrics.not_modified for metrics in self.endpoints.values())
+
+    @property
+    def last_success(self) -> Optional[datetime]:
+        """Get when the last request to any endpoint succeeded."""
+        successes = [m.last_success for m in self.endpoints.values() if m.last_success]
+        return max(successes, default=None)
+
+    def as_dict(self) -> Dict[str, Any]:
+        """Get the metrics in a serializable form."""
+        last_success = self.last_success
+        return {
+            "requests": self.requests,
+            "retries": self.retries,
+            "relogins": self.relogins,
+            "bytes_received": self.bytes_received,
+            "bytes_saved": self.bytes_saved,
+            "not_modified": self.not_modified,
+            "last_success": last_success.isoformat() if last_success else None,
+            "endpoints": {name: metrics.as_dict() for name, metrics in self.endpoints.items()},
+        }
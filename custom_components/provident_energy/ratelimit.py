@@ -0,0 +1,38 @@
+"""Request rate limiting for the Provident Energy API."""
+from __future__ import annotations
+
+import asyncio
+import time
+
+
+class RateLimiter:
+    """Token bucket allowing a number of requests per second.
+
+    Up to `burst` requests go through right away, after which requests are
+    spaced out to `rate` per second. Waiting requests are served in order.
+    """
+
+    def __init__(self, rate: float, burst: int = 1) -> None:
+        """Initialize the rate limiter.
+
+        Args:
+            rate: Requests allowed per second on average
+            burst: Requests allowed at once after a quiet period
+        """
+        self.rate = rate
+        self.burst = max(1, burst)
+        self._tokens = float(self.burst)
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self) -> None:
+        """Wait until a request may be made."""
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                await asyncio.sleep((1 - self._tokens) / self.rate)
@@ -0,0 +1,141 @@
+"""Polling schedule for Provident Energy data."""
+from __future__ import annotations
+
+import logging
+import random
+from datetime import datetime, timedelta
+from typing import Iterable, Optional, Tuple
+
+from .const import (
+    DEFAULT_DATA_DELAY,
+    MAX_POLL_INTERVAL,
+    MIN_POLL_INTERVAL,
+    POLL_JITTER,
+    PUBLICATION_MARGIN,
+    UTILITY_DATA_DELAYS,
+)
+
+_LOGGER = logging.getLogger(__name__)
+
+
+def get_data_delay(utility_name: str) -> int:
+    """Get how many hours the data of a utility lags behind."""
+    return UTILITY_DATA_DELAYS.get(utility_name, DEFAULT_DATA_DELAY)
+
+
+class PublicationScheduler:
+    """Work out when the next poll should happen.
+
+    The next data point of a meter is expected once the hour after its
+    high-water mark has passed plus the publication delay of its utility.
+    Polls are scheduled for the earliest such moment, plus some jitter so
+    that several accounts don't poll at the same time. When expected data
+    is late, or a poll fails, the interval backs off exponentially.
+    """
+
+    def __init__(
+            self,
+            min_interval: timedelta = timedelta(seconds=MIN_POLL_INTERVAL),
+            max_interval: timedelta = timedelta(seconds=MAX_POLL_INTERVAL),
+            jitter: timedelta = timedelta(seconds=POLL_JITTER),
+            margin: timedelta = timedelta(seconds=PUBLICATION_MARGIN),
+            offset: timedelta = timedelta(0),
+    ) -> None:
+        """Initialize the scheduler.
+
+        Args:
+            min_interval: Shortest interval between two polls
+            max_interval: Longest interval between two polls
+            jitter: Upper bound of the random delay added to each poll
+            margin: Time allowed for expected data to show up
+            offset: Fixed delay added to each poll, to stagger config entries
+        """
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.jitter = jitter
+        self.margin = margin
+        self.offset = offset
+        self.next_publication: Optional[datetime] = None
+        self._misses = 0
+
+    def expected_publication(
+            self, marks: Iterable[Tuple[Optional[str], Optional[datetime]]], now: datetime
+    ) -> datetime:
+        """Get when the next data point of any meter should be published.
+
+        Meters whose data is late are checked again after as long as it has
+        been overdue, so one meter that stopped publishing backs off on its
+        own instead of keeping the whole account polling. Once overdue by
+        more than max_interval, such meters are left out, like meters without
+        data, since there is no telling when their data will show up. They
+        are picked up by the polls for the other meters. Without any other
+        meter, the data is due now.
+
+        Args:
+            marks: Utility name and high-water mark of each meter, either may be None
+                for a meter without data
+            now: The current time
+        """
+        expected = None
+        for utility_name, mark in marks:
+            if mark is None:
+                continue
+            publication = (
+                mark
+                + timedelta(hours=1 + get_data_delay(utility_name or ""))
+                + self.margin
+            )
+            if publication <= now:
+                overdue = now - publication
+                if overdue > self.max_interval:
+                    continue
+                publication = now + max(self.min_interval, overdue)
+            if expected is None or publication < expected:
+                expected = publication
+        return expected or now
+
+    def should_poll(self, now: datetime) -> bool:
+        """Check if a poll can bring any new data."""
+        return self.next_publication is None or now >= self.next_publication
+
+    def on_success(
+            self,
+            marks: Iterable[Tuple[Optional[str], Optional[datetime]]],
+            now: datetime,
+            new_data: bool,
+    ) -> timedelta:
+        """Get the interval until the next poll after a successful one."""
+        expected = self.expected_publication(marks, now)
+        self._misses = 0 if new_data else self._misses + 1
+
+        if expected > now:
+            # The next data point isn't due yet, wait for it
+            self.next_publication = expected
+            interval = expected - now
+        else:
+            # The expected data is late, poll again but less and less often
+            self.next_publication = None
+            interval = self._backoff()
+
+        return self._with_jitter(interval)
+
+    def on_failure(self) -> timedelta:
+        """Get the interval until the next poll after a failed one."""
+        self._misses += 1
+        self.next_publication = None
+        return self._with_jitter(self._backoff())
+
+    def time_until_next(self, now: datetime) -> timedelta:
+        """Get the interval until the next poll when skipping one."""
+        if self.next_publication is None:
+            return self.min_interval
+        return self._with_jitter(self.next_publication - now)
+
+    def _backoff(self) -> timedelta:
+        """Get the backoff interval for the current number of misses."""
+        return self.min_interval * (2 ** min(self._misses, 16))
+
+    def _with_jitter(self, interval: timedelta) -> timedelta:
+        """Clamp an interval to the allowed range and add the offset and jitter."""
+        interval = max(self.min_interval, min(interval, self.max_interval))
+        return interval + self.offset + self.jitter * random.random()
@@ -3,26 +3,55 @@ from __future__ import annotations
 
 import logging
 from datetime import datetime, timedelta
-from typing import Any, Dict
+from typing import Any, Dict, List
 
-import async_timeout
 from homeassistant.components.sensor import (
     SensorDeviceClass,
     SensorEntity,
     SensorStateClass,
 )
 from homeassistant.config_entries import ConfigEntry
-from homeassistant.const import UnitOfEnergy, UnitOfVolume
-from homeassistant.core import HomeAssistant
+from homeassistant.const import (
+    EntityCategory,
+    UnitOfEnergy,
+    UnitOfInformation,
+    UnitOfTime,
+    UnitOfVolume,
+)
+from homeassistant.core import HomeAssistant, callback
+from homeassistant.helpers import device_registry as dr, entity_registry as er
+from homeassistant.helpers.device_registry import DeviceInfo
+from homeassistant.helpers.dispatcher import async_dispatcher_connect
 from homeassistant.helpers.entity_platform import AddEntitiesCallback
 from homeassistant.helpers.typing import StateType
-from homeassistant.helpers.update_coordinator import (
-    CoordinatorEntity,
-    DataUpdateCoordinator,
+from homeassistant.helpers.update_coordinator import CoordinatorEntity
+from homeassistant.util import dt as dt_util
+
+from .api import Consumption
+from .const import (
+    COST_PERIODS,
+    DEFAULT_NAME,
+    DOMAIN,
+    PERIOD_BILLING_CYCLE,
+    PERIOD_MONTH,
+    PERIOD_TODAY,
+    PERIOD_WEEK,
+    SIGNAL_METRICS_UPDATED,
+    UTILITY_COLD_WATER,
+    UTILITY_COOLING,
+    UTILITY_ELECTRICITY,
+    UTILITY_HEATING,
+    UTILITY_HOT_WATER,
 )
-
-from .api import ProvidentEnergyAPI, Consumption
-from .const import *
+from .coordinator import ProvidentEnergyDataUpdateCoordinator
+from .metrics import (
+    ENDPOINT_LOGIN,
+    ENDPOINT_QUICKGRAPHS,
+    ENDPOINT_ROOT_NODES,
+    ApiMetrics,
+)
+from .scheduler import get_data_delay
+from .totals import PeriodTotals, get_period_start
 
 _LOGGER = logging.getLogger(__name__)
 
@@ -54,83 +83,248 @@ _UTILITY_CONFIGS = {
     },
 }
 
+_PERIOD_NAMES = {
+    PERIOD_TODAY: "today",
+    PERIOD_WEEK: "this week",
+    PERIOD_MONTH: "this month",
+    PERIOD_BILLING_CYCLE: "this billing cycle",
+}
+
+
+def _latency_config(endpoint: str, name: str) -> Dict[str, Any]:
+    """Get the configuration of the latency sensor of an endpoint."""
+
+    def value(metrics: ApiMetrics) -> StateType:
+        mean = metrics.endpoint(endpoint).mean_latency
+        return None if mean is None else round(mean * 1000)
+
+    def attributes(metrics: ApiMetrics) -> Dict[str, Any]:
+        endpoint_metrics = metrics.endpoint(endpoint).as_dict()
+        return {
+            key: endpoint_metrics[key]
+            for key in (
+                "requests",
+                "failures",
+                "retries",
+                "not_modified",
+                "last_latency",
+                "p95_latency",
+                "latency_histogram",
+            )
+        }
+
+    return {
+        "name": name,
+        "unit": UnitOfTime.MILLISECONDS,
+        "device_class": SensorDeviceClass.DURATION,
+        "state_class": SensorStateClass.MEASUREMENT,
+        "value": value,
+        "attributes": attributes,
+    }
+
+
+_DIAGNOSTIC_CONFIGS = {
+    "requests": {
+        "name": "API requests",
+        "unit": None,
+        "device_class": None,
+        "state_class": SensorStateClass.TOTAL_INCREASING,
+        "value": lambda metrics: metrics.requests,
+    },
+    "retries": {
+        "name": "API retries",
+        "unit": None,
+        "device_class": None,
+        "state_class": SensorStateClass.TOTAL_INCREASING,
+        "value": lambda metrics: metrics.retries,
+    },
+    "relogins": {
+        "name": "API re-logins",
+        "unit": None,
+        "device_class": None,
+        "state_class": SensorStateClass.TOTAL_INCREASING,
+        "value": lambda metrics: metrics.relogins,
+    },
+    "bytes_received": {
+        "name": "API data received",
+        "unit": UnitOfInformation.BYTES,
+        "device_class": SensorDeviceClass.DATA_SIZE,
+        "state_class": SensorStateClass.TOTAL_INCREASING,
+        "value": lambda metrics: metrics.bytes_received,
+    },
+    "bytes_saved": {
+        "name": "API data saved",
+        "unit": UnitOfInformation.BYTES,
+        "device_class": SensorDeviceClass.DATA_SIZE,
+        "state_class": SensorStateClass.TOTAL_INCREASING,
+        "value": lambda metrics: metrics.bytes_saved,
+        "attributes": lambda metrics: {"not_modified": metrics.not_modified},
+    },
+    "login_latency": _latency_config(ENDPOINT_LOGIN, "Login latency"),
+    "rootnodes_latency": _latency_config(ENDPOINT_ROOT_NODES, "Meter tree latency"),
+    "quickgraphs_latency": _latency_config(ENDPOINT_QUICKGRAPHS, "Consumption latency"),
+    "last_success": {
+        "name": "Last successful request",
+        "unit": None,
+        "device_class": SensorDeviceClass.TIMESTAMP,
+        "state_class": None,
+        "value": lambda metrics: metrics.last_success,
+    },
+}
+
 
 async def async_setup_entry(
         hass: HomeAssistant, entry: ConfigEntry, async_add_entities: AddEntitiesCallback
 ) -> None:
     """Set up Provident Energy sensor based on a config entry."""
-    username = entry.data[CONF_USERNAME]
-    password = entry.data[CONF_PASSWORD]
+    coordinator: ProvidentEnergyDataUpdateCoordinator = hass.data[DOMAIN][entry.entry_id]
 
-    coordinator = ProvidentEnergyDataUpdateCoordinator(
-        hass, username, password
-    )
+    # Sensors of the meters in the tree, keyed by meter id
+    meter_sensors: Dict[str, List[ProvidentEnergySensor]] = {}
 
-    # Fetch initial data so we have data when entities subscribe
-    await coordinator.async_config_entry_first_refresh()
+    @callback
+    def _async_update_meters() -> None:
+        """Add sensors for new meters and remove those of meters that are gone."""
+        data: Dict[str, Consumption] = coordinator.data or {}
 
-    entities = []
+        entities = []
+        for utility_id in data.keys() - meter_sensors.keys():
+            if sensors := _create_meter_sensors(coordinator, data, utility_id):
+                meter_sensors[utility_id] = sensors
+                entities.extend(sensors)
+        if entities:
+            async_add_entities(entities)
 
-    # Add sensors for all available utility types
-    for utility_name, config in _UTILITY_CONFIGS.items():
-        if utility_name in coordinator.data:
-            d: Consumption = coordinator.data[utility_name]
-            entities.append(
-                ProvidentEnergySensor(
-                    coordinator=coordinator,
-                    name=f"{DEFAULT_NAME} {utility_name}",
-                    unique_id=d.utility.title,
-                    data_key=utility_name,
-                    unit_of_measurement=config["unit"],
-                    device_class=config["device_class"],
-                    state_class=config["state_class"],
-                ))
+        removed = meter_sensors.keys() - data.keys()
+        if removed and data:
+            _async_remove_meters(hass, entry, coordinator, meter_sensors, removed)
 
-    async_add_entities(entities)
+    _async_update_meters()
+    entry.async_on_unload(coordinator.async_add_listener(_async_update_meters))
 
+    # Add diagnostic sensors for the requests made to the API
+    entities = []
+    for key, config in _DIAGNOSTIC_CONFIGS.items():
+        entities.append(
+            ProvidentEnergyDiagnosticSensor(
+                coordinator=coordinator,
+                unique_id=f"{entry.entry_id}_{key}",
+                config=config,
+            ))
 
-class ProvidentEnergyDataUpdateCoordinator(DataUpdateCoordinator):
-    """Class to manage fetching Provident Energy data."""
-
-    def __init__(
-            self,
-            hass: HomeAssistant,
-            username: str,
-            password: str,
-    ) -> None:
-        """Initialize the data update coordinator."""
-        self.username = username
-        self.password = password
+    async_add_entities(entities)
 
-        self.provident_api = ProvidentEnergyAPI(username, password)
 
-        super().__init__(
-            hass,
-            _LOGGER,
-            name=DOMAIN,
-            update_interval=timedelta(seconds=DEFAULT_SCAN_INTERVAL),
+def _create_meter_sensors(
+        coordinator: ProvidentEnergyDataUpdateCoordinator,
+        data: Dict[str, Consumption],
+        utility_id: str,
+) -> List[ProvidentEnergySensor]:
+    """Create the sensors of a meter, if its utility type is supported."""
+    d = data[utility_id]
+    config = _UTILITY_CONFIGS.get(d.utility_name)
+    if config is None:
+        _LOGGER.debug(f"Skipping meter {d.utility.text} with unsupported utility {d.utility_name}")
+        return []
+
+    group = coordinator.get_utility_group(utility_id)
+    device_info = None
+    name = d.utility_name
+    if group is not None:
+        device_info = DeviceInfo(
+            identifiers={(DOMAIN, group.id)},
+            name=group.text,
+            manufacturer=DEFAULT_NAME,
+        )
+        # Tell meters of the same utility apart when a group has several of them
+        same_utility = [
+            other for other in group.utilities
+            if other.id in data and data[other.id].utility_name == d.utility_name
+        ]
+        if len(same_utility) > 1:
+            name = f"{d.utility_name} {d.utility.title}"
+
+    sensors = [
+        ProvidentEnergySensor(
+            coordinator=coordinator,
+            name=name,
+            unique_id=d.utility.title,
+            utility_id=utility_id,
+            utility_name=d.utility_name,
+            unit_of_measurement=config["unit"],
+            device_class=config["device_class"],
+            state_class=config["state_class"],
+            device_info=device_info,
         )
+    ]
+
+    # Add a running total of the meter for each period
+    for period, period_name in _PERIOD_NAMES.items():
+        sensors.append(
+            ProvidentEnergyPeriodSensor(
+                coordinator=coordinator,
+                name=f"{name} {period_name}",
+                unique_id=f"{d.utility.title}_{period}",
+                utility_id=utility_id,
+                utility_name=d.utility_name,
+                unit_of_measurement=config["unit"],
+                device_class=config["device_class"],
+                state_class=SensorStateClass.TOTAL,
+                device_info=device_info,
+                period=period,
+            ))
+
+    # Add the running cost of the meter, if its utility has a tariff
+    if d.utility_name in coordinator.tariffs:
+        for period in COST_PERIODS:
+            sensors.append(
+                ProvidentEnergyCostSensor(
+                    coordinator=coordinator,
+                    name=f"{name} cost {_PERIOD_NAMES[period]}",
+                    unique_id=f"{d.utility.title}_{period}_cost",
+                    utility_id=utility_id,
+                    utility_name=d.utility_name,
+                    unit_of_measurement=coordinator.hass.config.currency,
+                    device_class=SensorDeviceClass.MONETARY,
+                    state_class=SensorStateClass.TOTAL,
+                    device_info=device_info,
+                    period=period,
+                ))
 
-    async def _async_setup(self) -> None:
-        self.provident_api.login()
+    return sensors
 
-    async def _async_update_data(self) -> Dict[str, Any]:
-        """Fetch data from Provident Energy API."""
-        try:
-            async with async_timeout.timeout(30):
-                consumption = self.provident_api.get_consumption_data()
-                if not consumption:
-                    raise Exception("Failed to get consumption data")
 
-                data = {}
-                for utility_id, consumption_data in consumption.items():
-                    data[consumption_data.utility_name] = consumption_data
+@callback
+def _async_remove_meters(
+        hass: HomeAssistant,
+        entry: ConfigEntry,
+        coordinator: ProvidentEnergyDataUpdateCoordinator,
+        meter_sensors: Dict[str, List[ProvidentEnergySensor]],
+        removed: set[str],
+) -> None:
+    """Remove the sensors of meters, and the devices of groups, that left the tree."""
+    entity_registry = er.async_get(hass)
+    for utility_id in removed:
+        for sensor in meter_sensors.pop(utility_id):
+            _LOGGER.info(f"Removing sensor {sensor.entity_id}, its meter is no longer in the tree")
+            if sensor.entity_id and entity_registry.async_get(sensor.entity_id):
+                entity_registry.async_remove(sensor.entity_id)
+            else:
+                hass.async_create_task(sensor.async_remove())
 
-                return data
+    group_ids = {group.id for group in coordinator.provident_api.utility_groups or []}
+    device_registry = dr.async_get(hass)
+    for device in dr.async_entries_for_config_entry(device_registry, entry.entry_id):
+        if not any(
+                domain == DOMAIN and identifier in group_ids
+                for domain, identifier in device.identifiers
+        ):
+            device_registry.async_update_device(device.id, remove_config_entry_id=entry.entry_id)
 
-        except Exception as err:
-            _LOGGER.error("Error communicating with API: %s", err)
-            raise
+
+def _get_current_hour() -> datetime:
+    """Get the start of the current hour in Home Assistant's time zone, without the zone."""
+    return dt_util.now().replace(tzinfo=None, minute=0, second=0, microsecond=0)
 
 
 class ProvidentEnergySensor(CoordinatorEntity, SensorEntity):
@@ -141,19 +335,29 @@ class ProvidentEnergySensor(CoordinatorEntity, SensorEntity):
             coordinator: ProvidentEnergyDataUpdateCoordinator,
             name: str,
             unique_id: str,
-            data_key: str,
+            utility_id: str,
+            utility_name: str,
             unit_of_measurement: str,
             device_class: SensorDeviceClass,
             state_class: SensorStateClass,
+            device_info: DeviceInfo | None = None,
     ) -> None:
         """Initialize the sensor."""
         super().__init__(coordinator)
         self._name = name
         self._unique_id = unique_id
-        self._data_key = data_key
+        self._utility_id = utility_id
+        self._utility_name = utility_name
+        self._attr_device_info = device_info
         self._unit_of_measurement = unit_of_measurement
         self._device_class = device_class
         self._state_class = state_class
+        self._state: StateType = None
+        self._attributes: Dict[str, Any] = {}
+        self._consumption: Consumption | None = None
+        self._state_hour: datetime | None = None
+        self._written_available: bool | None = None
+        self._written_stale = False
 
     @property
     def name(self) -> str:
@@ -183,95 +387,198 @@ class ProvidentEnergySensor(CoordinatorEntity, SensorEntity):
     @property
     def native_value(self) -> StateType:
         """Return the state of the sensor."""
-        try:
-            consumption = self.coordinator.data[self._data_key]
-
-            # Get current hour
-            now = datetime.now()
-            current_hour = now.hour
-
-            # Apply delay based on utility type
-            delay_hours = self._get_data_delay()
-
-            # The API returns 48 data points (24 for previous day, 24 for current day)
-            if consumption and hasattr(consumption, 'data') and len(consumption.data) == 48:
-                # Calculate the data hour considering the delay
-                data_hour = current_hour - delay_hours
-
-                if data_hour < 0:
-                    # If data_hour is negative, we need data from the previous day
-                    # First 24 points (0-23) are from the previous day
-                    index = data_hour + 24
-                else:
-                    # If data_hour is positive, we need data from the current day
-                    # Last 24 points (24-47) are from the current day
-                    index = data_hour + 24
-
-                return consumption.data[index]
-            return None
-        except (KeyError, TypeError, IndexError) as e:
-            _LOGGER.error(f"Error getting sensor value: {e}")
-            return None
+        return self._state
 
     @property
     def extra_state_attributes(self) -> Dict[str, Any]:
         """Return additional state attributes."""
-        attributes = {}
+        if self.coordinator.stale:
+            # The site is down, the state is from the last known data
+            return {**self._attributes, "stale": True}
+        return self._attributes
+
+    async def async_added_to_hass(self) -> None:
+        """Compute the initial state.
+
+        The coordinator notifies its listeners at the top of every hour, so
+        that the state moves on to the next hour of the data.
+        """
+        await super().async_added_to_hass()
+        self._update_state()
+
+    @callback
+    def _handle_coordinator_update(self) -> None:
+        """Recompute the state if the series of this sensor changed or a new hour started."""
+        consumption = (self.coordinator.data or {}).get(self._utility_id)
+        available = self.available
+        stale = self.coordinator.stale
+        if (
+                consumption is self._consumption
+                and available == self._written_available
+                and stale == self._written_stale
+                and _get_current_hour() == self._state_hour
+        ):
+            # The coordinator keeps unchanged series as the same object
+            return
+        self._written_available = available
+        self._written_stale = stale
+        self._update_state()
+        super()._handle_coordinator_update()
+
+    def _update_state(self) -> None:
+        """Compute the state and attributes for the current hour."""
+        # The hourly data is in Home Assistant's time zone, like the statistics
+        now = dt_util.now().replace(tzinfo=None)
+        self._state_hour = now.replace(minute=0, second=0, microsecond=0)
+
+        # The data lags behind by a delay that depends on the utility type
+        delay_hours = self._get_data_delay()
+        data_timestamp = self._get_data_timestamp(now)
+
+        attributes: Dict[str, Any] = {
+            "timestamp": data_timestamp.isoformat(),
+            "delay_hours": delay_hours,
+            "data_hour": data_timestamp.hour,
+            "day_offset": (data_timestamp.date() - now.date()).days,
+        }
+
+        consumption: Consumption | None = (self.coordinator.data or {}).get(self._utility_id)
+        self._consumption = consumption
+        if consumption:
+            index = consumption.data.index_of(data_timestamp)
+            if 0 <= index < len(consumption.data):
+                # Add the index used to get the data
+                attributes["data_index"] = index
 
-        try:
-            # Get current hour
-            now = datetime.now()
-            current_hour = now.hour
+            # Add the start and end dates from the consumption data
+            attributes["start_date"] = consumption.start_date.isoformat()
+            attributes["end_date"] = consumption.end_date.isoformat()
 
-            # Apply delay based on utility type
-            delay_hours = self._get_data_delay()
+            self._state = consumption.value_at(data_timestamp)
+        else:
+            self._state = None
 
-            # Calculate data hour considering the delay
-            data_hour = current_hour - delay_hours
+        self._attributes = attributes
 
-            # Calculate timestamp for the data point
-            timestamp = now - timedelta(hours=delay_hours)
+    @property
+    def has_entity_name(self) -> bool:
+        return True
 
-            # Determine if we're using data from previous day or current day
-            if data_hour < 0:
-                day_offset = -1  # Previous day
-                hour_of_day = data_hour + 24
-            else:
-                day_offset = 0  # Current day
-                hour_of_day = data_hour
-
-            # Add attributes
-            attributes["timestamp"] = timestamp.isoformat()
-            attributes["delay_hours"] = delay_hours
-            attributes["data_hour"] = hour_of_day
-            attributes["day_offset"] = day_offset
-
-            # Get consumption data
-            consumption = self.coordinator.data[self._data_key]
-            if consumption and hasattr(consumption, 'data') and len(consumption.data) == 48:
-                # Add the index used to get the data
-                index = data_hour + 24
-                attributes["data_index"] = index
+    def _get_data_timestamp(self, now: datetime) -> datetime:
+        """Get the start of the hour whose data the sensor shows."""
+        current_hour = now.replace(minute=0, second=0, microsecond=0)
+        return current_hour - timedelta(hours=self._get_data_delay())
+
+    def _get_data_delay(self) -> int:
+        # Electricity is delayed by 24 hours, other utilities by approximately 2 hours
+        return get_data_delay(self._utility_name)
 
-                # Add the start and end dates from the consumption data
-                if hasattr(consumption, 'start_date'):
-                    attributes["start_date"] = consumption.start_date.isoformat()
-                if hasattr(consumption, 'end_date'):
-                    attributes["end_date"] = consumption.end_date.isoformat()
 
-        except Exception as e:
-            _LOGGER.error(f"Error setting attributes: {e}")
+class ProvidentEnergyPeriodSensor(ProvidentEnergySensor):
+    """Running total of a meter since the start of a period."""
 
-        return attributes
+    def __init__(self, *args: Any, period: str, **kwargs: Any) -> None:
+        """Initialize the sensor."""
+        super().__init__(*args, **kwargs)
+        self._period = period
+        self._last_reset: datetime | None = None
+        self._totals_version = 0
+
+    @callback
+    def _handle_coordinator_update(self) -> None:
+        """Recompute the total if the series changed, or late hours changed only the totals."""
+        totals_version = self.coordinator.get_totals_version(self._utility_id)
+        if totals_version != self._totals_version:
+            # Late hours that are no longer held leave the series as they were
+            self._totals_version = totals_version
+            self._consumption = None
+        super()._handle_coordinator_update()
 
     @property
-    def has_entity_name(self) -> bool:
+    def last_reset(self) -> datetime | None:
+        """Return when the current period started."""
+        return self._last_reset
+
+    def _update_state(self) -> None:
+        """Compute the total of the current period."""
+        # The periods are in Home Assistant's time zone, like the hourly data
+        local_now = dt_util.now()
+        now = local_now.replace(tzinfo=None)
+        self._state_hour = now.replace(minute=0, second=0, microsecond=0)
+        period_start = get_period_start(self._period, now, self.coordinator.billing_day)
+        self._last_reset = period_start.replace(tzinfo=local_now.tzinfo)
+        self._consumption = (self.coordinator.data or {}).get(self._utility_id)
+
+        totals = self._get_totals()
+        total = totals.value(self._period, now) if totals else None
+        self._state = None if total is None else round(total, 3)
+        self._attributes = {"period_start": period_start.isoformat()}
+
+    def _get_totals(self) -> PeriodTotals | None:
+        """Get the running totals the sensor shows one of."""
+        return self.coordinator.get_period_totals(self._utility_id)
+
+
+class ProvidentEnergyCostSensor(ProvidentEnergyPeriodSensor):
+    """Running cost of a meter since the start of a period."""
+
+    def _get_totals(self) -> PeriodTotals | None:
+        """Get the running costs the sensor shows one of."""
+        return self.coordinator.get_cost_totals(self._utility_id)
+
+
+class ProvidentEnergyDiagnosticSensor(CoordinatorEntity, SensorEntity):
+    """Diagnostic sensor reporting metrics of the requests made to the API."""
+
+    _attr_entity_category = EntityCategory.DIAGNOSTIC
+
+    def __init__(
+            self,
+            coordinator: ProvidentEnergyDataUpdateCoordinator,
+            unique_id: str,
+            config: Dict[str, Any],
+    ) -> None:
+        """Initialize the sensor."""
+        super().__init__(coordinator)
+        self._config = config
+        self._attr_name = f"{DEFAULT_NAME} {config['name']}"
+        self._attr_unique_id = unique_id
+        self._attr_native_unit_of_measurement = config["unit"]
+        self._attr_device_class = config["device_class"]
+        self._attr_state_class = config["state_class"]
+        self._update_state()
+
+    @property
+    def available(self) -> bool:
+        """Stay available when polls fail, which is when the metrics matter most."""
         return True
 
-    def _get_data_delay(self) -> int:
-        if self._data_key == UTILITY_ELECTRICITY:
-            # Electricity is delayed by 24 hours
-            return 24
-        else:
-            # Other utilities are delayed by approximately 2 hours
-            return 2
+    async def async_added_to_hass(self) -> None:
+        """Follow the metrics after every poll, also those that changed no data."""
+        await super().async_added_to_hass()
+        self.async_on_remove(
+            async_dispatcher_connect(
+                self.hass,
+                f"{SIGNAL_METRICS_UPDATED}_{self.coordinator.config_entry.entry_id}",
+                self._handle_metrics_update,
+            )
+        )
+
+    @callback
+    def _handle_coordinator_update(self) -> None:
+        """Read the metrics after the coordinator made its requests."""
+        self._update_state()
+        super()._handle_coordinator_update()
+
+    @callback
+    def _handle_metrics_update(self) -> None:
+        """Read the metrics after a poll that the coordinator didn't pass on."""
+        self._update_state()
+        self.async_write_ha_state()
+
+    def _update_state(self) -> None:
+        """Compute the state and attributes from the current metrics."""
+        metrics = self.coordinator.provident_api.metrics
+        self._attr_native_value = self._config["value"](metrics)
+        if "attributes" in self._config:
+            self._attr_extra_state_attributes = self._config["attributes"](metrics)
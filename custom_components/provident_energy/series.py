@@ -0,0 +1,180 @@
+"""Compact time series storage for Provident Energy consumption data."""
+from __future__ import annotations
+
+import math
+from array import array
+from datetime import datetime, timedelta
+from typing import Iterable, Iterator, List, Optional, Tuple
+
+HOUR = timedelta(hours=1)
+
+
+class ConsumptionSeries:
+    """Regularly spaced values starting at a timestamp.
+
+    Values are stored in an array of doubles, eight bytes per point, with
+    NaN marking the points that have no value. Looking a value up by its
+    timestamp is a single division.
+    """
+
+    __slots__ = ("start", "resolution", "_values")
+
+    def __init__(
+            self,
+            start: datetime,
+            values: Iterable[Optional[float]] = (),
+            resolution: timedelta = HOUR,
+    ) -> None:
+        """Initialize the series.
+
+        Args:
+            start: Timestamp of the first value
+            values: The values, None or NaN for missing ones
+            resolution: Time between two values
+        """
+        self.start = start
+        self.resolution = resolution
+        self._values = array("d", (math.nan if v is None else float(v) for v in values))
+
+    @classmethod
+    def empty(cls, start: datetime, end: datetime, resolution: timedelta = HOUR) -> ConsumptionSeries:
+        """Create a series covering [start, end) without any values."""
+        series = cls(start, resolution=resolution)
+        series._values = array("d", [math.nan]) * max(0, (end - start) // resolution)
+        return series
+
+    @classmethod
+    def from_buffer(cls, start: datetime, buffer: bytes, resolution: timedelta = HOUR) -> ConsumptionSeries:
+        """Create a series from the raw bytes of its values, as doubles with NaN for missing ones."""
+        series = cls(start, resolution=resolution)
+        series._values.frombytes(buffer)
+        return series
+
+    @property
+    def buffer(self) -> memoryview:
+        """Get a read-only view of the raw values, for vectorized processing."""
+        return memoryview(self._values).toreadonly()
+
+    @property
+    def end(self) -> datetime:
+        """Get the timestamp right after the last value."""
+        return self.start + self.resolution * len(self._values)
+
+    def __len__(self) -> int:
+        return len(self._values)
+
+    def __iter__(self) -> Iterator[Optional[float]]:
+        for value in self._values:
+            yield None if math.isnan(value) else value
+
+    def __getitem__(self, index: int) -> Optional[float]:
+        value = self._values[index]
+        return None if math.isnan(value) else value
+
+    def __eq__(self, other: object) -> bool:
+        if not isinstance(other, ConsumptionSeries):
+            return NotImplemented
+        # Compare the raw bytes so that missing values compare equal
+        return (
+            self.start == other.start
+            and self.resolution == other.resolution
+            and self._values.tobytes() == other._values.tobytes()
+        )
+
+    def __repr__(self) -> str:
+        return (
+            f"ConsumptionSeries(start={self.start.isoformat()}, "
+            f"resolution={self.resolution}, length={len(self)})"
+        )
+
+    def index_of(self, timestamp: datetime) -> int:
+        """Get the index of the value covering a timestamp, which may be out of range."""
+        return (timestamp - self.start) // self.resolution
+
+    def timestamp_at(self, index: int) -> datetime:
+        """Get the timestamp of the value at an index."""
+        return self.start + self.resolution * index
+
+    def value_at(self, timestamp: datetime) -> Optional[float]:
+        """Get the value covering a timestamp, if the series has one."""
+        index = self.index_of(timestamp)
+        if 0 <= index < len(self._values):
+            return self[index]
+        return None
+
+    def is_missing(self, index: int) -> bool:
+        """Check if the value at an index is missing."""
+        return math.isnan(self._values[index])
+
+    def missing_mask(self) -> List[bool]:
+        """Get a list telling for each point whether its value is missing."""
+        return [math.isnan(value) for value in self._values]
+
+    def items(self) -> Iterator[Tuple[datetime, float]]:
+        """Iterate over the timestamps and values of the points that have one."""
+        for index, value in enumerate(self._values):
+            if not math.isnan(value):
+                yield self.timestamp_at(index), value
+
+    def differences(self, previous: Optional[ConsumptionSeries]) -> Iterator[Tuple[datetime, float]]:
+        """Iterate over the points whose value differs from a previous version of the series.
+
+        Yields the timestamp and the change of each such point, with missing
+        values counting as zero. Only the points covered by this series are
+        compared.
+        """
+        offset = 0 if previous is None else previous.index_of(self.start)
+        for index, value in enumerate(self._values):
+            old = math.nan
+            if previous is not None and 0 <= index + offset < len(previous._values):
+                old = previous._values[index + offset]
+            delta = (0.0 if math.isnan(value) else value) - (0.0 if math.isnan(old) else old)
+            if delta:
+                yield self.timestamp_at(index), delta
+
+    def to_list(self) -> List[Optional[float]]:
+        """Get the values as a list, with None for missing values."""
+        return list(self)
+
+    def last_valid(self, until: Optional[datetime] = None) -> Optional[datetime]:
+        """Get the timestamp of the latest value, optionally only up to a timestamp."""
+        last_index = len(self._values)
+        if until is not None:
+            last_index = min(last_index, self.index_of(until) + 1)
+        for index in range(last_index - 1, -1, -1):
+            if not math.isnan(self._values[index]):
+                return self.timestamp_at(index)
+        return None
+
+    def window(self, start: datetime, end: datetime) -> ConsumptionSeries:
+        """Get a copy covering [start, end), with missing values outside this series."""
+        result = ConsumptionSeries.empty(start, end, self.resolution)
+        self._copy_into(result, skip_missing=False)
+        return result
+
+    def merge(self, newer: ConsumptionSeries, start: datetime, end: datetime) -> ConsumptionSeries:
+        """Merge newer values into a copy of this series covering [start, end).
+
+        Values from the newer series win, except where it is missing a value
+        this series has.
+        """
+        if newer.resolution != self.resolution:
+            raise ValueError("Cannot merge series with different resolutions")
+        result = self.window(start, end)
+        newer._copy_into(result, skip_missing=True)
+        return result
+
+    def _copy_into(self, target: ConsumptionSeries, skip_missing: bool) -> None:
+        """Copy the overlapping values of this series into another one."""
+        offset = target.index_of(self.start)
+        first = max(0, -offset)
+        last = min(len(self._values), len(target._values) - offset)
+        if first >= last:
+            return
+        if not skip_missing:
+            target._values[first + offset:last + offset] = self._values[first:last]
+            return
+        for index in range(first, last):
+            value = self._values[index]
+            if not math.isnan(value):
+                target._values[index + offset] = value
@@ -0,0 +1,257 @@
+"""Time-of-use tariffs and the cost of Provident Energy consumption.
+
+Costs are computed with numpy, which is imported when first needed so that
+loading the integration doesn't import it. The coordinator imports it off
+the event loop before computing any cost.
+"""
+from __future__ import annotations
+
+import logging
+import re
+from dataclasses import dataclass
+from datetime import datetime
+from functools import cached_property
+from typing import TYPE_CHECKING, Any, Dict, Mapping, Optional, Tuple
+
+from .const import (
+    CONF_BANDS,
+    CONF_BILLING_DAY,
+    CONF_DAILY_CHARGE,
+    CONF_RATE,
+    CONF_TARIFFS,
+    CONF_TIERS,
+    DEFAULT_BILLING_DAY,
+    PERIOD_BILLING_CYCLE,
+    UTILITY_UNITS,
+)
+from .series import ConsumptionSeries
+from .totals import get_period_start
+
+if TYPE_CHECKING:
+    import numpy as np
+
+_LOGGER = logging.getLogger(__name__)
+
+_WEEKDAYS = ("mon", "tue", "wed", "thu", "fri", "sat", "sun")
+_BAND_PATTERN = re.compile(
+    r"^(?:(?P<first>[a-z]{3})(?:-(?P<last>[a-z]{3}))?\s+)?"
+    r"(?P<start>\d{1,2})-(?P<end>\d{1,2})\s*=\s*(?P<rate>\d+(?:\.\d+)?)$"
+)
+_TIER_PATTERN = re.compile(r"^(?P<threshold>\d+(?:\.\d+)?)\s*=\s*(?P<rate>\d+(?:\.\d+)?)$")
+
+
+@dataclass(frozen=True)
+class TariffBand:
+    """Rate that applies during some hours of some days of the week."""
+
+    start_hour: int
+    end_hour: int
+    rate: float
+    weekdays: Tuple[int, ...] = tuple(range(7))
+
+    @property
+    def hours(self) -> Tuple[int, ...]:
+        """Get the hours of the day the band covers, wrapping around midnight."""
+        if self.start_hour < self.end_hour:
+            return tuple(range(self.start_hour, self.end_hour))
+        return tuple(range(self.start_hour, 24)) + tuple(range(0, self.end_hour))
+
+
+def parse_bands(text: str) -> Tuple[TariffBand, ...]:
+    """Parse time-of-use bands like "mon-fri 07-23=0.25; 23-07=0.12".
+
+    Raises:
+        ValueError: If a band is not valid
+    """
+    bands = []
+    for part in filter(None, (part.strip().lower() for part in text.split(";"))):
+        match = _BAND_PATTERN.match(part)
+        if not match:
+            raise ValueError(f"Invalid band {part!r}")
+
+        start, end = int(match["start"]), int(match["end"])
+        if not (0 <= start < 24 and 0 <= end <= 24) or start == end:
+            raise ValueError(f"Invalid hours in band {part!r}")
+
+        weekdays = tuple(range(7))
+        if match["first"]:
+            last = match["last"] or match["first"]
+            if match["first"] not in _WEEKDAYS or last not in _WEEKDAYS:
+                raise ValueError(f"Invalid days in band {part!r}")
+            first_index, last_index = _WEEKDAYS.index(match["first"]), _WEEKDAYS.index(last)
+            # Day ranges may wrap around the end of the week, e.g. "sat-sun" or "fri-mon"
+            days = (last_index - first_index) % 7 + 1
+            weekdays = tuple((first_index + day) % 7 for day in range(days))
+
+        bands.append(TariffBand(start, end % 24, float(match["rate"]), weekdays))
+    return tuple(bands)
+
+
+def parse_tiers(text: str) -> Tuple[Tuple[float, float], ...]:
+    """Parse consumption tiers like "500=0.30; 1000=0.35", sorted by threshold.
+
+    Raises:
+        ValueError: If a tier is not valid
+    """
+    tiers = []
+    for part in filter(None, (part.strip() for part in text.split(";"))):
+        match = _TIER_PATTERN.match(part)
+        if not match:
+            raise ValueError(f"Invalid tier {part!r}")
+        tiers.append((float(match["threshold"]), float(match["rate"])))
+    return tuple(sorted(tiers))
+
+
+@dataclass(frozen=True)
+class Tariff:
+    """Tariff of a utility, with rates per unit of UTILITY_UNITS.
+
+    The rate of an hour is the one of the last band covering it, or the base
+    rate when no band does. Consumption within a billing cycle beyond the
+    threshold of a tier is charged at the rate of that tier instead. The
+    daily charge is added to the first hour of each day.
+    """
+
+    rate: float
+    daily_charge: float = 0.0
+    bands: Tuple[TariffBand, ...] = ()
+    tiers: Tuple[Tuple[float, float], ...] = ()
+    billing_day: int = DEFAULT_BILLING_DAY
+
+    @classmethod
+    def from_options(cls, options: Mapping[str, Any], billing_day: int = DEFAULT_BILLING_DAY) -> Tariff:
+        """Create a tariff from the options of a utility.
+
+        Raises:
+            ValueError: If the bands or tiers are not valid
+        """
+        return cls(
+            rate=float(options.get(CONF_RATE, 0.0)),
+            daily_charge=float(options.get(CONF_DAILY_CHARGE, 0.0)),
+            bands=parse_bands(options.get(CONF_BANDS, "")),
+            tiers=parse_tiers(options.get(CONF_TIERS, "")),
+            billing_day=billing_day,
+        )
+
+    @property
+    def fingerprint(self) -> str:
+        """Get a string that changes whenever the cost of any consumption would."""
+        return repr(self)
+
+    @cached_property
+    def rate_table(self) -> np.ndarray:
+        """Get the rate of each hour of the week, starting Monday at midnight."""
+        import numpy as np
+
+        table = np.full(7 * 24, self.rate)
+        for band in self.bands:
+            for weekday in band.weekdays:
+                for hour in band.hours:
+                    table[weekday * 24 + hour] = band.rate
+        return table
+
+    def cost(
+            self, timestamps: np.ndarray, values: np.ndarray, cycle_usage: float = 0.0
+    ) -> Tuple[np.ndarray, float]:
+        """Get the cost of the consumption of each hour, in a single vectorized pass.
+
+        Args:
+            timestamps: Local start of each hour, as datetime64, in ascending order
+            values: Consumption of each hour, NaN where it is missing
+            cycle_usage: Consumption in the billing cycle of the first hour before it
+
+        Returns:
+            The cost of each hour, NaN where the consumption is missing, and the
+            consumption in the billing cycle of the last hour up to its end
+        """
+        import numpy as np
+
+        values = np.asarray(values, dtype=float)
+        present = ~np.isnan(values)
+        usage = np.where(present, values, 0.0)
+
+        days = timestamps.astype("datetime64[D]")
+        hours = (timestamps - days).astype("timedelta64[h]").astype(np.int64)
+        # 1970-01-01 was a Thursday
+        weekdays = (days.astype(np.int64) + 3) % 7
+        rates = self.rate_table[weekdays * 24 + hours]
+        cost = usage * rates
+
+        if self.tiers and len(usage):
+            # Consumption in the billing cycle up to the end of each hour
+            months = days.astype("datetime64[M]")
+            day_of_month = (days - months.astype("datetime64[D]")).astype(np.int64) + 1
+            cycles = months.astype(np.int64) - (day_of_month < self.billing_day)
+            new_cycle = np.empty(len(cycles), dtype=bool)
+            new_cycle[0] = True
+            new_cycle[1:] = cycles[1:] != cycles[:-1]
+            group = np.cumsum(new_cycle) - 1
+            cumulative = np.cumsum(usage)
+            cumulative -= (cumulative - usage)[new_cycle][group]
+            cumulative[group == 0] += cycle_usage
+            before = cumulative - usage
+
+            # Consumption of each hour beyond each threshold
+            above = [
+                np.clip(cumulative - threshold, 0, None) - np.clip(before - threshold, 0, None)
+                for threshold, _ in self.tiers
+            ]
+            cost = (usage - above[0]) * rates
+            for index, (_, tier_rate) in enumerate(self.tiers):
+                next_above = above[index + 1] if index + 1 < len(above) else 0.0
+                cost += (above[index] - next_above) * tier_rate
+            cycle_usage = float(cumulative[-1])
+
+        if self.daily_charge:
+            cost[(hours == 0) & present] += self.daily_charge
+
+        cost[~present] = np.nan
+        return cost, cycle_usage
+
+    def cost_series(
+            self, series: ConsumptionSeries, cycle_usage: float = 0.0
+    ) -> Tuple[ConsumptionSeries, float]:
+        """Get the cost of each hour of a series, as a series."""
+        import numpy as np
+
+        timestamps = np.datetime64(series.start, "s") + np.arange(len(series)) * np.timedelta64(
+            int(series.resolution.total_seconds()), "s"
+        )
+        cost, cycle_usage = self.cost(timestamps, np.frombuffer(series.buffer, dtype=float), cycle_usage)
+        return ConsumptionSeries.from_buffer(series.start, cost.tobytes(), series.resolution), cycle_usage
+
+
+def get_tariffs(options: Mapping[str, Any]) -> Dict[str, Tariff]:
+    """Get the tariff of each utility from the options of a config entry.
+
+    Tariffs that are not valid are skipped with a warning.
+    """
+    billing_day = options.get(CONF_BILLING_DAY, DEFAULT_BILLING_DAY)
+    tariffs = {}
+    for utility_name, tariff_options in options.get(CONF_TARIFFS, {}).items():
+        if utility_name not in UTILITY_UNITS:
+            continue
+        try:
+            tariffs[utility_name] = Tariff.from_options(tariff_options, billing_day)
+        except (TypeError, ValueError) as err:
+            _LOGGER.warning(f"Ignoring the tariff of {utility_name}: {err}")
+    return tariffs
+
+
+def get_cycle_usage_before(
+        series: ConsumptionSeries, billing_total: Optional[Tuple[datetime, float]], billing_day: int
+) -> float:
+    """Get the consumption in the billing cycle of a series' first hour before that hour.
+
+    Args:
+        series: The series, whose values are included in the billing total
+        billing_total: Start and total of the current billing cycle, if known
+        billing_day: Day of the month on which a billing cycle starts
+    """
+    if billing_total is None:
+        return 0.0
+    cycle_start, total = billing_total
+    if get_period_start(PERIOD_BILLING_CYCLE, series.start, billing_day) != cycle_start:
+        # The series starts in an earlier cycle, whose total is gone
+        return 0.0
+    return total - sum(value for hour, value in series.items() if hour >= cycle_start)
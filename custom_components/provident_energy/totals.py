@@ -0,0 +1,147 @@
+"""Running totals of Provident Energy consumption over calendar periods."""
+from __future__ import annotations
+
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Any, Dict, Optional
+
+from .const import (
+    DEFAULT_BILLING_DAY,
+    PERIODS,
+    PERIOD_BILLING_CYCLE,
+    PERIOD_MONTH,
+    PERIOD_TODAY,
+    PERIOD_WEEK,
+)
+from .series import ConsumptionSeries
+
+
+def get_period_start(period: str, timestamp: datetime, billing_day: int = DEFAULT_BILLING_DAY) -> datetime:
+    """Get the start of the period that a timestamp falls in.
+
+    Args:
+        period: One of PERIODS
+        timestamp: The timestamp
+        billing_day: Day of the month on which a billing cycle starts, at most 28
+    """
+    day = timestamp.replace(hour=0, minute=0, second=0, microsecond=0)
+    if period == PERIOD_TODAY:
+        return day
+    if period == PERIOD_WEEK:
+        return day - timedelta(days=day.weekday())
+    if period == PERIOD_MONTH:
+        return day.replace(day=1)
+    if period == PERIOD_BILLING_CYCLE:
+        if day.day >= billing_day:
+            return day.replace(day=billing_day)
+        previous_month = day.replace(day=1) - timedelta(days=1)
+        return previous_month.replace(day=billing_day)
+    raise ValueError(f"Unknown period {period}")
+
+
+def get_earliest_period_start(timestamp: datetime, billing_day: int = DEFAULT_BILLING_DAY) -> datetime:
+    """Get the start of the earliest of the periods that a timestamp falls in."""
+    return min(get_period_start(period, timestamp, billing_day) for period in PERIODS)
+
+
+@dataclass
+class PeriodTotal:
+    """Sum of the hourly values of a meter since the start of a period."""
+
+    start: datetime
+    total: float = 0.0
+
+
+class PeriodTotals:
+    """Keep running sums of a meter's hourly values over the current periods.
+
+    Rather than summing a period's values on every update, the sums are
+    adjusted by the difference between the previous and the new version of
+    the series, so new hours are added and late corrections applied as
+    deltas. The work per update only depends on the length of the series
+    the coordinator holds, not on the length of the periods. Totals start
+    counting from the data held when they were first created.
+    """
+
+    def __init__(
+            self,
+            billing_day: int = DEFAULT_BILLING_DAY,
+            totals: Optional[Dict[str, PeriodTotal]] = None,
+    ) -> None:
+        """Initialize the totals.
+
+        Args:
+            billing_day: Day of the month on which a billing cycle starts
+            totals: Totals restored from as_dict(), keyed by period
+        """
+        self.billing_day = billing_day
+        self.totals: Dict[str, PeriodTotal] = totals or {}
+
+    def apply(self, previous: Optional[ConsumptionSeries], current: ConsumptionSeries) -> None:
+        """Add the changes between two versions of a series to the totals.
+
+        Args:
+            previous: The series the totals were last updated with, None to count
+                every value of the current series
+            current: The new version of the series
+        """
+        for hour, delta in current.differences(previous):
+            self.add(hour, delta)
+
+    def add(self, hour: datetime, delta: float) -> None:
+        """Add a change of the value of an hour to the periods it falls in."""
+        for period in PERIODS:
+            self._add_to_period(period, hour, delta)
+
+    def seed(self, period: str, series: ConsumptionSeries) -> None:
+        """Start counting a period again from the values of a series."""
+        self.totals.pop(period, None)
+        for hour, value in series.items():
+            self._add_to_period(period, hour, value)
+
+    def _add_to_period(self, period: str, hour: datetime, delta: float) -> None:
+        """Add a change of the value of an hour to a period, if it falls in the current one."""
+        start = get_period_start(period, hour, self.billing_day)
+        period_total = self.totals.get(period)
+        if period_total is None or start > period_total.start:
+            # The hour starts a new period
+            period_total = self.totals[period] = PeriodTotal(start)
+        if start == period_total.start:
+            period_total.total += delta
+
+    def value(self, period: str, now: datetime) -> Optional[float]:
+        """Get the total of the period that is current at a point in time."""
+        period_total = self.totals.get(period)
+        if period_total is None:
+            return None
+        if get_period_start(period, now, self.billing_day) > period_total.start:
+            # Nothing was recorded in the current period yet
+            return 0.0
+        return period_total.total
+
+    def as_dict(self) -> Dict[str, Any]:
+        """Get the totals in a JSON serializable form."""
+        return {
+            "billing_day": self.billing_day,
+            **{
+                period: {"start": period_total.start.isoformat(), "total": period_total.total}
+                for period, period_total in self.totals.items()
+            },
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any], billing_day: int = DEFAULT_BILLING_DAY) -> PeriodTotals:
+        """Create totals from their as_dict() form.
+
+        The billing cycle total is left out if it was counted with another
+        billing day, since its start no longer matches the current cycle.
+        """
+        same_billing_day = data.get("billing_day", billing_day) == billing_day
+        return cls(
+            billing_day,
+            {
+                period: PeriodTotal(datetime.fromisoformat(total["start"]), float(total["total"]))
+                for period, total in data.items()
+                if period in PERIODS and (same_billing_day or period != PERIOD_BILLING_CYCLE)
+            },
+        )
@@ -0,0 +1,80 @@
+"""Connection pool and request scheduling shared by all Provident Energy accounts."""
+from __future__ import annotations
+
+import logging
+from datetime import timedelta
+from urllib.parse import urlsplit
+
+import aiohttp
+from homeassistant.core import HomeAssistant, callback
+from homeassistant.helpers.aiohttp_client import async_create_clientsession
+
+from .circuit import CircuitBreaker
+from .const import (
+    DATA_TRANSPORT,
+    DEFAULT_REQUESTS_PER_SECOND,
+    DEFAULT_REQUEST_BURST,
+    DOMAIN,
+    ENTRY_STAGGER,
+    MAX_ENTRY_STAGGER,
+)
+from .ratelimit import RateLimiter
+
+_LOGGER = logging.getLogger(__name__)
+
+
+class ProvidentEnergyTransport:
+    """HTTP session and request budget shared by every config entry.
+
+    The session doesn't keep cookies itself, each API client sends the
+    cookies of its own account. All clients draw from one rate limiter so
+    that adding accounts doesn't multiply the load on the server, and each
+    entry gets a slot that offsets its polls from the other entries. When
+    a host stops responding, its circuit breaker pauses the requests of
+    every account to it at once.
+    """
+
+    def __init__(self, hass: HomeAssistant) -> None:
+        """Initialize the transport."""
+        self.session = async_create_clientsession(
+            hass, cookie_jar=aiohttp.DummyCookieJar()
+        )
+        self.rate_limiter = RateLimiter(DEFAULT_REQUESTS_PER_SECOND, DEFAULT_REQUEST_BURST)
+        self._slots: list[str | None] = []
+        self._circuit_breakers: dict[str, CircuitBreaker] = {}
+
+    @callback
+    def async_register(self, entry_id: str) -> timedelta:
+        """Register a config entry and get the offset to stagger its polls by."""
+        if entry_id in self._slots:
+            slot = self._slots.index(entry_id)
+        elif None in self._slots:
+            slot = self._slots.index(None)
+            self._slots[slot] = entry_id
+        else:
+            slot = len(self._slots)
+            self._slots.append(entry_id)
+        return timedelta(seconds=(slot * ENTRY_STAGGER) % MAX_ENTRY_STAGGER)
+
+    @callback
+    def async_get_circuit_breaker(self, url: str) -> CircuitBreaker:
+        """Get the circuit breaker of the host of a URL, creating it if needed."""
+        host = urlsplit(url).hostname or url
+        if host not in self._circuit_breakers:
+            self._circuit_breakers[host] = CircuitBreaker(host)
+        return self._circuit_breakers[host]
+
+    @callback
+    def async_unregister(self, entry_id: str) -> None:
+        """Free the slot of a config entry."""
+        if entry_id in self._slots:
+            self._slots[self._slots.index(entry_id)] = None
+
+
+@callback
+def async_get_transport(hass: HomeAssistant) -> ProvidentEnergyTransport:
+    """Get the transport shared by all config entries, creating it if needed."""
+    domain_data = hass.data.setdefault(DOMAIN, {})
+    if DATA_TRANSPORT not in domain_data:
+        domain_data[DATA_TRANSPORT] = ProvidentEnergyTransport(hass)
+    return domain_data[DATA_TRANSPORT]
@@ -0,0 +1,339 @@
+"""Export the hourly consumption history of a Provident Energy account.
+
+Walks the meter tree, requests each meter's history in chunks of days,
+several chunks at a time, and streams the hourly values to a CSV, JSON
+Lines or Parquet file as the chunks come in, oldest first per meter. Only
+the chunks in flight are held in memory.
+
+The progress of each meter is kept in a state file next to the output,
+so that an interrupted export continues where it stopped with --resume.
+CSV and JSON Lines exports are appended to; a resumed Parquet export is
+written to a new part file next to the first one. Since a Parquet file
+is only complete once closed, its progress is recorded when the export
+ends or is interrupted.
+
+A chunk that fails after the retries is not recorded, nor are the chunks
+of the same meter after it, so that --resume requests them again. The
+export then exits with status 1.
+
+    PROVIDENT_USERNAME=... PROVIDENT_PASSWORD=... \\
+        python scripts/export_history.py --start 2024-01-01 --output history.csv
+
+The script runs without Home Assistant, it only needs aiohttp, and
+pyarrow for Parquet output.
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import csv
+import json
+import logging
+import os
+import sys
+import types
+from collections import deque
+from datetime import date, datetime, timedelta
+from pathlib import Path
+from typing import AsyncIterator, Dict, Iterable, List, Optional, Tuple
+
+import aiohttp
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), os.pardir))
+PACKAGE = "custom_components.provident_energy"
+
+# Register the integration package without running its __init__, which sets
+# up the integration and needs Home Assistant, so that the API client can be
+# imported on its own
+sys.path.insert(0, ROOT)
+_package = types.ModuleType(PACKAGE)
+_package.__path__ = [os.path.join(ROOT, *PACKAGE.split("."))]
+sys.modules.setdefault(PACKAGE, _package)
+
+from custom_components.provident_energy.api import ProvidentEnergyAPI, Utility  # noqa: E402
+from custom_components.provident_energy.const import API_BASE_URL  # noqa: E402
+
+_LOGGER = logging.getLogger(__name__)
+
+FIELDS = ("meter_id", "meter", "utility", "units", "timestamp", "value")
+PARQUET_BATCH_ROWS = 10000
+
+Row = Tuple[str, str, str, str, str, float]
+Chunk = Tuple[Utility, datetime, datetime]
+
+
+class CsvWriter:
+    """Write rows to a CSV file with a header.
+
+    Like the other writers, flush() tells whether the rows written so far
+    are safely in the file, so that the export state may record them.
+    """
+
+    def __init__(self, path: Path, append: bool) -> None:
+        new_file = not (append and path.exists() and path.stat().st_size)
+        self._file = path.open("a" if append else "w", newline="", encoding="utf-8")
+        self._writer = csv.writer(self._file)
+        if new_file:
+            self._writer.writerow(FIELDS)
+
+    def write(self, rows: Iterable[Row]) -> None:
+        self._writer.writerows(rows)
+
+    def flush(self) -> bool:
+        self._file.flush()
+        return True
+
+    def close(self) -> None:
+        self._file.close()
+
+
+class JsonLinesWriter:
+    """Write rows to a JSON Lines file, one object per row."""
+
+    def __init__(self, path: Path, append: bool) -> None:
+        self._file = path.open("a" if append else "w", encoding="utf-8")
+
+    def write(self, rows: Iterable[Row]) -> None:
+        self._file.writelines(json.dumps(dict(zip(FIELDS, row))) + "\n" for row in rows)
+
+    def flush(self) -> bool:
+        self._file.flush()
+        return True
+
+    def close(self) -> None:
+        self._file.close()
+
+
+class ParquetWriter:
+    """Write rows to a Parquet file in row groups of PARQUET_BATCH_ROWS."""
+
+    def __init__(self, path: Path, append: bool) -> None:
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError as err:
+            raise SystemExit("Parquet output needs pyarrow, install it with: pip install pyarrow") from err
+
+        if append and path.exists():
+            # Parquet files can't be appended to, continue in a new part file
+            part = 1
+            while (candidate := path.with_suffix(f".part{part}{path.suffix}")).exists():
+                part += 1
+            path = candidate
+
+        self._pa = pa
+        self._schema = pa.schema([
+            ("meter_id", pa.string()),
+            ("meter", pa.string()),
+            ("utility", pa.string()),
+            ("units", pa.string()),
+            ("timestamp", pa.timestamp("s")),
+            ("value", pa.float64()),
+        ])
+        self._writer = pq.ParquetWriter(path, self._schema)
+        self._rows: List[Row] = []
+
+    def write(self, rows: Iterable[Row]) -> None:
+        self._rows.extend(rows)
+        if len(self._rows) >= PARQUET_BATCH_ROWS:
+            self._write_row_group()
+
+    def flush(self) -> bool:
+        # The file can only be read once it is closed
+        return False
+
+    def _write_row_group(self) -> None:
+        if not self._rows:
+            return
+        columns = list(zip(*self._rows))
+        columns[4] = [datetime.fromisoformat(timestamp) for timestamp in columns[4]]
+        self._writer.write_table(self._pa.Table.from_arrays(
+            [self._pa.array(column, type=field.type) for column, field in zip(columns, self._schema)],
+            schema=self._schema,
+        ))
+        self._rows.clear()
+
+    def close(self) -> None:
+        self._write_row_group()
+        self._writer.close()
+
+
+WRITERS = {"csv": CsvWriter, "jsonl": JsonLinesWriter, "parquet": ParquetWriter}
+
+
+class ExportState:
+    """Next day to export for each meter, persisted after every written chunk."""
+
+    def __init__(self, path: Path, resume: bool) -> None:
+        self.path = path
+        self.next: Dict[str, str] = {}
+        if resume and path.exists():
+            self.next = json.loads(path.read_text())
+
+    def start_of(self, utility: Utility, default: datetime) -> datetime:
+        """Get the day to continue the export of a meter from."""
+        if utility.id in self.next:
+            return max(default, datetime.fromisoformat(self.next[utility.id]))
+        return default
+
+    def done(self, utility: Utility, end: datetime) -> None:
+        """Record that a meter was exported up to a day, and save the state."""
+        self.next[utility.id] = end.isoformat()
+        temporary = self.path.with_suffix(".tmp")
+        temporary.write_text(json.dumps(self.next, indent=2))
+        temporary.replace(self.path)
+
+
+def iter_chunks(
+        utilities: Iterable[Utility], state: ExportState, start: datetime, end: datetime, chunk_days: int
+) -> Iterable[Chunk]:
+    """Split the date range of each meter into chunks, skipping what was exported already."""
+    for utility in utilities:
+        chunk_start = state.start_of(utility, start)
+        while chunk_start < end:
+            chunk_end = min(chunk_start + timedelta(days=chunk_days), end)
+            yield utility, chunk_start, chunk_end
+            chunk_start = chunk_end
+
+
+async def fetch_chunks(
+        api: ProvidentEnergyAPI, chunks: Iterable[Chunk], concurrency: int
+) -> AsyncIterator[Tuple[Chunk, Optional[List[Row]]]]:
+    """Fetch chunks with up to concurrency requests in flight, yielding their rows in order.
+
+    The rows of a chunk that failed are None.
+    """
+    chunks = iter(chunks)
+    pending: deque[Tuple[Chunk, asyncio.Task]] = deque()
+    try:
+        while True:
+            while len(pending) < concurrency and (chunk := next(chunks, None)) is not None:
+                utility, chunk_start, chunk_end = chunk
+                pending.append((chunk, asyncio.create_task(
+                    api.fetch_utility_consumption(utility, chunk_start, chunk_end)
+                )))
+            if not pending:
+                return
+
+            chunk, task = pending.popleft()
+            try:
+                consumption = await task
+            except (aiohttp.ClientError, asyncio.TimeoutError, KeyError, ValueError) as e:
+                _LOGGER.error(f"Failed to get {chunk[0].text} from {chunk[1].date()} to {chunk[2].date()}: {e}")
+                yield chunk, None
+                continue
+            rows: List[Row] = []
+            if consumption is None:
+                _LOGGER.warning(f"No data for {chunk[0].text} from {chunk[1].date()} to {chunk[2].date()}")
+            else:
+                rows = [
+                    (
+                        chunk[0].id,
+                        chunk[0].title,
+                        consumption.utility_name,
+                        consumption.units,
+                        hour.isoformat(),
+                        value,
+                    )
+                    for hour, value in consumption.data.items()
+                    if chunk[1] <= hour < chunk[2]
+                ]
+            yield chunk, rows
+    finally:
+        for _, task in pending:
+            task.cancel()
+
+
+async def export(args: argparse.Namespace) -> int:
+    """Run the export.
+
+    Returns:
+        The number of chunks that failed
+    """
+    output = Path(args.output)
+    format_ = args.format or output.suffix.lstrip(".").lower()
+    if format_ not in WRITERS:
+        raise SystemExit(f"Unknown format {format_!r}, use one of {', '.join(WRITERS)}")
+
+    start = datetime.combine(args.start, datetime.min.time())
+    end = datetime.combine(args.end, datetime.min.time())
+    state = ExportState(output.with_name(f"{output.name}.state.json"), args.resume)
+
+    async with aiohttp.ClientSession(cookie_jar=aiohttp.DummyCookieJar()) as session:
+        api = ProvidentEnergyAPI(
+            session, args.username, args.password, max_concurrency=args.concurrency, base_url=args.base_url
+        )
+        groups = await api.get_utility_groups()
+        if not groups:
+            raise SystemExit("Failed to get the meter tree, check the credentials")
+
+        utilities = [utility for group in groups for utility in group.utilities]
+        if args.meter:
+            unknown = set(args.meter) - {utility.id for utility in utilities}
+            if unknown:
+                raise SystemExit(f"Unknown meters: {', '.join(sorted(unknown))}")
+            utilities = [utility for utility in utilities if utility.id in args.meter]
+
+        writer = WRITERS[format_](output, append=args.resume)
+        exported = 0
+        written: List[Tuple[Utility, datetime]] = []
+        # Meters with a failed chunk, whose later chunks are left for --resume
+        failed: Dict[str, int] = {}
+        try:
+            chunks = (
+                chunk for chunk in iter_chunks(utilities, state, start, end, args.chunk_days)
+                if chunk[0].id not in failed
+            )
+            async for (utility, _, chunk_end), rows in fetch_chunks(api, chunks, args.concurrency):
+                if rows is None or utility.id in failed:
+                    failed[utility.id] = failed.get(utility.id, 0) + (rows is None)
+                    continue
+                writer.write(rows)
+                written.append((utility, chunk_end))
+                if writer.flush():
+                    for written_utility, written_end in written:
+                        state.done(written_utility, written_end)
+                    written.clear()
+                exported += len(rows)
+                _LOGGER.info(f"Exported {utility.text} up to {chunk_end.date()}, {exported} rows so far")
+        finally:
+            writer.close()
+            for written_utility, written_end in written:
+                state.done(written_utility, written_end)
+
+    return sum(failed.values())
+
+
+def main() -> None:
+    """Parse the arguments and run the export."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--username", default=os.environ.get("PROVIDENT_USERNAME"))
+    parser.add_argument("--password", default=os.environ.get("PROVIDENT_PASSWORD"))
+    parser.add_argument("--start", type=date.fromisoformat, required=True, help="first day, YYYY-MM-DD")
+    parser.add_argument("--end", type=date.fromisoformat, default=date.today(),
+                        help="day after the last one, YYYY-MM-DD, today by default")
+    parser.add_argument("--meter", action="append", help="id of a meter to export, may be repeated")
+    parser.add_argument("--output", required=True)
+    parser.add_argument("--format", choices=list(WRITERS), help="by default taken from the output file name")
+    parser.add_argument("--chunk-days", type=int, default=31)
+    parser.add_argument("--concurrency", type=int, default=4, help="chunks requested at once")
+    parser.add_argument("--resume", action="store_true", help="continue an interrupted export")
+    parser.add_argument("--base-url", default=API_BASE_URL)
+    args = parser.parse_args()
+
+    if not args.username or not args.password:
+        parser.error("set --username and --password, or PROVIDENT_USERNAME and PROVIDENT_PASSWORD")
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+    try:
+        failed = asyncio.run(export(args))
+    except KeyboardInterrupt:
+        _LOGGER.warning("Interrupted, continue with --resume")
+        return
+    if failed:
+        _LOGGER.error(f"{failed} chunks failed, export them with --resume")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
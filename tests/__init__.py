@@ -0,0 +1 @@
+"""Tests for the Provident Energy integration."""
@@ -0,0 +1,110 @@
+"""Tests for the Provident Energy API client."""
+import asyncio
+import json
+from collections import Counter
+from datetime import datetime
+from unittest.mock import Mock
+from zoneinfo import ZoneInfo
+
+import aiohttp
+import pytest
+
+from custom_components.provident_energy.api import ProvidentEnergyAPI, Utility
+from custom_components.provident_energy.const import API_SESSION_COOKIE
+from custom_components.provident_energy.metrics import (
+    ENDPOINT_LOGIN,
+    ENDPOINT_QUICKGRAPHS,
+    ENDPOINT_SESSION,
+)
+
+UTILITIES = [
+    Utility(id=f"m{index}", text=f"Meter {index} Cold Water (m3)", title=f"METER-{index:05d}")
+    for index in range(8)
+]
+
+
+class FakeSite:
+    """Answer the requests of an API client whose restored session has expired."""
+
+    def __init__(self, api: ProvidentEnergyAPI, accept_login: bool) -> None:
+        self.api = api
+        self.accept_login = accept_login
+        self.requests: Counter = Counter()
+        self.cache_keys: list = []
+
+    async def request(self, name: str, method: str, url: str, cache_key=None, **kwargs) -> str:
+        self.requests[name] += 1
+        # Let the other requests run, as they would while waiting for the response
+        await asyncio.sleep(0)
+        if name == ENDPOINT_SESSION:
+            self.api._cookies[API_SESSION_COOKIE] = "new"
+            return ""
+        if name == ENDPOINT_LOGIN:
+            return json.dumps({"d": {"success": self.accept_login}})
+        if name == ENDPOINT_QUICKGRAPHS:
+            self.cache_keys.append(cache_key)
+        if self.api._cookies.get(API_SESSION_COOKIE) != "new":
+            raise aiohttp.ClientResponseError(Mock(), (), status=401)
+        meters = kwargs["params"]["meterlist"].split(",")
+        return json.dumps([
+            {"meterId": meter, "name": meter, "site": "Site", "utility": "Cold Water (m3)",
+             "data": [1.0] * 48}
+            for meter in meters
+        ])
+
+
+def make_api(batch_size: int, accept_login: bool) -> tuple[ProvidentEnergyAPI, FakeSite]:
+    """Create an API client with an expired session restored."""
+    api = ProvidentEnergyAPI(Mock(), "user", "password", batch_size=batch_size, max_concurrency=4)
+    api.restore_session({API_SESSION_COOKIE: "expired"})
+    site = FakeSite(api, accept_login)
+    api._request = site.request
+    return api, site
+
+
+@pytest.mark.parametrize("batch_size", [1, 3])
+async def test_failed_login_is_not_repeated(batch_size: int) -> None:
+    """Test that requests rejected with an expired session share one failed login."""
+    api, site = make_api(batch_size, accept_login=False)
+
+    assert await api.get_consumption_data(utilities=UTILITIES) == {}
+    assert site.requests[ENDPOINT_LOGIN] == 1
+    assert api.metrics.relogins == 1
+
+
+@pytest.mark.parametrize("batch_size", [1, 3])
+async def test_login_is_shared(batch_size: int) -> None:
+    """Test that requests rejected with an expired session share one login and retry."""
+    api, site = make_api(batch_size, accept_login=True)
+
+    consumption = await api.get_consumption_data(utilities=UTILITIES)
+    assert consumption.keys() == {utility.id for utility in UTILITIES}
+    assert site.requests[ENDPOINT_LOGIN] == 1
+    assert api.metrics.relogins == 1
+
+
+async def test_login_again_on_next_refresh() -> None:
+    """Test that a failed login is tried again by the next refresh."""
+    api, site = make_api(1, accept_login=False)
+    await api.get_consumption_data(utilities=UTILITIES)
+
+    site.accept_login = True
+    consumption = await api.get_consumption_data(utilities=UTILITIES)
+    assert len(consumption) == len(UTILITIES)
+    assert site.requests[ENDPOINT_LOGIN] == 2
+    assert site.requests[ENDPOINT_QUICKGRAPHS] > 0
+
+
+async def test_polled_range_in_data_time_zone(freezer) -> None:
+    """Test that a poll is revalidated when the system clock is on the next day already."""
+    # 03:30 in UTC is 20:30 the day before in the time zone of the data
+    freezer.move_to(datetime(2024, 6, 16, 3, 30))
+    api, site = make_api(1, accept_login=True)
+    api.time_zone = ZoneInfo("US/Pacific")
+
+    await api.get_consumption_data(datetime(2024, 6, 14), datetime(2024, 6, 16), UTILITIES[:1])
+    await api.get_consumption_data(datetime(2024, 6, 1), datetime(2024, 6, 2), UTILITIES[:1])
+
+    polled, gaps = site.cache_keys[-2:]
+    assert polled is not None
+    assert gaps is None
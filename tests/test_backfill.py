@@ -0,0 +1,108 @@
+"""Tests for the backfill of the history into long-term statistics."""
+from datetime import datetime
+from unittest.mock import AsyncMock, Mock, patch
+
+from pytest_homeassistant_custom_component.common import MockConfigEntry
+
+from homeassistant.core import HomeAssistant
+from homeassistant.util import dt as dt_util
+
+from custom_components.provident_energy.api import ProvidentEnergyAPI, Utility, UtilityGroup
+from custom_components.provident_energy.backfill import ProvidentEnergyBackfill
+from custom_components.provident_energy.const import (
+    API_SESSION_COOKIE,
+    DOMAIN,
+    STORAGE_KEY_BACKFILL,
+    STORAGE_VERSION,
+)
+
+UTILITY = Utility(id="m1", text="Meter 1 Cold Water (m3)", title="METER-00001")
+
+
+def store_cursor(hass_storage, entry: MockConfigEntry, cursor: dict) -> None:
+    """Store the backfill cursor of the meter."""
+    hass_storage[f"{STORAGE_KEY_BACKFILL}.{entry.entry_id}"] = {
+        "version": STORAGE_VERSION,
+        "key": f"{STORAGE_KEY_BACKFILL}.{entry.entry_id}",
+        "data": {UTILITY.id: cursor},
+    }
+
+
+async def run_backfill(
+    hass: HomeAssistant, entry: MockConfigEntry, data: list
+) -> tuple[AsyncMock, list]:
+    """Run the backfill with the site answering with the data of one day.
+
+    Returns:
+        The mock of the requests, and the statistics imported
+    """
+    # The requests are answered by the mock, a session would only start a resolver thread
+    api = ProvidentEnergyAPI(Mock(), "user", "password")
+    api.restore_session({API_SESSION_COOKIE: "session"})
+    api.set_utility_groups(
+        [UtilityGroup(id="g0", text="Unit 101", utilities=[UTILITY])], datetime.now()
+    )
+    # Only the date is sent, so the server answers with the whole day from midnight
+    get_json = AsyncMock(return_value=[{
+        "name": UTILITY.text,
+        "site": "Site",
+        "utility": "Cold Water (m3)",
+        "data": data,
+    }])
+
+    with (
+        patch.object(api, "_get_json", get_json),
+        patch(
+            "custom_components.provident_energy.backfill.async_add_external_statistics"
+        ) as add_statistics,
+    ):
+        await ProvidentEnergyBackfill(hass, entry, api).async_run()
+
+    return get_json, add_statistics.call_args.args[2] if add_statistics.called else []
+
+
+async def test_backfill_resumes_from_cursor_within_a_day(
+    hass: HomeAssistant, hass_storage, freezer
+) -> None:
+    """Test that a cursor after midnight imports the hours of the data for that day."""
+    freezer.move_to(datetime(2024, 6, 15, 12, tzinfo=dt_util.get_default_time_zone()))
+    entry = MockConfigEntry(domain=DOMAIN)
+    store_cursor(
+        hass_storage,
+        entry,
+        {"next": "2024-06-14T14:00:00", "sum": 10.0, "started": True, "utility_name": "Cold Water"},
+    )
+
+    get_json, statistics = await run_backfill(hass, entry, [hour / 10 for hour in range(24)])
+
+    assert get_json.call_args.args[1]["startDate"] == "2024-06-14"
+    timezone = dt_util.get_default_time_zone()
+    assert [row["start"] for row in statistics] == [
+        datetime(2024, 6, 14, hour, tzinfo=timezone) for hour in range(14, 24)
+    ]
+    assert statistics[0]["state"] == 1.4
+    assert statistics[0]["sum"] == 11.4
+    assert statistics[-1]["state"] == 2.3
+    assert statistics[-1]["sum"] == sum(hour / 10 for hour in range(14, 24)) + 10.0
+    cursor = hass_storage[f"{STORAGE_KEY_BACKFILL}.{entry.entry_id}"]["data"][UTILITY.id]
+    assert cursor["next"] == "2024-06-15T00:00:00"
+
+
+async def test_backfill_stops_at_missing_hour(hass: HomeAssistant, hass_storage, freezer) -> None:
+    """Test that the cursor stops at a missing hour that may still be published."""
+    freezer.move_to(datetime(2024, 6, 15, 12, tzinfo=dt_util.get_default_time_zone()))
+    entry = MockConfigEntry(domain=DOMAIN)
+    store_cursor(
+        hass_storage,
+        entry,
+        {"next": "2024-06-14T00:00:00", "sum": 0.0, "started": True, "utility_name": "Cold Water"},
+    )
+    data = [1.0] * 24
+    data[18] = None
+
+    _, statistics = await run_backfill(hass, entry, data)
+
+    assert len(statistics) == 18
+    assert statistics[-1]["sum"] == 18.0
+    cursor = hass_storage[f"{STORAGE_KEY_BACKFILL}.{entry.entry_id}"]["data"][UTILITY.id]
+    assert cursor["next"] == "2024-06-14T18:00:00"
@@ -0,0 +1,102 @@
+"""Tests for the circuit breaker."""
+import asyncio
+from unittest.mock import AsyncMock, patch
+
+import pytest
+
+from custom_components.provident_energy.circuit import (
+    STATE_CLOSED,
+    STATE_HALF_OPEN,
+    STATE_OPEN,
+    CircuitBreaker,
+    CircuitOpenError,
+)
+
+
+@pytest.fixture
+def clock():
+    """Control the monotonic clock of the circuit breaker."""
+    with patch("custom_components.provident_energy.circuit.time") as time:
+        time.monotonic.return_value = 1000.0
+        yield time
+
+
+def open_circuit(breaker: CircuitBreaker) -> None:
+    """Record enough failures in a row to open the circuit."""
+    for _ in range(breaker.failure_threshold):
+        breaker.record_failure()
+
+
+async def test_opens_after_failures_in_a_row(clock) -> None:
+    """Test that only failures in a row open the circuit, and requests then fail right away."""
+    breaker = CircuitBreaker("example.com", failure_threshold=3, reset_timeout=300)
+    breaker.record_failure()
+    breaker.record_failure()
+    breaker.record_success()
+    breaker.record_failure()
+    breaker.record_failure()
+    assert breaker.state == STATE_CLOSED
+
+    breaker.record_failure()
+    assert breaker.state == STATE_OPEN
+    assert breaker.retry_in == 300
+    probe = AsyncMock(return_value=True)
+    with pytest.raises(CircuitOpenError):
+        await breaker.acquire(probe)
+    probe.assert_not_awaited()
+
+
+async def test_probe_closes_circuit(clock) -> None:
+    """Test that a successful probe once the timeout passed closes the circuit."""
+    breaker = CircuitBreaker("example.com", failure_threshold=1, reset_timeout=300)
+    open_circuit(breaker)
+
+    clock.monotonic.return_value += 300
+    assert breaker.state == STATE_HALF_OPEN
+    probe = AsyncMock(return_value=True)
+    await breaker.acquire(probe)
+
+    probe.assert_awaited_once()
+    assert breaker.state == STATE_CLOSED
+    assert breaker.failures == 0
+
+
+async def test_failed_probes_double_timeout(clock) -> None:
+    """Test that the circuit opens for twice as long after each failed probe, up to the maximum."""
+    breaker = CircuitBreaker("example.com", failure_threshold=1, reset_timeout=300, max_reset_timeout=1000)
+    open_circuit(breaker)
+    probe = AsyncMock(return_value=False)
+
+    timeouts = []
+    for _ in range(3):
+        clock.monotonic.return_value += breaker.retry_in
+        with pytest.raises(CircuitOpenError):
+            await breaker.acquire(probe)
+        timeouts.append(breaker.retry_in)
+
+    assert timeouts == [600, 1000, 1000]
+    assert breaker.opened == 4
+
+    # A success starts over from the first timeout
+    clock.monotonic.return_value += breaker.retry_in
+    probe.return_value = True
+    await breaker.acquire(probe)
+    open_circuit(breaker)
+    assert breaker.retry_in == 300
+
+
+async def test_single_probe_while_half_open(clock) -> None:
+    """Test that requests waiting on a half-open circuit share the outcome of one probe."""
+    breaker = CircuitBreaker("example.com", failure_threshold=1, reset_timeout=300)
+    open_circuit(breaker)
+    clock.monotonic.return_value += 300
+
+    async def probe() -> bool:
+        await asyncio.sleep(0)
+        return True
+
+    probe_mock = AsyncMock(side_effect=probe)
+    await asyncio.gather(*(breaker.acquire(probe_mock) for _ in range(5)))
+
+    probe_mock.assert_awaited_once()
+    assert breaker.state == STATE_CLOSED
@@ -0,0 +1,93 @@
+"""Tests for the tracking of missing hours."""
+from datetime import datetime, timedelta
+
+from custom_components.provident_energy.const import (
+    DEFAULT_GAP_MAX_AGE,
+    DEFAULT_PROVISIONAL_PERIOD,
+)
+from custom_components.provident_energy.gaps import GapTracker
+from custom_components.provident_energy.series import ConsumptionSeries
+
+START = datetime(2024, 6, 15)
+NOW = datetime(2024, 6, 20, 12)
+
+
+def hour(index: int) -> datetime:
+    """Get the timestamp of an hour after START."""
+    return START + timedelta(hours=index)
+
+
+def test_missing_hours_before_high_water_mark() -> None:
+    """Test that only the missing hours before the latest value are gaps."""
+    tracker = GapTracker()
+    tracker.update(None, ConsumptionSeries(START, [1.0, None, 2.0, None, 3.0, None, None]), NOW)
+
+    assert set(tracker.gaps) == {hour(1), hour(3)}
+
+    tracker.update(None, ConsumptionSeries(START, [1.0, 5.0, 2.0, None, 3.0, 4.0, None]), NOW)
+    assert set(tracker.gaps) == {hour(3)}
+
+
+def test_zero_replacing_missing_hour_is_provisional() -> None:
+    """Test that a newly published zero is tracked until it has stayed zero long enough."""
+    tracker = GapTracker()
+    previous = ConsumptionSeries(START, [1.0, None, 2.0])
+    current = ConsumptionSeries(START, [1.0, 0.0, 2.0])
+
+    tracker.update(previous, current, NOW)
+    assert tracker.gaps[hour(1)].provisional
+
+    tracker.update(current, current, NOW + timedelta(seconds=DEFAULT_PROVISIONAL_PERIOD))
+    assert not tracker.gaps
+
+
+def test_gaps_expire() -> None:
+    """Test that hours are no longer tracked once they are too old."""
+    tracker = GapTracker()
+    tracker.update(None, ConsumptionSeries(START, [1.0, None, 2.0]), NOW)
+
+    assert tracker.ranges(hour(48), NOW + timedelta(seconds=DEFAULT_GAP_MAX_AGE)) == []
+    assert not tracker.gaps
+
+
+def test_ranges_merge_consecutive_days() -> None:
+    """Test that the days of the gaps are coalesced into ranges of consecutive days."""
+    tracker = GapTracker()
+    values = [1.0] * 24 * 5
+    for index in (3, 5, 24 + 7, 24 * 3 + 1):
+        values[index] = None
+    tracker.update(None, ConsumptionSeries(START, values), NOW)
+
+    assert tracker.ranges(hour(24 * 5), NOW) == [
+        (hour(0), hour(48)),
+        (hour(72), hour(96)),
+    ]
+    # Gaps from the given time on are left out
+    assert tracker.ranges(hour(24), NOW) == [(hour(0), hour(24))]
+
+
+def test_resolve_fills_gaps_from_fetched_data() -> None:
+    """Test that data requested again fills the gaps, and reports their old and new values."""
+    tracker = GapTracker()
+    tracker.update(None, ConsumptionSeries(START, [1.0, None, 2.0, None, None, 3.0]), NOW)
+
+    fetched = ConsumptionSeries(START, [1.0, 4.0, 2.0, None, 6.0, 3.0])
+    previous, current = tracker.resolve(fetched, hour(6), NOW)
+
+    assert previous.start == current.start == hour(1)
+    assert previous.to_list() == [None, None, None, None]
+    assert current.to_list() == [4.0, None, None, 6.0]
+    assert set(tracker.gaps) == {hour(3)}
+    assert tracker.resolve(fetched, hour(6), NOW) is None
+
+
+def test_dict_round_trip() -> None:
+    """Test that the tracker can be restored from its serialized form."""
+    tracker = GapTracker()
+    tracker.update(
+        ConsumptionSeries(START, [1.0, None, None, 2.0]),
+        ConsumptionSeries(START, [1.0, None, 0.0, 2.0]),
+        NOW,
+    )
+
+    assert GapTracker.from_dict(tracker.as_dict()).gaps == tracker.gaps
@@ -0,0 +1,60 @@
+"""Tests for the Provident Energy services."""
+from unittest.mock import AsyncMock, Mock
+
+import pytest
+from pytest_homeassistant_custom_component.common import MockConfigEntry
+
+from homeassistant.core import HomeAssistant
+from homeassistant.exceptions import ServiceValidationError
+
+from custom_components.provident_energy import async_setup
+from custom_components.provident_energy.const import (
+    ATTR_CONFIG_ENTRY_ID,
+    DOMAIN,
+    SERVICE_REFRESH_DATA,
+)
+
+
+@pytest.fixture
+async def coordinators(hass: HomeAssistant) -> dict[str, Mock]:
+    """Register the services with two loaded accounts."""
+    assert await async_setup(hass, {})
+    coordinators = {}
+    for username in ("first", "second"):
+        entry = MockConfigEntry(domain=DOMAIN, title=username, unique_id=username)
+        entry.add_to_hass(hass)
+        coordinators[entry.entry_id] = Mock(async_request_manual_refresh=AsyncMock())
+    hass.data[DOMAIN] = dict(coordinators)
+    return coordinators
+
+
+async def test_refresh_data_without_target(hass: HomeAssistant, coordinators) -> None:
+    """Test that refresh_data without a target refreshes every account."""
+    await hass.services.async_call(DOMAIN, SERVICE_REFRESH_DATA, {}, blocking=True)
+
+    for coordinator in coordinators.values():
+        coordinator.async_request_manual_refresh.assert_awaited_once()
+
+
+async def test_refresh_data_with_config_entry_id(hass: HomeAssistant, coordinators) -> None:
+    """Test that refresh_data with only a config_entry_id refreshes that account."""
+    entry_id, other_entry_id = coordinators
+    await hass.services.async_call(
+        DOMAIN, SERVICE_REFRESH_DATA, {ATTR_CONFIG_ENTRY_ID: entry_id}, blocking=True
+    )
+
+    coordinators[entry_id].async_request_manual_refresh.assert_awaited_once()
+    coordinators[other_entry_id].async_request_manual_refresh.assert_not_awaited()
+
+
+async def test_refresh_data_with_unknown_config_entry_id(
+    hass: HomeAssistant, coordinators
+) -> None:
+    """Test that refresh_data rejects a config_entry_id that isn't a loaded account."""
+    with pytest.raises(ServiceValidationError):
+        await hass.services.async_call(
+            DOMAIN, SERVICE_REFRESH_DATA, {ATTR_CONFIG_ENTRY_ID: "unknown"}, blocking=True
+        )
+
+    for coordinator in coordinators.values():
+        coordinator.async_request_manual_refresh.assert_not_awaited()
@@ -0,0 +1,85 @@
+"""Tests for the polling schedule."""
+from datetime import datetime, timedelta
+
+from custom_components.provident_energy.const import UTILITY_COLD_WATER, UTILITY_ELECTRICITY
+from custom_components.provident_energy.scheduler import PublicationScheduler
+
+NOW = datetime(2024, 6, 15, 12, 30)
+MINUTE = timedelta(minutes=1)
+
+
+def make_scheduler(**kwargs) -> PublicationScheduler:
+    """Create a scheduler without jitter, so that its intervals are predictable."""
+    return PublicationScheduler(
+        min_interval=5 * MINUTE,
+        max_interval=240 * MINUTE,
+        jitter=timedelta(0),
+        margin=10 * MINUTE,
+        **kwargs,
+    )
+
+
+def test_failures_back_off_up_to_max_interval() -> None:
+    """Test that the interval doubles with each failed poll until the maximum."""
+    scheduler = make_scheduler()
+
+    intervals = [scheduler.on_failure() for _ in range(8)]
+
+    assert intervals == [
+        10 * MINUTE, 20 * MINUTE, 40 * MINUTE, 80 * MINUTE, 160 * MINUTE, 240 * MINUTE, 240 * MINUTE, 240 * MINUTE
+    ]
+    assert scheduler.should_poll(NOW)
+
+
+def test_poll_when_data_is_due() -> None:
+    """Test that the next poll waits for the earliest meter's next data point."""
+    scheduler = make_scheduler()
+    marks = [
+        # Due at 11:00 + 1 hour + 2 hours + margin
+        (UTILITY_COLD_WATER, datetime(2024, 6, 15, 11)),
+        # Due the next day
+        (UTILITY_ELECTRICITY, datetime(2024, 6, 15, 10)),
+        (None, None),
+    ]
+
+    interval = scheduler.on_success(marks, NOW, new_data=True)
+
+    assert interval == datetime(2024, 6, 15, 14, 10) - NOW
+    assert not scheduler.should_poll(NOW)
+    assert scheduler.should_poll(datetime(2024, 6, 15, 14, 10))
+    assert scheduler.time_until_next(NOW + 60 * MINUTE) == interval - 60 * MINUTE
+
+
+def test_late_data_backs_off_and_resets() -> None:
+    """Test that polls for late data back off, and back to normal once new data arrived."""
+    scheduler = make_scheduler()
+    # Due at 12:10, so 20 minutes late
+    marks = [(UTILITY_COLD_WATER, datetime(2024, 6, 15, 9))]
+
+    assert scheduler.expected_publication(marks, NOW) == NOW + 20 * MINUTE
+    assert scheduler.on_success(marks, NOW, new_data=False) == 20 * MINUTE
+    # The poll without new data counts as a miss
+    assert scheduler.on_failure() == 20 * MINUTE
+    assert scheduler.on_failure() == 40 * MINUTE
+
+    marks = [(UTILITY_COLD_WATER, datetime(2024, 6, 15, 11))]
+    assert scheduler.on_success(marks, NOW, new_data=True) == 100 * MINUTE
+
+
+def test_meter_overdue_for_long_is_left_out() -> None:
+    """Test that a meter that stopped publishing doesn't drive the polls of the others."""
+    scheduler = make_scheduler()
+    stopped = (UTILITY_COLD_WATER, datetime(2024, 6, 14, 12))
+    active = (UTILITY_ELECTRICITY, datetime(2024, 6, 14, 12))
+
+    assert scheduler.expected_publication([stopped, active], NOW) == datetime(2024, 6, 15, 13, 10)
+    # Without any other meter, the data is due now
+    assert scheduler.expected_publication([stopped], NOW) == NOW
+
+
+def test_offset_staggers_polls() -> None:
+    """Test that the offset is added to every interval."""
+    scheduler = make_scheduler(offset=2 * MINUTE)
+
+    assert scheduler.on_failure() == 12 * MINUTE
+    assert scheduler.time_until_next(NOW) == 5 * MINUTE
@@ -0,0 +1,182 @@
+"""Tests for the Provident Energy sensors."""
+from datetime import datetime, timedelta
+from typing import Any
+from unittest.mock import AsyncMock, Mock, patch
+
+import aiohttp
+import pytest
+from pytest_homeassistant_custom_component.common import MockConfigEntry, async_fire_time_changed
+
+from homeassistant.core import HomeAssistant
+from homeassistant.helpers import entity_registry as er, event
+from homeassistant.util import dt as dt_util
+
+from custom_components.provident_energy.api import ProvidentEnergyAPI
+from custom_components.provident_energy.const import (
+    API_ROOT_NODES_ENDPOINT,
+    CONF_PASSWORD,
+    CONF_USERNAME,
+    DOMAIN,
+)
+
+# The fixture answers the requests without making them, the outage needs the real ones
+REAL_GET_JSON = ProvidentEnergyAPI._get_json
+
+ROOT_NODES = [
+    {"id": "g0", "parent": "#", "text": "Unit 101", "a_attr": {"title": "Unit 101"}},
+    {"id": "m1", "parent": "g0", "text": "Meter 1 Cold Water (m3)", "a_attr": {"title": "METER-00001"}},
+]
+
+
+async def fake_get_json(self, endpoint: str, params: dict[str, Any], cache: bool = False) -> Any:
+    """Answer with the meter tree, or with the hour of the day as each hour's value.
+
+    Like the site, the hours of the last two hours are not published yet.
+    """
+    if endpoint == API_ROOT_NODES_ENDPOINT:
+        return ROOT_NODES
+    start = datetime.strptime(params["startDate"], "%Y-%m-%d")
+    end = datetime.strptime(params["endDate"], "%Y-%m-%d")
+    published = dt_util.now().replace(tzinfo=None) - timedelta(hours=2)
+    data = []
+    hour = start
+    while hour < end:
+        data.append(float(hour.hour) if hour <= published else None)
+        hour += timedelta(hours=1)
+    return [{
+        "meterId": "m1",
+        "name": "Meter 1 Cold Water (m3)",
+        "site": "Site",
+        "utility": "Cold Water (m3)",
+        "data": data,
+    }]
+
+
+@pytest.fixture
+async def setup_entry(hass: HomeAssistant, freezer):
+    """Set up an account while the system clock is on another day than HA's time zone."""
+    # 20:30 in HA's time zone of the tests, US/Pacific, is 03:30 the next day in UTC
+    freezer.move_to(datetime(2024, 6, 15, 20, 30, tzinfo=dt_util.get_default_time_zone()))
+    # The backfill needs the recorder, which isn't set up
+    hass.config.components.add("recorder")
+    entry = MockConfigEntry(
+        domain=DOMAIN, data={CONF_USERNAME: "user", CONF_PASSWORD: "password"}
+    )
+    entry.add_to_hass(hass)
+    with (
+        patch.object(ProvidentEnergyAPI, "_check_auth", AsyncMock(return_value=True)),
+        patch.object(ProvidentEnergyAPI, "_get_json", fake_get_json),
+        patch("custom_components.provident_energy._async_start_backfill", AsyncMock()),
+        patch.object(
+            event, "async_track_utc_time_change", wraps=event.async_track_utc_time_change
+        ) as track_time_change,
+    ):
+        assert await hass.config_entries.async_setup(entry.entry_id)
+        await hass.async_block_till_done()
+        # The coordinator tracks the hours for all of its entities
+        assert track_time_change.call_count == 1
+        yield entry
+
+
+def get_state(hass: HomeAssistant, unique_id: str):
+    """Get the state of a sensor by its unique id."""
+    entity_id = er.async_get(hass).async_get_entity_id("sensor", DOMAIN, unique_id)
+    return hass.states.get(entity_id)
+
+
+async def test_hourly_sensor_uses_ha_time_zone(hass: HomeAssistant, setup_entry) -> None:
+    """Test that the hourly sensor shows the data of the hour in HA's time zone."""
+    state = get_state(hass, "METER-00001")
+    # Cold water lags by two hours
+    assert state.state == "18.0"
+    assert state.attributes["timestamp"] == "2024-06-15T18:00:00"
+
+
+async def test_period_sensor_uses_ha_time_zone(hass: HomeAssistant, setup_entry) -> None:
+    """Test that the period total and its reset follow the day in HA's time zone."""
+    state = get_state(hass, "METER-00001_today")
+    assert state.attributes["last_reset"] == "2024-06-15T00:00:00-07:00"
+    assert state.attributes["period_start"] == "2024-06-15T00:00:00"
+    # The hours from midnight up to 18:00 are published
+    assert float(state.state) == sum(range(19))
+
+
+async def test_sensors_move_on_every_hour(hass: HomeAssistant, setup_entry, freezer) -> None:
+    """Test that the sensors move on to the next hour and period without new data."""
+    freezer.move_to(datetime(2024, 6, 15, 21, tzinfo=dt_util.get_default_time_zone()))
+    async_fire_time_changed(hass)
+    await hass.async_block_till_done()
+    assert get_state(hass, "METER-00001").attributes["timestamp"] == "2024-06-15T19:00:00"
+
+    freezer.move_to(datetime(2024, 6, 16, tzinfo=dt_util.get_default_time_zone()))
+    async_fire_time_changed(hass)
+    await hass.async_block_till_done()
+    assert get_state(hass, "METER-00001").attributes["timestamp"] == "2024-06-15T22:00:00"
+    state = get_state(hass, "METER-00001_today")
+    assert state.state == "0.0"
+    assert state.attributes["last_reset"] == "2024-06-16T00:00:00-07:00"
+
+
+async def test_period_sensors_count_from_period_start(hass: HomeAssistant, setup_entry) -> None:
+    """Test that the totals include the hours of the periods before the held window."""
+    # The week started on Monday the 10th, and the hours up to 18:00 on the 15th are published
+    assert float(get_state(hass, "METER-00001_week").state) == 5 * sum(range(24)) + sum(range(19))
+    assert float(get_state(hass, "METER-00001_month").state) == 14 * sum(range(24)) + sum(range(19))
+
+
+async def test_period_sensors_count_hours_missed_by_polls(
+    hass: HomeAssistant, setup_entry, freezer
+) -> None:
+    """Test that the totals include the hours published while nothing was polled."""
+    coordinator = hass.data[DOMAIN][setup_entry.entry_id]
+    freezer.move_to(datetime(2024, 6, 18, 20, 30, tzinfo=dt_util.get_default_time_zone()))
+    await coordinator.async_refresh()
+    await hass.async_block_till_done()
+
+    assert float(get_state(hass, "METER-00001_month").state) == 17 * sum(range(24)) + sum(range(19))
+
+
+async def test_diagnostic_sensors_available_when_polls_fail(
+    hass: HomeAssistant, setup_entry, freezer
+) -> None:
+    """Test that the metrics stay available when the data isn't."""
+    coordinator = hass.data[DOMAIN][setup_entry.entry_id]
+    freezer.tick(timedelta(minutes=2))
+    with patch.object(coordinator.provident_api, "get_consumption_data", AsyncMock(return_value={})):
+        await coordinator.async_request_manual_refresh()
+        await hass.async_block_till_done()
+
+    assert not coordinator.last_update_success
+    assert get_state(hass, "METER-00001").state == "unavailable"
+    assert get_state(hass, f"{setup_entry.entry_id}_retries").state == "0"
+
+
+async def test_sensors_keep_last_known_data_when_site_is_down(
+    hass: HomeAssistant, setup_entry, freezer
+) -> None:
+    """Test that the first failed refresh of a single meter opens the circuit and keeps the data."""
+    coordinator = hass.data[DOMAIN][setup_entry.entry_id]
+    api = coordinator.provident_api
+    session = Mock(request=Mock(side_effect=aiohttp.ClientConnectionError("down")))
+    freezer.tick(timedelta(minutes=2))
+    with (
+        patch.object(api, "session", session),
+        patch.object(ProvidentEnergyAPI, "_get_json", REAL_GET_JSON),
+        patch("custom_components.provident_energy.api.API_RETRY_BASE_DELAY", 0),
+    ):
+        await coordinator.async_request_manual_refresh()
+        await hass.async_block_till_done()
+
+        assert api.circuit_breaker.is_open
+        assert coordinator.last_update_success
+        state = get_state(hass, "METER-00001")
+        assert state.state == "18.0"
+        assert state.attributes["stale"] is True
+
+        # Polls are skipped while the circuit is open
+        session.request.reset_mock()
+        freezer.tick(timedelta(minutes=2))
+        await coordinator.async_request_manual_refresh()
+        await hass.async_block_till_done()
+        session.request.assert_not_called()
+        assert get_state(hass, "METER-00001").attributes["stale"] is True
@@ -0,0 +1,81 @@
+"""Tests for the compact consumption series."""
+from datetime import datetime, timedelta
+
+import pytest
+
+from custom_components.provident_energy.series import ConsumptionSeries
+
+START = datetime(2024, 6, 15)
+
+
+def hour(index: int) -> datetime:
+    """Get the timestamp of an hour after START."""
+    return START + timedelta(hours=index)
+
+
+def test_window_aligns_values_by_timestamp() -> None:
+    """Test that a window keeps each value at its hour, with missing values outside the series."""
+    series = ConsumptionSeries(hour(2), [1.0, None, 3.0, 4.0])
+
+    window = series.window(hour(0), hour(5))
+
+    assert window.start == hour(0)
+    assert window.end == hour(5)
+    assert window.to_list() == [None, None, 1.0, None, 3.0]
+    assert window.value_at(hour(4)) == 3.0
+    assert window.value_at(hour(5)) is None
+
+
+def test_window_without_overlap_is_empty() -> None:
+    """Test that a window the series doesn't cover only has missing values."""
+    series = ConsumptionSeries(hour(0), [1.0, 2.0])
+
+    assert series.window(hour(4), hour(6)).to_list() == [None, None]
+    assert series.window(hour(4), hour(2)).to_list() == []
+
+
+def test_merge_prefers_newer_values() -> None:
+    """Test that a merge takes the newer values, except where they are missing."""
+    held = ConsumptionSeries(hour(0), [1.0, 2.0, 3.0, None])
+    newer = ConsumptionSeries(hour(1), [20.0, None, 40.0, 50.0])
+
+    merged = held.merge(newer, hour(1), hour(5))
+
+    assert merged.start == hour(1)
+    assert merged.to_list() == [20.0, 3.0, 40.0, 50.0]
+    # The held series itself is left alone
+    assert held.to_list() == [1.0, 2.0, 3.0, None]
+
+
+def test_merge_rejects_other_resolution() -> None:
+    """Test that series of different resolutions can't be merged."""
+    held = ConsumptionSeries(hour(0), [1.0])
+    newer = ConsumptionSeries(hour(0), [1.0], resolution=timedelta(minutes=15))
+
+    with pytest.raises(ValueError):
+        held.merge(newer, hour(0), hour(1))
+
+
+def test_differences_compare_the_same_hours() -> None:
+    """Test that the changes from a previous version are matched by timestamp."""
+    previous = ConsumptionSeries(hour(0), [1.0, 2.0, 3.0])
+    current = ConsumptionSeries(hour(1), [2.0, 5.0, None, 4.0])
+
+    assert list(current.differences(previous)) == [(hour(2), 2.0), (hour(4), 4.0)]
+    assert list(current.differences(None)) == [(hour(1), 2.0), (hour(2), 5.0), (hour(4), 4.0)]
+
+
+def test_last_valid_until() -> None:
+    """Test that the high-water mark skips missing values and can be capped."""
+    series = ConsumptionSeries(hour(0), [1.0, None, 3.0, None])
+
+    assert series.last_valid() == hour(2)
+    assert series.last_valid(hour(1)) == hour(0)
+    assert series.last_valid(hour(-1)) is None
+
+
+def test_buffer_round_trip() -> None:
+    """Test that a series restored from its raw values equals the original."""
+    series = ConsumptionSeries(hour(0), [1.0, None, 3.0])
+
+    assert ConsumptionSeries.from_buffer(hour(0), series.buffer.tobytes()) == series
@@ -0,0 +1,123 @@
+"""Tests for the tariffs and the cost of consumption."""
+import math
+import random
+from datetime import datetime
+from typing import List, Optional, Tuple
+
+import pytest
+
+from custom_components.provident_energy.const import (
+    CONF_BANDS,
+    CONF_DAILY_CHARGE,
+    CONF_RATE,
+    CONF_TIERS,
+    PERIOD_BILLING_CYCLE,
+)
+from custom_components.provident_energy.series import ConsumptionSeries
+from custom_components.provident_energy.tariff import (
+    Tariff,
+    TariffBand,
+    parse_bands,
+    parse_tiers,
+)
+from custom_components.provident_energy.totals import get_period_start
+
+TARIFF = Tariff.from_options(
+    {
+        CONF_RATE: 0.2,
+        CONF_DAILY_CHARGE: 0.5,
+        CONF_BANDS: "mon-fri 07-23=0.25; 23-07=0.12; sat-sun 10-14=0.08",
+        CONF_TIERS: "40=0.30; 60=0.35",
+    },
+    billing_day=15,
+)
+
+
+def reference_cost(
+    tariff: Tariff, series: ConsumptionSeries, cycle_usage: float
+) -> Tuple[List[Optional[float]], float]:
+    """Compute the cost of each hour one at a time, as the tariff describes it."""
+    costs: List[Optional[float]] = []
+    cycle = None
+    for index, value in enumerate(series):
+        hour = series.timestamp_at(index)
+        hour_cycle = get_period_start(PERIOD_BILLING_CYCLE, hour, tariff.billing_day)
+        if cycle is not None and hour_cycle != cycle:
+            cycle_usage = 0.0
+        cycle = hour_cycle
+        if value is None:
+            costs.append(None)
+            continue
+
+        rate = tariff.rate
+        for band in tariff.bands:
+            if hour.weekday() in band.weekdays and hour.hour in band.hours:
+                rate = band.rate
+
+        # Split the consumption of the hour at the thresholds of the tiers
+        cost = 0.0
+        used = cycle_usage
+        limits = [threshold for threshold, _ in tariff.tiers] + [math.inf]
+        rates = [rate] + [tier_rate for _, tier_rate in tariff.tiers]
+        for limit, limit_rate in zip(limits, rates):
+            portion = max(0.0, min(cycle_usage + value, limit) - used)
+            cost += portion * limit_rate
+            used += portion
+        if hour.hour == 0:
+            cost += tariff.daily_charge
+        cycle_usage += value
+        costs.append(cost)
+    return costs, cycle_usage
+
+
+def test_parse_bands() -> None:
+    """Test that bands may wrap around midnight and the end of the week."""
+    assert parse_bands("fri-mon 22-02=0.1; 07-09 = 0.3") == (
+        TariffBand(22, 2, 0.1, (4, 5, 6, 0)),
+        TariffBand(7, 9, 0.3),
+    )
+    assert TariffBand(22, 2, 0.1).hours == (22, 23, 0, 1)
+
+
+@pytest.mark.parametrize("text", ["07-07=0.1", "07-25=0.1", "xyz 07-09=0.1", "07-09"])
+def test_parse_invalid_bands(text: str) -> None:
+    """Test that invalid bands are rejected."""
+    with pytest.raises(ValueError):
+        parse_bands(text)
+
+
+def test_parse_tiers_sorted() -> None:
+    """Test that tiers are sorted by threshold."""
+    assert parse_tiers("1000=0.35; 500=0.30") == ((500.0, 0.30), (1000.0, 0.35))
+    with pytest.raises(ValueError):
+        parse_tiers("500")
+
+
+@pytest.mark.parametrize("cycle_usage", [0.0, 35.0])
+def test_cost_matches_reference(cycle_usage: float) -> None:
+    """Test the vectorized cost against a computation per hour, across a billing cycle start."""
+    rng = random.Random(1)
+    values = [None if rng.random() < 0.1 else round(rng.uniform(0, 2), 3) for _ in range(24 * 10)]
+    series = ConsumptionSeries(datetime(2024, 6, 10), values)
+
+    cost, usage = TARIFF.cost_series(series, cycle_usage)
+    expected, expected_usage = reference_cost(TARIFF, series, cycle_usage)
+
+    assert usage == pytest.approx(expected_usage)
+    for hour, (actual, reference) in enumerate(zip(cost, expected)):
+        assert (actual is None) == (reference is None), series.timestamp_at(hour)
+        if reference is not None:
+            assert actual == pytest.approx(reference), series.timestamp_at(hour)
+
+
+def test_cost_without_tiers() -> None:
+    """Test the cost of hours in and out of the bands, with the daily charge at midnight."""
+    tariff = Tariff(rate=0.2, daily_charge=1.0, bands=parse_bands("mon-fri 07-23=0.25"))
+    # A Friday evening into Saturday
+    series = ConsumptionSeries(datetime(2024, 6, 14, 22), [1.0, 1.0, 1.0, None])
+
+    cost, _ = tariff.cost_series(series)
+
+    assert cost.to_list() == pytest.approx([0.25, 0.2, 1.2, None])
+    assert cost.start == series.start
+    assert cost.to_list() == pytest.approx(reference_cost(tariff, series, 0.0)[0])
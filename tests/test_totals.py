@@ -0,0 +1,80 @@
+"""Tests for the running period totals."""
+from datetime import datetime
+
+import pytest
+
+from custom_components.provident_energy.const import (
+    PERIOD_BILLING_CYCLE,
+    PERIOD_MONTH,
+    PERIOD_TODAY,
+    PERIOD_WEEK,
+)
+from custom_components.provident_energy.series import ConsumptionSeries
+from custom_components.provident_energy.totals import PeriodTotals, get_period_start
+
+NEW_YEARS_EVE = datetime(2024, 12, 31, 22)
+
+
+@pytest.mark.parametrize(
+    ("period", "timestamp", "billing_day", "start"),
+    [
+        (PERIOD_TODAY, datetime(2025, 1, 1, 0, 30), 1, datetime(2025, 1, 1)),
+        # 2025 starts on a Wednesday
+        (PERIOD_WEEK, datetime(2025, 1, 1, 5), 1, datetime(2024, 12, 30)),
+        (PERIOD_MONTH, datetime(2024, 3, 1), 1, datetime(2024, 3, 1)),
+        (PERIOD_MONTH, datetime(2024, 2, 29, 23), 1, datetime(2024, 2, 1)),
+        (PERIOD_BILLING_CYCLE, datetime(2025, 1, 3), 15, datetime(2024, 12, 15)),
+        (PERIOD_BILLING_CYCLE, datetime(2025, 1, 15), 15, datetime(2025, 1, 15)),
+        (PERIOD_BILLING_CYCLE, datetime(2024, 3, 10), 28, datetime(2024, 2, 28)),
+    ],
+)
+def test_period_start(period: str, timestamp: datetime, billing_day: int, start: datetime) -> None:
+    """Test the start of the period of a timestamp across months and years."""
+    assert get_period_start(period, timestamp, billing_day) == start
+
+
+def test_totals_roll_over_at_new_year() -> None:
+    """Test that the hours after midnight on New Year's Eve start a new day and month."""
+    totals = PeriodTotals(billing_day=15)
+    totals.apply(None, ConsumptionSeries(NEW_YEARS_EVE, [1.0, 2.0, 3.0, 4.0]))
+
+    now = datetime(2025, 1, 1, 4)
+    assert totals.value(PERIOD_TODAY, now) == 7.0
+    assert totals.value(PERIOD_WEEK, now) == 10.0
+    assert totals.value(PERIOD_MONTH, now) == 7.0
+    assert totals.value(PERIOD_BILLING_CYCLE, now) == 10.0
+
+
+def test_late_correction_only_counts_in_current_periods() -> None:
+    """Test that a correction to an hour of last year only changes the periods still current."""
+    totals = PeriodTotals(billing_day=15)
+    previous = ConsumptionSeries(NEW_YEARS_EVE, [1.0, 2.0, 3.0, 4.0])
+    totals.apply(None, previous)
+    totals.apply(previous, ConsumptionSeries(NEW_YEARS_EVE, [1.0, 5.0, 3.0, 4.0]))
+
+    now = datetime(2025, 1, 1, 4)
+    assert totals.value(PERIOD_TODAY, now) == 7.0
+    assert totals.value(PERIOD_WEEK, now) == 13.0
+    assert totals.value(PERIOD_MONTH, now) == 7.0
+    assert totals.value(PERIOD_BILLING_CYCLE, now) == 13.0
+
+
+def test_value_of_period_without_data_yet() -> None:
+    """Test that a period nothing was recorded in yet has a total of zero."""
+    totals = PeriodTotals()
+    assert totals.value(PERIOD_MONTH, NEW_YEARS_EVE) is None
+
+    totals.apply(None, ConsumptionSeries(NEW_YEARS_EVE, [1.0, 2.0]))
+    assert totals.value(PERIOD_MONTH, NEW_YEARS_EVE) == 3.0
+    assert totals.value(PERIOD_MONTH, datetime(2025, 1, 1, 1)) == 0.0
+
+
+def test_restore_with_other_billing_day() -> None:
+    """Test that restoring the totals with another billing day drops the billing cycle."""
+    totals = PeriodTotals(billing_day=15)
+    totals.apply(None, ConsumptionSeries(NEW_YEARS_EVE, [1.0, 2.0]))
+
+    assert PeriodTotals.from_dict(totals.as_dict(), billing_day=15).totals == totals.totals
+    restored = PeriodTotals.from_dict(totals.as_dict(), billing_day=1)
+    assert PERIOD_BILLING_CYCLE not in restored.totals
+    assert restored.totals[PERIOD_MONTH] == totals.totals[PERIOD_MONTH]